@@ -1,18 +1,82 @@
 """Titan aerosols module."""
 
-from .fractals import fractals, fractals_tomasko_2008
-from .mie import mie, mie_bohren_huffman
-from .tholins import fractals_tholins, index_tholins, mie_tholins
+from importlib import import_module
+
+from .adaptive import AdaptiveTable, adaptive_tholins
+from .bands import band_average, band_fractals_tholins, band_mie_tholins
+from .column import column_tholins
+from .ensemble import StreamingStats, ensemble_tholins
+from .fractals import (
+    PhaseMatrix, StructureFactor, fractals,
+    fractals_phase_matrix, fractals_tomasko_2008
+)
+from .mie import (
+    mie, mie_amplitudes, mie_anomalous_diffraction,
+    mie_bohren_huffman, mie_coefficients, mie_efficiencies,
+    mie_phase_matrix, mie_rayleigh, mie_regime, riccati_bessel
+)
+from .phase import PhaseFunction
+from .retrieval import RetrievalTable
+from .stream import stream_tholins
+from .tholins import (
+    Database, ExtrapolationWarning, fractals_tholins,
+    import_indexes, index_tholins, mie_tholins
+)
 from .version import __version__
 
 
+# Services (multiprocessing, shared filesystem, asyncio and HTTP server)
+# imported on their first access (not exported by `from aerosols import *`)
+_SERVICES = {
+    'SharedTable': 'parallel',
+    'parallel_tholins': 'parallel',
+    'Sweep': 'sweep',
+    'AsyncTholins': 'aio',
+    'OpticsServer': 'server',
+    'OpticsService': 'server',
+}
+
+
+def __getattr__(name):
+    """Lazy import of the services."""
+    if name in _SERVICES:
+        return getattr(import_module(f'.{_SERVICES[name]}', __name__), name)
+
+    raise AttributeError(f'module `{__name__}` has no attribute `{name}`')
+
+
 __all__ = [
     'index_tholins',
+    'ExtrapolationWarning',
+    'Database',
+    'import_indexes',
     'mie',
     'mie_bohren_huffman',
+    'mie_coefficients',
+    'mie_efficiencies',
+    'mie_amplitudes',
+    'mie_phase_matrix',
+    'mie_rayleigh',
+    'mie_anomalous_diffraction',
+    'mie_regime',
+    'riccati_bessel',
     'mie_tholins',
     'fractals',
     'fractals_tomasko_2008',
+    'fractals_phase_matrix',
+    'PhaseMatrix',
+    'StructureFactor',
     'fractals_tholins',
+    'column_tholins',
+    'band_average',
+    'band_mie_tholins',
+    'band_fractals_tholins',
+    'PhaseFunction',
+    'StreamingStats',
+    'ensemble_tholins',
+    'stream_tholins',
+    'RetrievalTable',
+    'AdaptiveTable',
+    'adaptive_tholins',
     '__version__',
 ]
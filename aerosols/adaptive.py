@@ -0,0 +1,509 @@
+"""Adaptive tables module."""
+
+from itertools import product
+
+import numpy as np
+
+from .mie import NANG
+from .tholins import (
+    FIELDS, Database, fractals_tholins, mie_tholins, stack_fields
+)
+
+
+ADAPTIVE_RTOL = 1e-3   # Relative interpolation tolerance
+ADAPTIVE_PTOL = 1e-2   # Phase functions relative interpolation tolerance
+ADAPTIVE_SHAPE = 4     # Number of coarse cells on each axis
+ADAPTIVE_LEVEL = 6     # Finest lattice level (nodes spacing of the finest cells)
+ADAPTIVE_CHUNK = 4096  # Number of points interpolated at once
+ADAPTIVE_MERGE = .25   # Coarse edges merged with closer breaks (fraction of a cell)
+
+
+class AdaptiveTable:
+    """Hierarchical table refined where the interpolation error is large.
+
+    The parameters space is split in coarse cells (in log or linear scale
+    on each axis), bisected along the axes where the quadratic
+    interpolation of their nodes does not reproduce the function (see
+    `AdaptiveTable.build`). The nodes of a cell (corners, edges and faces
+    centers and center) are the nodes of a dyadic lattice (`2 ** max_level`
+    lattice cells in each coarse cell on each axis), shared between the
+    neighbouring cells.
+
+    Parameters
+    ----------
+    edges: list
+        Coarse cells edges (one increasing array per axis).
+    max_level: int
+        Finest lattice level (the finest cells are bisected `max_level - 1`
+        times on each axis).
+    log: numpy.ndarray
+        Log scale axes.
+    log_values: numpy.ndarray
+        Values interpolated in log scale.
+    nodes: numpy.ndarray
+        Sorted nodes keys (flat lattice indexes).
+    values: numpy.ndarray
+        Nodes values (one row per node, log of the `log_values`).
+    cells: numpy.ndarray
+        Sorted keys of the bisected cells (flat levels and origin indexes).
+    splits: numpy.ndarray
+        Bisected axes of the cells (bit masks).
+
+    """
+    def __init__(self, edges, max_level, log, log_values, nodes, values, cells,
+                 splits):
+        self.edges = [np.asarray(edge, dtype=float) for edge in edges]
+        self.max_level = int(max_level)
+        self.log = np.asarray(log, dtype=bool)
+        self.log_values = np.asarray(log_values, dtype=bool)
+        self.nodes = np.asarray(nodes, dtype=np.int64)
+        self.values = np.asarray(values, dtype=float)
+        self.cells = np.asarray(cells, dtype=np.int64)
+        self.splits = np.asarray(splits, dtype=np.int64)
+
+    def __repr__(self):
+        return (f'<{self.__class__.__name__} | Nodes: {len(self)} | '
+                f'Leaves: {self.leaves} | Uniform: {self.uniform}>')
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def ndim(self):
+        """Number of parameters."""
+        return len(self.edges)
+
+    @property
+    def bounds(self):
+        """Parameters `(min, max)` bounds (one row per axis)."""
+        return np.array([(edge[0], edge[-1]) for edge in self.edges])
+
+    @property
+    def shape(self):
+        """Number of coarse cells on each axis."""
+        return np.array([len(edge) - 1 for edge in self.edges], dtype=np.int64)
+
+    @property
+    def resolution(self):
+        """Number of lattice cells on each axis."""
+        return self.shape << self.max_level
+
+    @property
+    def uniform(self):
+        """Number of nodes of the full grid with the finest resolution."""
+        return int(np.prod(self.resolution + 1))
+
+    @property
+    def leaves(self):
+        """Number of leaves (cells not bisected)."""
+        bits = (self.splits[:, None] >> np.arange(self.ndim)) & 1
+        return int(np.prod(self.shape) + np.sum((1 << bits.sum(axis=1)) - 1))
+
+    @classmethod
+    def build(cls, func, bounds, shape=ADAPTIVE_SHAPE, max_level=ADAPTIVE_LEVEL,
+              rtol=ADAPTIVE_RTOL, atol=0, log=True, log_values=False, breaks=None):
+        """Build an adaptive table from a vector function.
+
+        The cells are refined generation by generation: the new nodes of
+        a generation (the `3 ** ndim` interpolation nodes of its cells and
+        the quarter points of their lines along each axis) are evaluated
+        with a single call to the function. The errors along each axis are
+        the differences between the function at the quarter points and the
+        quadratic interpolation of their line, relative to the function
+        (or `atol` if it is larger). A cell is bisected along the axes
+        where the error exceeds `rtol` for any of the values: the quarter
+        points become interpolation nodes of its children.
+
+        The strictly positive values spanning orders of magnitude (eg.
+        power laws) are better interpolated in log scale (`log_values`).
+        The known discontinuities of the function derivatives (eg. the
+        nodes of a tabulated input) should be provided as `breaks`: they
+        are added to the coarse cells edges, where they do not require
+        any refinement.
+
+        Parameters
+        ----------
+        func: callable
+            Vector function `(x1, x2, ...) -> values` of the parameters
+            arrays returning the values of each point (one row per point).
+        bounds: numpy.ndarray
+            Parameters `(min, max)` bounds (one row per axis).
+        shape: int or numpy.ndarray, optional
+            Number of uniform coarse cells on each axis.
+        max_level: int, optional
+            Finest lattice level (at least 1).
+        rtol: float or numpy.ndarray, optional
+            Relative interpolation tolerance (for each value).
+        atol: float or numpy.ndarray, optional
+            Minimal error scale (for each value).
+        log: bool or numpy.ndarray, optional
+            Log scale axes.
+        log_values: bool or numpy.ndarray, optional
+            Values interpolated in log scale (for each value).
+        breaks: list, optional
+            Additional coarse cells edges (one array or `None` per axis).
+
+        Returns
+        -------
+        AdaptiveTable
+            Adaptive table.
+
+        Raises
+        ------
+        ValueError
+            If the bounds are not increasing (and strictly positive on
+            the log scale axes) or if the shape or the maximum level are
+            not strictly positive.
+
+        """  # pylint: disable=too-many-locals
+        bounds = np.atleast_2d(np.asarray(bounds, dtype=float))
+        ndim = len(bounds)
+        shape = np.broadcast_to(np.asarray(shape, dtype=np.int64), (ndim,))
+        log = np.broadcast_to(np.asarray(log, dtype=bool), (ndim,))
+        breaks = [None] * ndim if breaks is None else breaks
+
+        if bounds.shape != (ndim, 2) or np.any(bounds[:, 0] >= bounds[:, 1]):
+            raise ValueError('The bounds must be increasing `(min, max)` pairs')
+
+        if np.any(log & (bounds[:, 0] <= 0)):
+            raise ValueError('The log scale bounds must be strictly positive')
+
+        if np.any(shape < 1) or max_level < 1:
+            raise ValueError('The shape and the maximum level must be strictly positive')
+
+        edges = [_edges(*args) for args in zip(bounds, shape, log, breaks)]
+        table = cls(edges, max_level, log, log_values, [], np.empty((0, 0)), [], [])
+        nodes, values = {}, np.empty((0, 0))
+
+        def evaluate(lattice):
+            """Evaluate the new nodes and return their values."""
+            nonlocal values
+            keys = table.node_keys(lattice).ravel().tolist()
+            missing = np.array([key not in nodes for key in keys], dtype=bool)
+            new, first = np.unique(np.array(keys, dtype=np.int64)[missing],
+                                   return_index=True)
+
+            if len(new):
+                x = table.coordinates(lattice.reshape(-1, ndim)[missing][first])
+                rows = np.asarray(func(*x.T), dtype=float).reshape(len(new), -1)
+                count = len(nodes)
+
+                # Values storage grown by doubling (amortized copies)
+                if count + len(new) > len(values):
+                    grown = np.empty((2 * (count + len(new)), rows.shape[1]))
+                    grown[:count] = values[:count] if count else 0
+                    values = grown
+
+                values[count:count + len(new)] = rows
+                nodes.update(zip(new.tolist(), range(count, count + len(new))))
+
+            rows = values[[nodes[key] for key in keys]]
+            return rows.reshape(lattice.shape[:-1] + (-1,))
+
+        offsets = np.array(list(product((0, 1, 2), repeat=ndim)))
+        axes = np.eye(ndim, dtype=np.int64)
+        bits = 1 << np.arange(ndim)
+
+        levels = np.zeros((int(np.prod(table.shape)), ndim), dtype=np.int64)
+        origin = np.array(list(np.ndindex(*table.shape)), dtype=np.int64)
+        origin = origin.reshape(-1, ndim) << max_level
+        cells, splits = [], []
+
+        while len(levels):
+            size = 1 << (max_level - levels)
+            half, quarter = size // 2, size // 4  # Null quarter for the finest cells
+
+            # Interpolation nodes and quarter points of their lines along each axis
+            stencil = origin[:, None] + offsets * half[:, None]
+            lines = stencil.reshape((-1,) + (3,) * ndim + (ndim,))
+            f = evaluate(np.concatenate([stencil] + [
+                np.take(lines, 0, axis=i + 1).reshape(len(stencil), -1, ndim)
+                + axes[i] * (quarter + k * half)[:, i, None, None]
+                for i in range(ndim) for k in (0, 1)
+            ], axis=1))
+
+            fq = f[:, len(offsets):].reshape(len(f), ndim, -1, f.shape[-1])
+            f = f[:, :len(offsets)].reshape((-1,) + (3,) * ndim + f.shape[-1:])
+            lines, gq = (len(f), -1, f.shape[-1]), []
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                g = np.where(log_values, np.log(f), f)
+
+                for i in range(ndim):
+                    glo, gm, ghi = (np.take(g, k, axis=i + 1).reshape(lines)
+                                    for k in range(3))
+                    gq.append(np.concatenate([
+                        3 * glo + 6 * gm - ghi, 3 * ghi + 6 * gm - glo], axis=1) / 8)
+
+                err = np.abs(fq - _values(np.stack(gq, axis=1), log_values))
+                err /= np.maximum(np.abs(fq), atol)
+
+            split = np.any(err > rtol, axis=(2, 3))
+            split &= quarter > 0
+            refine = np.any(split, axis=-1)
+
+            mask = split[refine] @ bits
+            cells.append(table.cell_keys(levels[refine], origin[refine]))
+            splits.append(mask)
+
+            children = []
+            for value in np.unique(mask):
+                sel = mask == value
+                sub = np.unique((offsets > 0) * (value & bits > 0), axis=0)
+                children.append((
+                    np.repeat(levels[refine][sel] + (value & bits > 0), len(sub), axis=0),
+                    (origin[refine][sel][:, None] + sub * half[refine][sel][:, None]
+                     ).reshape(-1, ndim),
+                ))
+
+            levels = np.concatenate([c[0] for c in children] or [levels[:0]])
+            origin = np.concatenate([c[1] for c in children] or [origin[:0]])
+
+        keys = np.array(list(nodes), dtype=np.int64)
+        order = np.argsort(keys)
+        table.nodes = keys[order]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = values[:len(nodes)][order]
+            table.values = np.where(log_values, np.log(values), values)
+
+        cells, splits = np.concatenate(cells), np.concatenate(splits)
+        order = np.argsort(cells)
+        table.cells = cells[order]
+        table.splits = splits[order]
+
+        return table
+
+    @classmethod
+    def load(cls, fname):
+        """Load an adaptive table (`.npz` file)."""
+        with np.load(fname) as data:
+            edges = np.split(data['edges'], np.cumsum(data['sizes'])[:-1])
+            return cls(edges, *(data[name] for name in (
+                'max_level', 'log', 'log_values', 'nodes', 'values', 'cells', 'splits')))
+
+    def save(self, fname):
+        """Save the adaptive table (`.npz` file)."""
+        np.savez(fname, edges=np.concatenate(self.edges),
+                 sizes=[len(edge) for edge in self.edges], max_level=self.max_level,
+                 log=self.log, log_values=self.log_values, nodes=self.nodes,
+                 values=self.values, cells=self.cells, splits=self.splits)
+
+    def node_keys(self, lattice):
+        """Flat indexes of lattice nodes (last axis)."""
+        return np.ravel_multi_index(np.moveaxis(lattice, -1, 0), self.resolution + 1)
+
+    def cell_keys(self, levels, origin):
+        """Flat indexes of cells levels and origins (last axis)."""
+        return np.ravel_multi_index(
+            np.moveaxis(levels, -1, 0), (self.max_level + 1,) * self.ndim
+        ) * int(np.prod(self.resolution + 1)) + self.node_keys(origin)
+
+    def coordinates(self, lattice):
+        """Parameters at lattice positions (last axis)."""
+        x = np.empty(lattice.shape)
+
+        for i, (edges, log) in enumerate(zip(self.edges, self.log)):
+            t = np.log(edges) if log else edges
+            cell = np.minimum(lattice[..., i] >> self.max_level, len(edges) - 2)
+            frac = (lattice[..., i] - (cell << self.max_level)) / (1 << self.max_level)
+            value = t[cell] + frac * (t[cell + 1] - t[cell])
+            x[..., i] = np.where(frac == 0, edges[cell], np.exp(value) if log else value)
+
+        return x
+
+    def lattice(self, x):
+        """Lattice positions of parameters (last axis)."""
+        position = np.empty(np.shape(x))
+
+        for i, (edges, log) in enumerate(zip(self.edges, self.log)):
+            t = np.log(edges) if log else edges
+            value = np.clip(x[..., i], edges[0], edges[-1])
+            value = np.log(value) if log else value
+            cell = np.clip(np.searchsorted(t, value, side='right') - 1, 0, len(t) - 2)
+            frac = (value - t[cell]) / (t[cell + 1] - t[cell])
+            position[..., i] = (cell + frac) * (1 << self.max_level)
+
+        return position
+
+    def __call__(self, *x, chunksize=ADAPTIVE_CHUNK):
+        """Interpolated values.
+
+        Parameters
+        ----------
+        *x: float or numpy.ndarray
+            Parameters (one per axis, broadcasted together). The values
+            outside the bounds are clipped.
+        chunksize: int, optional
+            Number of points interpolated at once.
+
+        Returns
+        -------
+        numpy.ndarray
+            Interpolated values (last axis).
+
+        Raises
+        ------
+        ValueError
+            If the number of parameters does not match the table.
+
+        """
+        if len(x) != self.ndim:
+            raise ValueError(f'{self.ndim} parameter(s) expected (received {len(x)})')
+
+        x = np.broadcast_arrays(*(np.asarray(values, dtype=float) for values in x))
+        points = np.stack([values.ravel() for values in x], axis=-1)
+        out = np.empty((len(points), self.values.shape[1]))
+
+        for start in range(0, len(points), chunksize):
+            out[start:start + chunksize] = self._interpolate(
+                points[start:start + chunksize])
+
+        return out.reshape(x[0].shape + (-1,))
+
+    def _interpolate(self, points):
+        """Quadratic interpolation in the leaves containing the points."""
+        position = self.lattice(points)
+        levels = np.zeros(points.shape, dtype=np.int64)
+        origin = np.zeros(points.shape, dtype=np.int64)
+        bits = 1 << np.arange(self.ndim)
+        todo = np.arange(len(points))
+
+        # Descent from the coarse cells to the leaves (all the points at once)
+        while len(todo):
+            size = 1 << (self.max_level - levels[todo])
+            cells = np.minimum(position[todo] // size, (self.shape << levels[todo]) - 1)
+            origin[todo] = cells.astype(np.int64) * size
+
+            keys = self.cell_keys(levels[todo], origin[todo])
+            i = np.minimum(np.searchsorted(self.cells, keys), len(self.cells) - 1)
+            found = self.cells[i] == keys if len(self.cells) else keys < 0
+
+            levels[todo[found]] += (self.splits[i[found], None] & bits) > 0
+            todo = todo[found]
+
+        half = 1 << (self.max_level - levels - 1)
+        t = np.clip((position - origin) / (2 * half), 0, 1)
+
+        # Lagrange basis of the nodes 0, 1/2 and 1 (on each axis)
+        basis = np.stack([2 * (t - .5) * (t - 1), 4 * t * (1 - t), 2 * t * (t - .5)], -1)
+
+        offsets = np.array(list(product((0, 1, 2), repeat=self.ndim)))
+        rows = np.searchsorted(self.nodes, self.node_keys(
+            origin[:, None] + offsets * half[:, None]))
+        weights = np.prod(basis[:, np.arange(self.ndim), offsets], axis=-1)
+
+        values = np.einsum('pc,pck->pk', weights, self.values[rows])
+
+        return _values(values, self.log_values)
+
+
+def _values(g, log_values):
+    """Values from the interpolated values (log scale for the `log_values`)."""
+    return np.where(log_values, np.exp(g), g)
+
+
+def _edges(bounds, shape, log, breaks):
+    """Coarse cells edges of an axis (uniform edges and breaks).
+
+    The uniform edges closer to a break than `ADAPTIVE_MERGE` (fraction
+    of a uniform cell) are replaced by the break.
+
+    """
+    lo, hi = bounds
+    edges = np.geomspace(lo, hi, shape + 1) if log else np.linspace(lo, hi, shape + 1)
+
+    if breaks is None:
+        return edges
+
+    breaks = np.asarray(breaks, dtype=float)
+    breaks = breaks[(lo < breaks) & (breaks < hi)]
+
+    if not breaks.size:
+        return edges
+
+    t, tb = (np.log(edges), np.log(breaks)) if log else (edges, breaks)
+    far = np.min(np.abs(t[:, None] - tb), axis=1) > ADAPTIVE_MERGE * (t[1] - t[0])
+    far[[0, -1]] = True
+
+    return np.union1d(edges[far], breaks)
+
+
+def adaptive_tholins(wvln, r, N=None, Df=2, db=Database(), nang=NANG, force=False,
+                     shape=ADAPTIVE_SHAPE, max_level=ADAPTIVE_LEVEL, rtol=ADAPTIVE_RTOL,
+                     ptol=ADAPTIVE_PTOL):
+    """Adaptive table of tholins cross-sections and phase functions.
+
+    The table is refined in log scale around the features of the
+    properties (Mie resonances near size parameters of the order of 1)
+    and stays coarse elsewhere. The optical indexes are interpolated
+    between the database wavelengths: these nodes are coarse cells edges
+    (see `AdaptiveTable.build`). The nodes of each generation are
+    evaluated at once with the batched `mie` or `fractals` paths.
+
+    The cross-sections and the phase functions are interpolated in log
+    scale. The cross-sections are refined with the relative tolerance,
+    the asymmetry parameter with an absolute tolerance and the phase
+    functions with their own tolerance, relatively to the isotropic
+    phase function (for their values lower than 1): in the resonance
+    regime, the backscattering ripples of the phase functions require
+    most of the nodes.
+
+    Parameters
+    ----------
+    wvln: tuple
+        Wavelengths `(min, max)` bounds (m).
+    r: tuple
+        Particles radii `(min, max)` bounds (m) or monomers radii
+        bounds (m) if `N` is provided.
+    N: float or tuple, optional
+        Number of monomers for fractal aggregates (Tomasko et al. 2008),
+        fixed or `(min, max)` bounds (third axis).
+        If `None` (default), Mie spheres are computed.
+    Df: float, optional
+        Fractal dimension.
+    db: Database, optional
+        Optical index database.
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    force: bool, optional
+        Bypass fractals validity checks.
+    shape: int or numpy.ndarray, optional
+        Number of uniform coarse cells on each axis.
+    max_level: int, optional
+        Finest lattice level (at least 1).
+    rtol: float, optional
+        Relative interpolation tolerance (cross-sections and asymmetry
+        parameter).
+    ptol: float, optional
+        Relative interpolation tolerance of the phase functions.
+
+    Returns
+    -------
+    AdaptiveTable
+        Adaptive table of `(wvln, r[, N])` with the `parallel_tholins`
+        rows layout (`qsct, qext, qabs, gg` and the phase function).
+
+    """
+    bounds = [wvln, r] if np.ndim(N) == 0 else [wvln, r, N]
+    log_values = np.ones(len(FIELDS) + 2 * nang - 1, dtype=bool)
+    log_values[FIELDS.index('gg')] = False
+
+    atol = np.zeros(len(log_values))
+    atol[FIELDS.index('gg'):] = 1
+
+    tol = np.full(len(log_values), rtol, dtype=float)
+    tol[len(FIELDS):] = ptol
+
+    def evaluate(w, x, n=N):
+        """Table rows of the nodes."""
+        if N is None:
+            qsct, qext, qabs, gg, _, P = mie_tholins(w, x, db, nang=nang)
+        else:
+            qsct, qext, qabs, gg, _, P = fractals_tholins(
+                w, x, Df, n, db, nang=nang, force=force)
+        return stack_fields(qsct, qext, qabs, gg, P)
+
+    return AdaptiveTable.build(evaluate, bounds, shape=shape, max_level=max_level,
+                               rtol=tol, atol=atol, log=True, log_values=log_values,
+                               breaks=[db.wvln] + [None] * (len(bounds) - 1))
@@ -0,0 +1,206 @@
+"""Asyncio module."""
+
+import asyncio
+from functools import partial
+
+import numpy as np
+
+from .fractals import fractals
+from .mie import mie
+from .tholins import Database, index_tholins
+
+
+AIO_WINDOW = 2e-3  # Batching window (s)
+AIO_BATCH = 256    # Maximum number of requests per batch
+AIO_DIGITS = 10    # Significant digits of the inputs to coalesce the requests
+
+
+def _round(value, digits):
+    """Round a value to a number of significant digits."""
+    return float(f'{value:.{digits - 1}e}')
+
+
+def _evaluate(kind, inputs, nr, ni, Df, options):
+    """Vectorized optical properties of a batch of requests (in the executor)."""
+    if kind == 'mie':
+        wvln, r = inputs.T
+        return mie(wvln, nr, ni, r, **options)
+
+    wvln, rm, N = inputs.T
+    return fractals(wvln, nr, ni, rm, Df, N, **options)
+
+
+class AsyncTholins:
+    """Asynchronous tholins cross-sections and phase functions.
+
+    The computations are offloaded to an executor to keep the event
+    loop responsive. The identical in-flight requests (with the same
+    rounded inputs) share a single future and the concurrent requests
+    received within the batching window are computed at once with
+    array inputs (see `mie` and `fractals`).
+
+    Parameters
+    ----------
+    db: Database, optional
+        Optical index database (only used in the event loop thread).
+    executor: concurrent.futures.Executor, optional
+        Executor used for the computations (default: event loop executor).
+    window: float, optional
+        Batching window (s).
+    max_batch: int, optional
+        Maximum number of requests per batch.
+    digits: int, optional
+        Significant digits of the inputs used to coalesce the requests.
+
+    Note
+    ----
+    The results are shared between the coalesced requests: the returned
+    arrays are read-only. The numbers of `requests`, `coalesced` requests,
+    `batches` and `fallbacks` (batches recomputed one request at the time
+    after a failure) are counted in `stats`.
+
+    """
+    def __init__(self, db=Database(), executor=None, window=AIO_WINDOW,
+                 max_batch=AIO_BATCH, digits=AIO_DIGITS):
+        self.db = db
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.digits = digits
+        self.stats = dict.fromkeys(('requests', 'coalesced', 'batches', 'fallbacks'), 0)
+        self._inflight = {}
+        self._batches = {}
+        self._tasks = set()
+
+    def __repr__(self):
+        return (f'<{self.__class__.__name__} | Window: {self.window * 1e3:g} ms '
+                f'| In-flight: {len(self._inflight)}>')
+
+    async def mie_tholins(self, wvln, r, **kwargs):
+        """Mie cross-sections and phase function for tholin particle.
+
+        Parameters
+        ----------
+        wvln: float
+            Wavelength (m).
+        r: float
+            Particle radius (m).
+        **kwargs:
+            Other `mie` options (eg. `nang`, the jacobian is not available).
+
+        Returns
+        -------
+        qsct, qext, qabs, gg, theta, P
+            See `mie_tholins`.
+
+        """
+        return await self._request('mie', None, (wvln, r), kwargs)
+
+    async def fractals_tholins(self, wvln, rm, Df, N, **kwargs):
+        """Fractals cross-sections and phase function for tholin aggregate.
+
+        Parameters
+        ----------
+        wvln: float
+            Wavelength (m).
+        rm: float
+            Monomer radius (m).
+        Df: float
+            Fractal dimension.
+        N: int
+            Number of monomers.
+        **kwargs:
+            Other `fractals` options (eg. `nang` or `force`, the jacobian
+            is not available).
+
+        Returns
+        -------
+        qsct, qext, qabs, gg, theta, P
+            See `fractals_tholins`.
+
+        """
+        return await self._request('fractals', Df, (wvln, rm, N), kwargs)
+
+    async def _request(self, kind, Df, inputs, options):
+        """Coalesce the identical requests and queue the new ones in a batch."""
+        self.stats['requests'] += 1
+
+        inputs = tuple(_round(value, self.digits) for value in inputs)
+        group = (kind, Df, tuple(sorted(options.items())))
+        key = (group, inputs)
+
+        if key in self._inflight:
+            self.stats['coalesced'] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self._inflight[key] = future
+
+            if group not in self._batches:
+                self._batches[group] = []
+                asyncio.get_running_loop().call_later(
+                    self.window, self._flush, group)
+
+            batch = self._batches[group]
+            batch.append((inputs, future))
+
+            if len(batch) >= self.max_batch:
+                self._flush(group)
+
+        # Shielded: a cancelled request does not cancel the shared future
+        return await asyncio.shield(self._inflight[key])
+
+    def _flush(self, group):
+        """Submit the pending batch of a group (if not already submitted)."""
+        batch = self._batches.pop(group, None)
+
+        if batch:
+            self.stats['batches'] += 1
+            self._submit(group, batch)
+
+    def _submit(self, group, batch):
+        """Schedule the computation of a batch (and keep a reference on its task)."""
+        task = asyncio.ensure_future(self._dispatch(group, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compute(self, group, batch):
+        """Compute a batch of requests in the executor and dispatch the results."""
+        kind, Df, options = group
+        loop = asyncio.get_running_loop()
+        inputs = np.array([values for values, _ in batch])
+
+        try:
+            nr, ni = index_tholins(inputs[:, 0], self.db)
+            results = await loop.run_in_executor(self.executor, partial(
+                _evaluate, kind, inputs, nr, ni, Df, dict(options)))
+        except Exception:  # pylint: disable=broad-exception-caught
+            if len(batch) == 1:
+                raise
+
+            # Isolate the invalid requests from the rest of the batch
+            self.stats['fallbacks'] += 1
+            for request in batch:
+                self._submit(group, [request])
+            return
+
+        for value in results:
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+        # The phase function angles (5th output) are shared by all the requests
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(tuple(
+                    value if value is None or j == 4 else value[i]
+                    for j, value in enumerate(results)
+                ))
+
+    async def _dispatch(self, group, batch):
+        """Compute a batch and forward its exceptions to the requests futures."""
+        try:
+            await self._compute(group, batch)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
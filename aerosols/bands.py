@@ -0,0 +1,246 @@
+"""Spectral bands module."""
+
+import numpy as np
+
+from .tholins import Database, fractals_tholins, mie_tholins
+
+
+BAND_RTOL = 1e-3     # Relative interpolation tolerance
+BAND_STEP = 1 / 64   # Initial sampling step (in log wavelength)
+BAND_LEVEL = 10      # Maximum number of refinements
+
+
+def band_average(func, bands, nodes=None, rtol=BAND_RTOL, step=BAND_STEP,
+                 max_level=BAND_LEVEL):
+    """Spectral response weighted optical properties with adaptive quadrature.
+
+    The optical properties are sampled on a coarse log-wavelength grid
+    (shared between all the bands) and each interval is bisected until
+    the error of the linear interpolation (in wavelength, as in the
+    quadrature) of the properties at its mid-point is below the relative
+    tolerance. The evaluations are cached and reused
+    between overlapping bands. The response weighted integrals are then
+    computed exactly on the merged sampling and response grids.
+
+    Parameters
+    ----------
+    func: callable
+        Optical properties function of the wavelength (m) with the
+        same outputs as `mie` or `fractals`.
+    bands: list
+        List of `(wvln, response)` spectral response curves,
+        with wavelengths (m) sorted in increasing order.
+    nodes: numpy.ndarray, optional
+        Mandatory sampling wavelengths (m), where the properties
+        may not be smooth (eg. the optical index database nodes).
+    rtol: float, optional
+        Relative interpolation tolerance.
+    step: float, optional
+        Initial sampling step (in log wavelength).
+    max_level: int, optional
+        Maximum number of bisections of the initial intervals.
+
+    Returns
+    -------
+    qsct: numpy.ndarray
+        Band averaged scattering cross sections (m^-2).
+    qext: numpy.ndarray
+        Band averaged extinction cross sections (m^-2).
+    qabs: numpy.ndarray
+        Band averaged absorption cross sections (m^-2).
+    gg: numpy.ndarray
+        Band averaged asymmetry parameters (weighted by the
+        scattering cross section), `None` if not calculated.
+    theta: numpy.ndarray
+        Phase function angles (radians).
+    P: numpy.ndarray
+        Band averaged phase functions (weighted by the
+        scattering cross section).
+    nevals: int
+        Number of optical properties evaluations.
+
+    Raises
+    ------
+    ValueError
+        If a band wavelengths are not sorted or its response is null.
+
+    """  # pylint: disable=too-many-locals
+    cache, theta = {}, []
+
+    def evaluate(w):
+        """Cached optical properties at a given wavelength."""
+        if w not in cache:
+            qsct, qext, qabs, gg, angles, P = func(w)
+            theta[:] = angles
+            cache[w] = np.hstack([
+                qsct, qext, qabs, np.nan if gg is None else gg * qsct, qsct * P
+            ])
+        return cache[w]
+
+    averages = []
+    for wvln, response in bands:
+        wvln, response = np.asarray(wvln, dtype=float), np.asarray(response, dtype=float)
+
+        if np.any(np.diff(wvln) <= 0):
+            raise ValueError('Band wavelengths must be sorted in increasing order')
+
+        weight = np.trapz(response, x=wvln)
+        if weight <= 0:
+            raise ValueError('Band response must be positive')
+
+        # Initial sampling: log-wavelength grid and mandatory nodes
+        grid = np.arange(np.floor(np.log(wvln[0]) / step),
+                         np.ceil(np.log(wvln[-1]) / step) + 1) * step
+        grid = np.exp(grid)
+
+        if nodes is not None:
+            nodes = np.asarray(nodes)
+            grid = np.union1d(grid, nodes[(grid[0] < nodes) & (nodes < grid[-1])])
+
+        samples = _refine(evaluate, grid, wvln, response, rtol, max_level)
+
+        # Exact integration of piecewise linear properties and response
+        x = np.union1d(samples[(wvln[0] < samples) & (samples < wvln[-1])], wvln)
+        f = _interp(x, samples, np.array([evaluate(w) for w in samples]))
+        r = np.interp(x, wvln, response)
+
+        h = np.diff(x)[:, None]
+        ra, rb, fa, fb = r[:-1, None], r[1:, None], f[:-1], f[1:]
+        integral = np.sum(h / 6 * (2 * ra * fa + ra * fb + rb * fa + 2 * rb * fb), axis=0)
+
+        averages.append(integral / weight)
+
+    averages = np.array(averages)
+    qsct, qext, qabs, ggsct, Psct = (averages[:, 0], averages[:, 1], averages[:, 2],
+                                     averages[:, 3], averages[:, 4:])
+
+    gg = None if np.all(np.isnan(ggsct)) else ggsct / qsct
+    P = Psct / qsct[:, None]
+
+    return qsct, qext, qabs, gg, np.array(theta), P, len(cache)
+
+
+def _refine(evaluate, grid, wvln, response, rtol, max_level):
+    """Adaptive bisection of the sampling grid.
+
+    Parameters
+    ----------
+    evaluate: callable
+        Cached vector function of the wavelength.
+    grid: numpy.ndarray
+        Initial sampling wavelengths.
+    wvln: numpy.ndarray
+        Band response wavelengths.
+    response: numpy.ndarray
+        Band response.
+    rtol: float
+        Relative interpolation tolerance.
+    max_level: int
+        Maximum number of bisections.
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted sampling wavelengths.
+
+    """
+    samples = set()
+    intervals = [(a, b, 0) for a, b in zip(grid[:-1], grid[1:])]
+
+    while intervals:
+        a, b, level = intervals.pop()
+
+        # Skip the intervals where the band response is null
+        edges = np.interp([a, b], wvln, response, left=0, right=0)
+        if not np.any(edges > 0) and not np.any(response[(a < wvln) & (wvln < b)] > 0):
+            continue
+
+        m = .5 * (a + b)  # Linear in wavelength, as in the quadrature
+        fa, fm, fb = evaluate(a), evaluate(m), evaluate(b)
+        samples.update((a, m, b))
+
+        scale = np.maximum(np.abs(fa), np.abs(fb))
+        scale[3] = max(fa[0], fb[0])  # g * Qsca relative to Qsca
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            err = np.abs(fm - .5 * (fa + fb)) / scale
+
+        if level < max_level and np.nanmax(err) > rtol:
+            intervals += [(a, m, level + 1), (m, b, level + 1)]
+
+    return np.array(sorted(samples))
+
+
+def _interp(x, xp, fp):
+    """Linear interpolation of the rows of `fp` (with `xp` sorted)."""
+    i = np.clip(np.searchsorted(xp, x) - 1, 0, len(xp) - 2)
+    w = ((x - xp[i]) / (xp[i + 1] - xp[i]))[:, None]
+    return (1 - w) * fp[i] + w * fp[i + 1]
+
+
+def band_mie_tholins(bands, r, db=Database(), rtol=BAND_RTOL, **kwargs):
+    """Band averaged Mie cross-sections and phase function for tholin particle.
+
+    The optical index database wavelengths are used as mandatory
+    sampling nodes.
+
+    Parameters
+    ----------
+    bands: list
+        List of `(wvln, response)` spectral response curves (m).
+    r: float
+        Particle radius (m).
+    db: Database, optional
+        Optical index database.
+    rtol: float, optional
+        Relative interpolation tolerance.
+    nang: int, optional
+        Number of angles for the phase function.
+
+    Returns
+    -------
+    qsct, qext, qabs, gg, theta, P, nevals
+        See `band_average`.
+
+    """
+    return band_average(
+        lambda wvln: mie_tholins(wvln, r, db, **kwargs),
+        bands, nodes=db.wvln, rtol=rtol,
+    )
+
+
+def band_fractals_tholins(bands, rm, Df, N, db=Database(), rtol=BAND_RTOL, **kwargs):
+    """Band averaged fractals cross-sections and phase function for tholin aggregate.
+
+    The optical index database wavelengths are used as mandatory
+    sampling nodes.
+
+    Parameters
+    ----------
+    bands: list
+        List of `(wvln, response)` spectral response curves (m).
+    rm: float
+        Monomer radius (m).
+    Df: float
+        Fractal dimension.
+    N: int
+        Number of monomers.
+    db: Database, optional
+        Optical index database.
+    rtol: float, optional
+        Relative interpolation tolerance.
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    force: bool, optional
+        Bypass validity checks.
+
+    Returns
+    -------
+    qsct, qext, qabs, gg, theta, P, nevals
+        See `band_average`.
+
+    """
+    return band_average(
+        lambda wvln: fractals_tholins(wvln, rm, Df, N, db, **kwargs),
+        bands, nodes=db.wvln, rtol=rtol,
+    )
@@ -5,7 +5,9 @@ import argparse
 import numpy as np
 
 from .mie import NANG
-from .tholins import fractals_tholins
+from .tholins import (
+    DEFAULT_DB, DEFAULT_TABLE, UNITS, fractals_tholins, import_indexes
+)
 
 
 def cli_fractal_tholins(argv=None):
@@ -46,3 +48,98 @@ def cli_fractal_tholins(argv=None):
         print("# Phase function")
         for t, p in zip(np.degrees(theta), P):
             print(f"{t:.1f}\t{p:.2e}")
+
+
+def cli_aerosols_server(argv=None):
+    """Command line interface for the local optical properties HTTP server."""
+    # pylint: disable=import-outside-toplevel
+    from .server import (
+        SERVER_CACHE, SERVER_HOST, SERVER_PORT, OpticsServer, OpticsService
+    )
+
+    parser = argparse.ArgumentParser(
+        description='Local HTTP/JSON server for the tholins optical indexes, '
+                    'Mie and fractals cross-sections and phase functions.')
+
+    parser.add_argument('--host', default=SERVER_HOST, help='Server host')
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help='Server port')
+    parser.add_argument('--database', default=DEFAULT_DB, help='Optical index database')
+    parser.add_argument('--table', default=DEFAULT_TABLE,
+                        help='Default tholins indexes table')
+    parser.add_argument('--cache-size', type=int, default=SERVER_CACHE,
+                        help='Maximum number of cached results')
+
+    args, _ = parser.parse_known_args(argv)
+
+    service = OpticsService(args.database, args.table, args.cache_size)
+
+    with OpticsServer((args.host, args.port), service) as server:
+        print(f"Serving on http://{args.host}:{server.server_address[1]}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def cli_import_indexes(argv=None):
+    """Command line interface to import optical indexes in a database."""
+    parser = argparse.ArgumentParser(
+        description='Bulk import optical indexes (CSV or NumPy `wvln, nr, ni` '
+                    'columns) in a database table.')
+
+    parser.add_argument('source', help='CSV or NumPy (.npy) file')
+    parser.add_argument('table', help='Table name')
+    parser.add_argument('database', help='Database file (created if needed)')
+    parser.add_argument('--unit', '-u', default='um', choices=list(UNITS),
+                        help='Wavelength unit')
+    parser.add_argument('--replace', '-r', action='store_true',
+                        help='Replace the table if it already exists')
+
+    args, _ = parser.parse_known_args(argv)
+
+    try:
+        db = import_indexes(args.source, args.table, args.database,
+                            unit=args.unit, replace=args.replace)
+    except (OSError, ValueError) as err:
+        print(err)
+        return
+
+    print(f"Table `{db.table}` imported in {db} ({len(db.wvln)} wavelengths)")
+
+
+def cli_sweep(argv=None):
+    """Command line interface for the shared filesystem sweeps workers."""
+    # pylint: disable=import-outside-toplevel
+    from .sweep import SWEEP_TIMEOUT, Sweep
+
+    parser = argparse.ArgumentParser(
+        description='Run, monitor or merge a grid sweep in a shared directory '
+                    '(created with `Sweep.create`).')
+
+    parser.add_argument('action', choices=['run', 'status', 'merge'], help='Action')
+    parser.add_argument('directory', help='Sweep directory')
+    parser.add_argument('--timeout', '-t', type=float, default=SWEEP_TIMEOUT,
+                        help='Claims expiration (s)')
+    parser.add_argument('--max-chunks', '-n', type=int, default=None,
+                        help='Maximum number of chunks to compute')
+    parser.add_argument('--output', '-o', default='table.npy',
+                        help='Merged table file (.npy)')
+
+    args, _ = parser.parse_known_args(argv)
+
+    try:
+        sweep = Sweep(args.directory)
+
+        if args.action == 'run':
+            count = sweep.run(timeout=args.timeout, max_chunks=args.max_chunks)
+            print(f"{count} chunk(s) computed")
+
+        elif args.action == 'merge':
+            sweep.merge(args.output).close()
+            print(f"Table saved in {args.output}")
+
+        print(', '.join(f'{key}: {value}' for key, value in sweep.status.items()))
+
+    except (OSError, ValueError) as err:
+        print(err)
@@ -0,0 +1,91 @@
+"""Vertical column module."""
+
+import numpy as np
+
+from .fractals import fractals
+from .mie import NANG
+from .tholins import Database, index_tholins
+
+
+def column_tholins(wvln, density, dz, rm, N, Df=2, db=Database(),
+                   nang=NANG, force=False):
+    """Optical depths and phase functions of a layered tholins haze column.
+
+    Each layer contains a single population of fractal aggregates
+    (Tomasko et al. 2008). The layers made of the same `(rm, N)` aggregates
+    are computed only once, the optical indexes are looked up once for
+    the whole wavelength grid and all the aggregates are computed with a
+    single batched `fractals` call (the monomers Mie scattering is shared
+    between the aggregates with the same size parameter).
+
+    Parameters
+    ----------
+    wvln: float or numpy.ndarray
+        Wavelength grid (m).
+    density: float or numpy.ndarray
+        Aggregates number density in each layer (m^-3).
+    dz: float or numpy.ndarray
+        Layers thickness (m).
+    rm: float or numpy.ndarray
+        Monomer radius in each layer (m).
+    N: int or numpy.ndarray
+        Number of monomers in each layer.
+    Df: float, optional
+        Fractal dimension.
+    db: Database, optional
+        Optical index database.
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    force: bool, optional
+        Bypass validity checks.
+
+    Returns
+    -------
+    tau_ext: numpy.ndarray
+        Extinction optical depth of each layer (layers, wavelengths).
+    tau_sca: numpy.ndarray
+        Scattering optical depth of each layer (layers, wavelengths).
+    tau_ext_cum: numpy.ndarray
+        Cumulative extinction optical depth from the top of the column
+        down to the bottom of each layer (layers, wavelengths).
+    tau_sca_cum: numpy.ndarray
+        Cumulative scattering optical depth from the top of the column
+        down to the bottom of each layer (layers, wavelengths).
+    theta: numpy.ndarray
+        Phase function angles (radians).
+    P: numpy.ndarray
+        Phase function of each layer (layers, wavelengths, angles).
+
+    Note
+    ----
+    The layers are expected to be ordered from the top to the bottom
+    of the column.
+
+    """  # pylint: disable=too-many-locals
+    wvln = np.atleast_1d(wvln)
+    density, dz, rm, N = np.broadcast_arrays(*np.atleast_1d(density, dz, rm, N))
+
+    # Unique aggregates `(rm, N)` in the column
+    rms, irm = np.unique(rm, return_inverse=True)
+    Ns, iN = np.unique(N, return_inverse=True)
+    models, layers = np.unique(np.transpose([irm, iN]), axis=0, return_inverse=True)
+    layers = np.ravel(layers)
+
+    nr, ni = index_tholins(wvln, db)
+
+    # All the aggregates at all the wavelengths at once
+    qsct, qext, _, _, theta, P = fractals(
+        wvln, nr, ni, rms[models[:, :1]], Df, Ns[models[:, 1:]], nang=nang, force=force)
+
+    column = (density * dz)[:, None]
+    tau_ext = column * qext[layers]
+    tau_sca = column * qsct[layers]
+
+    return (
+        tau_ext,
+        tau_sca,
+        np.cumsum(tau_ext, axis=0),
+        np.cumsum(tau_sca, axis=0),
+        theta,
+        P[layers],
+    )
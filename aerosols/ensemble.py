@@ -0,0 +1,362 @@
+"""Monte Carlo ensembles module."""
+
+from functools import partial
+
+import numpy as np
+
+from .fractals import fractals
+from .mie import NANG, mie
+from .tholins import Database, index_tholins
+
+
+ENSEMBLE_MEMBERS = 1000  # Default number of members
+ENSEMBLE_CHUNK = 256     # Number of members evaluated at once
+ENSEMBLE_BINS = 512      # Number of histogram bins for the quantiles
+ENSEMBLE_MARGIN = .5     # Histogram range margin (relative to the first chunk span)
+
+
+class StreamingStats:
+    """Streaming mean, variance and quantiles.
+
+    The mean and the variance are merged chunk by chunk (Welford/Chan
+    algorithm). The quantiles are estimated from histograms whose range
+    is set on the first chunk (widened by `ENSEMBLE_MARGIN` on each
+    side) and doubled when later values fall outside of it (the pairs
+    of bins are merged): the quantiles resolution decreases when the
+    range grows but no value is clipped. Only `O(bins)` values are
+    stored for each quantity.
+
+    Parameters
+    ----------
+    bins: int, optional
+        Number of histogram bins (even).
+    log: bool, optional
+        Histograms in log space (for strictly positive quantities).
+
+    Raises
+    ------
+    ValueError
+        If the number of bins is not even.
+
+    """
+    def __init__(self, bins=ENSEMBLE_BINS, log=False):
+        if bins < 2 or bins % 2:
+            raise ValueError(f'The number of bins must be even (received {bins})')
+
+        self.bins = bins
+        self.log = log
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self.edges = None
+        self.hist = None
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} | Count: {self.count} | Bins: {self.bins}>'
+
+    @property
+    def var(self):
+        """Unbiased variance."""
+        return self.m2 / max(self.count - 1, 1)
+
+    @property
+    def std(self):
+        """Standard deviation."""
+        return np.sqrt(self.var)
+
+    def update(self, samples):
+        """Merge a chunk of samples.
+
+        Parameters
+        ----------
+        samples: numpy.ndarray
+            Samples (first axis).
+
+        Raises
+        ------
+        ValueError
+            If log space histograms receive non-positive samples.
+
+        """
+        samples = np.asarray(samples, dtype=float)
+        n = len(samples)
+
+        if n == 0:
+            return
+
+        if self.log and np.any(samples <= 0):
+            raise ValueError('Log space statistics require strictly positive samples')
+
+        mean = samples.mean(axis=0)
+        m2 = np.sum((samples - mean) ** 2, axis=0)
+        x = np.log(samples) if self.log else samples
+
+        if self.count == 0:
+            self.mean, self.m2 = mean, m2
+            self.min, self.max = samples.min(axis=0), samples.max(axis=0)
+
+            lo, hi = x.min(axis=0), x.max(axis=0)
+            margin = np.where(hi > lo, ENSEMBLE_MARGIN * (hi - lo),
+                              np.maximum(1e-3 * np.abs(lo), 1e-12))
+            self.edges = (lo - margin, hi + margin)
+            self.hist = np.zeros(mean.shape + (self.bins,), dtype=np.int64)
+        else:
+            total = self.count + n
+            delta = mean - self.mean
+            self.mean = self.mean + delta * n / total
+            self.m2 = self.m2 + m2 + delta ** 2 * self.count * n / total
+            self.min = np.minimum(self.min, samples.min(axis=0))
+            self.max = np.maximum(self.max, samples.max(axis=0))
+            self._extend(x.min(axis=0), x.max(axis=0))
+
+        self.count += n
+
+        # Histograms of all the quantities at once
+        lo, hi = self.edges
+        i = np.clip(((x - lo) / (hi - lo) * self.bins).astype(int), 0, self.bins - 1)
+        i = i + self.bins * np.arange(self.mean.size).reshape(self.mean.shape)
+        self.hist += np.bincount(
+            i.ravel(), minlength=self.hist.size).reshape(self.hist.shape)
+
+    def _extend(self, lo, hi):
+        """Double the histograms ranges until they contain `[lo, hi]`."""
+        start, stop = (np.array(edge, dtype=float) for edge in self.edges)
+        first, last = start.reshape(-1), stop.reshape(-1)  # Views
+        lo, hi = np.ravel(lo), np.ravel(hi)
+        hist = self.hist.reshape(-1, self.bins)  # View
+        zeros = np.zeros((len(hist), self.bins // 2), dtype=hist.dtype)
+
+        while True:
+            below = lo < first
+            above = (hi > last) & ~below
+
+            if not np.any(below | above):
+                break
+
+            span = last - first
+            merged = hist.reshape(len(hist), -1, 2).sum(axis=-1)
+            hist[below] = np.concatenate([zeros, merged], axis=1)[below]
+            hist[above] = np.concatenate([merged, zeros], axis=1)[above]
+            first[below] -= span[below]
+            last[above] += span[above]
+
+        self.edges = (start, stop)
+
+    def quantile(self, q):
+        """Estimated quantile(s).
+
+        Parameters
+        ----------
+        q: float or numpy.ndarray
+            Quantile(s) between 0 and 1.
+
+        Returns
+        -------
+        numpy.ndarray
+            Estimated quantiles (first axis if `q` is an array),
+            linearly interpolated in the histogram bins.
+
+        Raises
+        ------
+        ValueError
+            If no sample was provided or if `q` is not between 0 and 1.
+
+        """
+        if self.count == 0:
+            raise ValueError('No samples')
+
+        if np.any((np.asarray(q) < 0) | (np.asarray(q) > 1)):
+            raise ValueError('Quantiles must be between 0 and 1')
+
+        lo, hi = self.edges
+        cdf = np.cumsum(self.hist, axis=-1) / self.count
+        prev = np.concatenate([np.zeros(cdf.shape[:-1] + (1,)), cdf[..., :-1]], axis=-1)
+
+        out = []
+        for p in np.atleast_1d(q):
+            i = np.argmax(cdf >= p - 1e-12, axis=-1)[..., None]
+            before = np.take_along_axis(prev, i, -1)
+            after = np.take_along_axis(cdf, i, -1)
+            frac = np.clip((p - before) / np.maximum(after - before, 1e-300), 0, 1)
+
+            x = lo + (i[..., 0] + frac[..., 0]) * (hi - lo) / self.bins
+            out.append(np.clip(np.exp(x) if self.log else x, self.min, self.max))
+
+        return out[0] if np.ndim(q) == 0 else np.array(out)
+
+
+def _draw(value, rng, start, stop, members):
+    """Chunk of samples of an ensemble input.
+
+    Parameters
+    ----------
+    value: float, numpy.ndarray, callable or distribution
+        Fixed value, samples array (one per member), callable
+        `(rng, size) -> samples` or distribution with a `rvs` method.
+    rng: numpy.random.Generator
+        Random generator.
+    start: int
+        First member of the chunk.
+    stop: int
+        Last member of the chunk (excluded).
+    members: int
+        Number of members.
+
+    Returns
+    -------
+    numpy.ndarray
+        Samples of the chunk members.
+
+    Raises
+    ------
+    ValueError
+        If a samples array does not have one value per member.
+
+    """
+    size = stop - start
+
+    if hasattr(value, 'rvs'):
+        return np.asarray(value.rvs(size=size, random_state=rng), dtype=float)
+
+    if callable(value):
+        return np.broadcast_to(np.asarray(value(rng, size), dtype=float), (size,))
+
+    if np.ndim(value) == 0:
+        return np.full(size, value, dtype=float)
+
+    if len(value) != members:
+        raise ValueError(f'Samples arrays must have {members} values '
+                         f'(received {len(value)})')
+
+    return np.asarray(value[start:stop], dtype=float)
+
+
+def _uniform(rng, size):
+    """Uniform samples between 0 and 1."""
+    return rng.random(size)
+
+
+def ensemble_tholins(wvln, r, N=None, Df=2, nr=None, ni=None, db=Database(),
+                     mixing=None, members=None, nang=NANG, force=False,
+                     seed=None, chunksize=ENSEMBLE_CHUNK, bins=ENSEMBLE_BINS):
+    """Monte Carlo ensemble statistics of tholins cross-sections and phase functions.
+
+    The members are evaluated by chunks with the batched `mie` or
+    `fractals` kernels (the members with the same size parameter share
+    a single Mie series solve and the aggregates with the same number of
+    monomers share their cached geometry) and merged into streaming
+    statistics (see `StreamingStats`): the members are not stored.
+    The aggregates structure factors are tabulated once for each distinct
+    number of monomers: discrete `N` distributions are much faster.
+
+    The uncertain inputs can be provided as fixed values, samples arrays
+    (one value per member), callables `(rng, size) -> samples` or
+    distributions with a `rvs(size, random_state)` method (eg. frozen
+    `scipy.stats` distributions).
+
+    Parameters
+    ----------
+    wvln: float
+        Wavelength (m).
+    r: float, numpy.ndarray, callable or distribution
+        Particles radii (m) or monomers radii (m) if `N` is provided.
+    N: float, numpy.ndarray, callable or distribution, optional
+        Number of monomers for fractal aggregates (Tomasko et al. 2008).
+        If `None` (default), Mie spheres are computed.
+    Df: float, optional
+        Fractal dimension.
+    nr: float, numpy.ndarray, callable or distribution, optional
+        Real optical index (default: from the optical index database(s)).
+    ni: float, numpy.ndarray, callable or distribution, optional
+        Imaginary optical index (default: from the optical index database(s)).
+    db: Database or tuple, optional
+        Optical index database or pair of databases to mix (eg.
+        `(Database(table='Tholins_CVD'), Database(table='Tholins_Doose'))`).
+    mixing: float, numpy.ndarray, callable or distribution, optional
+        Fraction of the second database with a pair of databases (default:
+        uniform between 0 and 1). The real indexes are mixed linearly
+        and the imaginary indexes logarithmically.
+    members: int, optional
+        Number of members (default: the length of the samples arrays, if
+        any, or `ENSEMBLE_MEMBERS`).
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    force: bool, optional
+        Bypass fractals validity checks.
+    seed: int or numpy.random.Generator, optional
+        Random generator seed.
+    chunksize: int, optional
+        Number of members evaluated at once.
+    bins: int, optional
+        Number of histogram bins for the quantiles.
+
+    Returns
+    -------
+    qsct: StreamingStats
+        Scattering cross section statistics (m^-2).
+    qext: StreamingStats
+        Extinction cross section statistics (m^-2).
+    qabs: StreamingStats
+        Absorption cross section statistics (m^-2), with linear
+        histograms (null for non-absorbing particles).
+    gg: StreamingStats
+        Asymmetry parameter statistics (`None` for fractals aggregates).
+    theta: numpy.ndarray
+        Phase function angles (radians).
+    P: StreamingStats
+        Phase function statistics.
+
+    Raises
+    ------
+    ValueError
+        If more than 2 databases are provided or if a samples array does
+        not have one value per member.
+
+    """  # pylint: disable=too-many-locals
+    fractal = N is not None
+    dbs = (db,) if isinstance(db, Database) else tuple(db)
+
+    if len(dbs) not in (1, 2):
+        raise ValueError('One database or a pair of databases are required')
+
+    indexes = [index_tholins(wvln, database) for database in dbs]
+
+    if members is None:
+        samples = [len(value) for value in (r, N, nr, ni, mixing) if np.ndim(value)
+                   and not callable(value) and not hasattr(value, 'rvs')]
+        members = samples[0] if samples else ENSEMBLE_MEMBERS
+
+    rng = np.random.default_rng(seed)
+    stats = [StreamingStats(bins, log=log) for log in (True, True, False)]
+    gg = None if fractal else StreamingStats(bins)
+    P = StreamingStats(bins, log=True)
+
+    for start in range(0, members, chunksize):
+        stop = min(start + chunksize, members)
+        draw = partial(_draw, rng=rng, start=start, stop=stop, members=members)
+
+        if len(dbs) == 1:
+            n, k = indexes[0]
+        else:
+            f = draw(_uniform if mixing is None else mixing)
+            (nr1, ni1), (nr2, ni2) = indexes
+            n = (1 - f) * nr1 + f * nr2
+            k = np.exp((1 - f) * np.log(ni1) + f * np.log(ni2))
+
+        n = n if nr is None else draw(nr)
+        k = k if ni is None else draw(ni)
+
+        if fractal:
+            qsct, qext, qabs, _, theta, Pc = fractals(
+                wvln, n, k, draw(r), Df, draw(N), nang=nang, force=force)
+        else:
+            qsct, qext, qabs, g, theta, Pc = mie(wvln, n, k, draw(r), nang=nang)
+            gg.update(g)
+
+        for stat, values in zip(stats, (qsct, qext, qabs)):
+            stat.update(values)
+        P.update(Pc)
+
+    return stats[0], stats[1], stats[2], gg, theta, P
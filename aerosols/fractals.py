@@ -1,15 +1,309 @@
 """Fractal module."""
 
+from functools import lru_cache
+
 import numpy as np
 
-from .mie import NANG, mie_bohren_huffman
+from .mie import NANG, _precision, mie_bohren_huffman
+
+
+GEOMETRY_CACHE = 1_024
+STRUCTURE_CACHE = 128
+STRUCTURE_QMAX = 3      # Tabulated scattering vector (2 * max validity Xm)
+STRUCTURE_STEP = 1 / 5   # Tabulation step (in units of 1 / Rmax)
+
+ELEMENTS = ('P11', 'P21', 'P22', 'P33', 'P43', 'P44')
+TOMASKO_ELEMENTS = ('P11', 'P22', 'P33', 'P44', 'P21', 'P43')  # Output order
+
+
+@lru_cache(maxsize=GEOMETRY_CACHE)
+def _aggregate_geometry(N, Df):
+    """Aggregate geometry based on Tomasko et al. 2008 (A.2.1).
+
+    The geometry only depends on the number of monomers and the
+    fractal dimension, it is cached to be shared between the calls.
+
+    Parameters
+    ----------
+    N: int
+        Number of monomers.
+    Df: float
+        Fractal dimension.
+
+    Returns
+    -------
+    R0: numpy.ndarray
+        Distances to the center of mass (in units of monomer radius).
+    F0: numpy.ndarray
+        Monomers distribution at the distance `R0`.
+
+    """
+    # Table A2: Empirical geometric parameters (in units of monomer radius)
+    D_cut = 3.194
+    R1 = 1.598
+    R2 = 3.478
+    Rcut = 10_000
+    Rmin = 2  # Theoretically constrained
+
+    Rmax = R1 * np.power(N * np.log(Rcut), 1 / Df)     # (A.1a)
+    R0 = np.arange(Rmin, Rmax, 1 / 8)
+    if len(R0) < 100:
+        R0 = np.linspace(Rmin, Rmax, 100)              # Nb pt > 100
+
+    Nc = ((1 - np.exp(-np.power(R0 / R1, Df) / N))
+          * (1 - np.exp(-np.power(R0 / R2, D_cut)))
+          + 2 / N) / (1 + 2 / N)                       # (A.1b)
+
+    F0 = np.concatenate((
+        [Nc[0]],
+        .5 * (Nc[2:] - Nc[:-2]),                       # (A.1c)
+        [0],
+    ))
+
+    # Read-only arrays shared between the calls
+    R0.setflags(write=False)
+    F0.setflags(write=False)
+
+    return R0, F0
+
+
+class StructureFactor:
+    """Aggregate coherent structure factor based on Tomasko et al. 2008 (A.5-A.7).
+
+    The coherent scattering `Fc` only depends on the scattering vector
+    `q = 2 Xm sin(theta / 2)` through the structure factor:
+
+        S(q) = sum(F0 * sinc(R0 * q / π))
+        Fc = N + (N^2 - N) * S(q)
+
+    `S(q)` and its derivative are tabulated once on a dense `q` grid
+    (extended on demand) and interpolated with cubic Hermite polynomials.
+
+    Parameters
+    ----------
+    N: int
+        Number of monomers.
+    Df: float
+        Fractal dimension.
+    qmax: float, optional
+        Initial maximum tabulated scattering vector.
+
+    """
+    def __init__(self, N, Df, qmax=STRUCTURE_QMAX):
+        self.N = N
+        self.Df = Df
+        self.R0, self.F0 = _aggregate_geometry(N, Df)                   # (A.1)
+        self.step = STRUCTURE_STEP / self.R0[-1]
+        self.tau = np.sum(self.F0 / self.R0 ** 2) * (N - 1) / (4 * np.pi)  # (A.7a)
+        self._table = self._tabulate(qmax)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} N: {self.N} | Df: {self.Df}>'
+
+    def __call__(self, q):
+        """Interpolated structure factor `S(q)`."""
+        return self._interp(q)[0]
+
+    def _tabulate(self, qmax, chunk=1_000):
+        """Tabulate the structure factor and its derivative up to `qmax`."""
+        q = np.arange(0, qmax + 2 * self.step, self.step)
+        S, dS = np.empty_like(q), np.empty_like(q)
+
+        for i in range(0, len(q), chunk):
+            x = self.R0 * q[i:i + chunk, None]
+            # WARNING: sinc(x) = sin(pi.x)/(pi.x)
+            sinc = np.sinc(x / np.pi)
+            S[i:i + chunk] = np.dot(sinc, self.F0)                        # (A.5)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                dsinc = np.where(x > 0, (np.cos(x) - sinc) / x, 0)
+            dS[i:i + chunk] = np.dot(dsinc * self.R0, self.F0)
+
+        return q, S, dS
+
+    def _interp(self, q):
+        """Cubic Hermite interpolation of the structure factor and its derivative."""
+        q = np.asarray(q)
+        qmax = np.max(q, initial=0)
+
+        if qmax > self._table[0][-2]:
+            self._table = self._tabulate(2 * qmax)
+
+        qs, S, dS = self._table
+        i = np.minimum((q / self.step).astype(int), len(qs) - 2)
+        h = self.step
+        t = (q - qs[i]) / h
+
+        s = (
+            (1 + 2 * t) * (1 - t) ** 2 * S[i]
+            + t * (1 - t) ** 2 * h * dS[i]
+            + t ** 2 * (3 - 2 * t) * S[i + 1]
+            - t ** 2 * (1 - t) * h * dS[i + 1]
+        )
+        ds = (
+            6 * t * (t - 1) / h * (S[i] - S[i + 1])
+            + (1 - t) * (1 - 3 * t) * dS[i]
+            + t * (3 * t - 2) * dS[i + 1]
+        )
+        return s, ds
+
+    def coherent(self, Xm, theta):
+        """Total coherent scattering `Fc` (A.6).
+
+        Parameters
+        ----------
+        Xm: float
+            Monomer size parameter.
+        theta: numpy.ndarray
+            Scattering angles (radians).
+
+        Returns
+        -------
+        numpy.ndarray
+            Total coherent scattering.
+
+        """
+        S, _ = self._interp(2 * Xm * np.sin(np.asarray(theta) / 2))
+        return S * (self.N ** 2 - self.N) + self.N
+
+    def coherent_derivative(self, Xm, theta):
+        """Derivative of the total coherent scattering `Fc` with respect to `Xm`."""
+        q = 2 * Xm * np.sin(np.asarray(theta) / 2)
+        _, dS = self._interp(q)
+        return dS * q / Xm * (self.N ** 2 - self.N)
+
+    def tau_coef(self, Xm):
+        """Optical depth coefficient (A.7a)."""
+        return self.tau / Xm ** 2
+
+
+@lru_cache(maxsize=STRUCTURE_CACHE)
+def structure_factor(N, Df):
+    """Cached aggregate structure factor.
+
+    Parameters
+    ----------
+    N: int
+        Number of monomers.
+    Df: float
+        Fractal dimension.
+
+    Returns
+    -------
+    StructureFactor
+        Tabulated structure factor shared between the calls.
+
+    """
+    return StructureFactor(N, Df)
+
+
+class PhaseMatrix:
+    """Compact fractal aggregate scattering result.
+
+    The phase matrix elements are stored in a single contiguous array
+    (one row per element) and the efficiencies as attributes.
+
+    The elements are stored on the full `2 * nang - 1` angles grid: they
+    are not symmetric about π/2, so a half-range layout (`0..π/2` and the
+    mirrored half) would hold `2 * nang` values. The tables size is
+    reduced with the `elements` and the `precision` instead.
+
+    Parameters
+    ----------
+    Qs: float
+        Scattering efficiency.
+    Qa: float
+        Absorption efficiency.
+    Qe: float
+        Extinction efficiency.
+    elements: tuple
+        Phase matrix elements names (rows order).
+    data: numpy.ndarray
+        Phase matrix elements (elements, angles).
+
+    """
+
+    def __init__(self, Qs, Qa, Qe, elements, data):
+        self.Qs = Qs
+        self.Qa = Qa
+        self.Qe = Qe
+        self.elements = tuple(elements)
+        self.data = data
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} | Elements: {", ".join(self.elements)}>'
+
+    def __getitem__(self, element):
+        """Phase matrix element (view on the data array)."""
+        if element not in self.elements:
+            raise KeyError(f'Phase matrix element `{element}` is not available')
+        return self.data[self.elements.index(element)]
+
+    @property
+    def theta(self):
+        """Phase function angles (radians)."""
+        return np.linspace(0, np.pi, self.data.shape[-1])
+
+
+def fractals_phase_matrix(Df, N, Xm, nr, ni, nang=NANG, force=False, elements=ELEMENTS,
+                          out=None, monomer=None, precision='double'):
+    """Compact fractal aerosols scattering based on Tomasko et al. 2008.
+
+    Only the requested phase matrix elements are computed and they can be
+    written directly in a preallocated buffer (eg. a memory-mapped table).
+
+    Parameters
+    ----------
+    Df: float
+        Fractal dimension.
+    N: int
+        Number of monomers.
+    Xm: float
+        Monomer size parameter (m).
+    nr: float
+        Particle real optical index.
+    ni: float
+        Particle real imaginary index.
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    force: bool, optional
+        Bypass validity checks.
+    elements: tuple, optional
+        Requested phase matrix elements (default: all of them).
+    out: numpy.ndarray, optional
+        Output buffer with a `(len(elements), 2 * nang - 1)` shape.
+    monomer: tuple, optional
+        Precomputed monomer Mie scattering (see `fractals_tomasko_2008`).
+    precision: str, optional
+        Precision of the phase matrix elements (`double` or `single`),
+        if `out` is not provided.
+
+    Returns
+    -------
+    PhaseMatrix
+        Efficiencies and phase matrix elements.
+
+    Raises
+    ------
+    ValueError
+        If the arguments are outside their validity range, if an element
+        is unknown or if the `out` buffer shape does not match.
+
+    """
+    result, _ = _tomasko_2008(Df, N, Xm, nr, ni, nang, force, False,
+                              monomer, precision, elements, out)
+    return result
 
 
-def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: disable=C901
+def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False,
+                          jacobian=False, monomer=None, precision='double'):
     """Compute fractal aerosols scattering based on Tomasko et al. 2008 empirical model.
 
     DOI: 10.1016/j.pss.2007.11.019
 
+    See `fractals_phase_matrix` for a compact output with only
+    the requested phase matrix elements.
+
     Parameters
     ----------
     Df: float
@@ -26,6 +320,16 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
         Number of angles for the phase function (range from 0 to π/2).
     force: bool, optional
         Bypass validity checks.
+    jacobian: bool, optional
+        Also return the analytic derivatives of the efficiencies and `P11`
+        with respect to `nr`, `ni` and `Xm`.
+    monomer: tuple, optional
+        Precomputed monomer `mie_bohren_huffman(Xm, complex(nr, ni), nang,
+        full_output=True, jacobian=jacobian)` output, to be shared between
+        aggregates made of the same monomers.
+    precision: str, optional
+        Precision of the monomer angular sums and of the phase
+        matrix elements (`double` or `single`).
 
     Returns
     -------
@@ -37,6 +341,9 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
         Extinction efficiency.
     P_ij: numpy.ndarray
         Functions which correspond to the (complex) phase functions.
+    jac: dict
+        Only if `jacobian=True`, derivatives of `Qs`, `Qa`, `Qe` and `P11`
+        (first axis: `[d/dnr, d/dni, d/dXm]`).
 
     Raises
     ------
@@ -44,7 +351,26 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
         If the provided arguments are outside their validity range.
         Use `force=True` to disable theses tests.
 
-    """  # pylint: disable=too-many-locals
+    """
+    result, jac = _tomasko_2008(Df, N, Xm, nr, ni, nang, force, jacobian,
+                                monomer, precision, TOMASKO_ELEMENTS, None)
+
+    out = (result.Qs, result.Qa, result.Qe, *result.data)
+
+    return out if not jacobian else out + (jac,)
+
+
+def _tomasko_2008(Df, N, Xm, nr, ni, nang, force, jacobian,  # noqa: C901
+                  monomer, precision, elements, out):
+    """Tomasko et al. 2008 empirical model core (see `fractals_tomasko_2008`).
+
+    Returns
+    -------
+    PhaseMatrix, dict
+        Efficiencies and requested phase matrix elements (written in `out`
+        if provided) and derivatives (`None` if `jacobian=False`).
+
+    """  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
     # ---------------------------------------
     # Table A1: Single-scattering parameters
     # ---------------------------------------
@@ -77,17 +403,7 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
     # ----------------------------------------
     # Table A2: Empirical parameters required
     # ----------------------------------------
-    # Geometric [Geometric parameters are in units of monomer radius]
-    D_cut = 3.194
-    # Geometric [Geometric parameters are in units of monomer radius]
-    R1 = 1.598
-    # Geometric [Geometric parameters are in units of monomer radius]
-    R2 = 3.478
-    # Geometric [Geometric parameters are in units of monomer radius]
-    Rcut = 10_000
-    # Geometric [Geometric parameters are in units of monomer radius]
-    #           [Theoretically constrained]
-    Rmin = 2
+    # Geometric parameters: see `_aggregate_geometry`
 
     C_abs_m_1 = 0.606     # Absorption
     E_abs_m_1 = 2.525     # Absorption
@@ -117,37 +433,45 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
 
     # A.2.1. Geometry
     # ----------------
-    Rmax = R1 * np.power(N * np.log(Rcut), 1 / Df)     # (A.1a)
-    R0 = np.arange(Rmin, Rmax, 1 / 8)
-    if len(R0) < 100:
-        R0 = np.linspace(Rmin, Rmax, 100)              # Nb pt > 100
-
-    Nc = ((1 - np.exp(-np.power(R0 / R1, Df) / N))
-          * (1 - np.exp(-np.power(R0 / R2, D_cut)))
-          + 2 / N) / (1 + 2 / N)                       # (A.1b)
-
-    F0 = [Nc[0]]
-    for ii in range(1, len(R0) - 1):
-        F0.append(.5 * (Nc[ii + 1] - Nc[ii - 1]))      # (A.1c)
-    F0.append(0)
+    sf = structure_factor(N, Df)                       # (A.1)
 
     # Monomer scattering Mie parameters
     # ---------------------------------------------
-    s1, s2, Qe, Qs, _, _ = mie_bohren_huffman(Xm, complex(nr, ni), nang)
+    fdtype, _ = _precision(precision)
+
+    if monomer is None:
+        monomer = mie_bohren_huffman(Xm, complex(nr, ni), nang, full_output=True,
+                                     jacobian=jacobian, precision=precision)
+
+    s1, s2, Qe, Qs, _, _, info = monomer
     Qa = Qe - Qs
     theta = np.linspace(0, np.pi, len(s1))
 
-    S11 = .5 * (np.abs(s2) ** 2 + np.abs(s1) ** 2)
-    S12 = .5 * (np.abs(s2) ** 2 - np.abs(s1) ** 2)
-    S33 = .5 * (np.conj(s2) * s1 + s2 * np.conj(s1))
-    S34 = .5j * (np.conj(s2) * s1 - s2 * np.conj(s1))
+    # Only the requested elements are computed (P11 requires P22)
+    elements = tuple(elements)
+    unknown = set(elements) - set(ELEMENTS)
+    if unknown:
+        raise ValueError(f"Unknown phase matrix element(s): {', '.join(sorted(unknown))}")
 
-    norm = .5 * np.trapz(S11 * np.sin(theta), x=theta)
+    need_p21 = 'P21' in elements
+    need_p33 = 'P33' in elements or 'P44' in elements
+    need_p43 = 'P43' in elements
 
+    S11 = .5 * (np.abs(s2) ** 2 + np.abs(s1) ** 2)
+    norm = .5 * np.trapz(S11 * np.sin(theta), x=theta)
     P11_mie = S11 / norm
-    P21_mie = S12 / norm             # S12 = S21
-    P33_mie = np.real(S33) / norm
-    P43_mie = - np.real(S34) / norm  # S34 = S43
+
+    if need_p21:
+        S12 = .5 * (np.abs(s2) ** 2 - np.abs(s1) ** 2)
+        P21_mie = S12 / norm             # S12 = S21
+
+    if need_p33:
+        S33 = .5 * (np.conj(s2) * s1 + s2 * np.conj(s1))
+        P33_mie = np.real(S33) / norm
+
+    if need_p43:
+        S34 = .5j * (np.conj(s2) * s1 - s2 * np.conj(s1))
+        P43_mie = - np.real(S34) / norm  # S34 = S43
 
     # A.2.2. Monomer scattering Mie
     # ---------------------------------------------
@@ -156,9 +480,6 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
     Cabs_mon = Qa * np.pi * Xm ** 2            # (A.2c)
 
     Ymon = P11_mie * Csca_mon                  # (A.2d)
-    Polar_mon = -P21_mie / P11_mie             # (A.2e)
-    R33_mon = P33_mie / P11_mie                # (A.2f)
-    R43_mon = P43_mie / P11_mie                # (A.2g)
     Ray_11 = 3 / 4 * (1 + np.cos(theta) ** 2)  # (A.3a)
     Ray_21 = -3 / 4 * np.sin(theta) ** 2       # (A.3b)
     Polar_Ray = -Ray_21 / Ray_11               # (A.3c)
@@ -167,15 +488,9 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
 
     # A.2.3. Coherent scattering and optical depth
     # ---------------------------------------------
-    dist = R0 * Xm                             # (A.4)
-    # Total coherent scattering
-    Fc = []
-    for tt in theta:
-        # (A.5) # WARNING: sinc(x) = sin(pi.x)/(pi.x)
-        Fi = np.sinc(2 * dist * np.sin(tt / 2) / np.pi)
-        Fc.append(np.sum(np.multiply(Fi, F0)) * (N ** 2 - N) + N)        # (A.6)
-
-    tau_coef = np.sum(np.divide(F0, dist ** 2)) * (N - 1) / (4 * np.pi)  # (A.7a)
+    # Total coherent scattering (tabulated structure factor)
+    Fc = sf.coherent(Xm, theta)  # (A.4 + A.5 + A.6)
+    tau_coef = sf.tau_coef(Xm)   # (A.7a)
 
     taue_out = tau_coef * Cext_mon  # (A.7b)
     taus_out = tau_coef * Csca_mon  # (A.7c)
@@ -194,8 +509,15 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
     # A.2.5: Single-scattering approximation
     # ---------------------------------------
     P22 = Fc * Ymon * np.exp(-taue_out)   # (A.11a)
-    P33 = P22 * R33_mon                   # (A.11b)
-    P43 = P22 * R43_mon                   # (A.11c)
+    values = {'P22': P22}
+
+    if need_p33:
+        R33_mon = P33_mie / P11_mie                # (A.2f)
+        values['P33'] = P22 * R33_mon              # (A.11b)
+
+    if need_p43:
+        R43_mon = P43_mie / P11_mie                # (A.2g)
+        values['P43'] = P22 * R43_mon              # (A.11c)
 
     # A.2.6. Empirical correction for multiple scattering within aggregate
     # ---------------------------------------------------------------------
@@ -207,29 +529,36 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
 
     depol = depol * P22[nang - 1] * (1 - depol[nang - 1])  # (A.12c)
     P11 = P22 + depol                                      # (A.12d)
-    P44 = P33 + depol * (2 / np.pi * theta - 1)            # (A.12e)
+    values['P11'] = P11
+
+    if 'P44' in elements:
+        values['P44'] = values['P33'] + depol * (2 / np.pi * theta - 1)  # (A.12e)
 
     # A.2.7. Linear Polarizartion
     # ----------------------------
-    Mpol = 1 - C_p21_m_1 * M0 ** 2 / np.sqrt(N - 1) \
-             - C_p21_m_2 * (M0 * Xm) ** E_p21_m_1   \
-        * np.exp(-C_p21_ta * taua_out)              \
-        * (N - 1) ** E_p21_n_1                      \
-        * np.exp(C_p21_ts * taus_out)  # (A.13a)
+    if need_p21:
+        Polar_mon = -P21_mie / P11_mie                 # (A.2e)
+        Mpol = 1 - C_p21_m_1 * M0 ** 2 / np.sqrt(N - 1) \
+                 - C_p21_m_2 * (M0 * Xm) ** E_p21_m_1   \
+            * np.exp(-C_p21_ta * taua_out)              \
+            * (N - 1) ** E_p21_n_1                      \
+            * np.exp(C_p21_ts * taus_out)  # (A.13a)
 
-    polar_agg = Polar_mon * Mpol       # (A.13b)
-    P21 = - P11 * polar_agg            # (A.13c)
+        polar_agg = Polar_mon * Mpol       # (A.13b)
+        values['P21'] = - P11 * polar_agg  # (A.13c)
 
     # A.2.8. Scattering cross section
     # --------------------------------
     Csca = .5 * np.trapz(P11 * np.sin(theta), x=theta)  # (A.14a)
 
-    P11_out = P11 / Csca
-    P22_out = P22 / Csca
-    P33_out = P33 / Csca
-    P44_out = P44 / Csca
-    P21_out = P21 / Csca
-    P43_out = P43 / Csca
+    if out is None:
+        out = np.empty((len(elements), len(theta)), dtype=fdtype)
+    elif np.shape(out) != (len(elements), len(theta)):
+        raise ValueError(f"`out` shape must be {(len(elements), len(theta))} "
+                         f"(received {np.shape(out)})")
+
+    for k, element in enumerate(elements):
+        np.divide(values[element], Csca, out=out[k])
 
     corr_sca = 1 + C_sca_m_3                         \
         * (M0 - C_sca_m_4) * np.sin(C_sca_x_1 * Xm)  \
@@ -241,30 +570,121 @@ def fractals_tomasko_2008(Df, N, Xm, nr, ni, nang=NANG, force=False):# noqa: dis
     Qa_out = Cabs / (np.pi * Xm ** 2 * np.power(N, 2 / 3)) * corr_abs  # (A.10b + A.15b)
     Qe_out = Qs_out + Qa_out                                           # (A.15c)
 
-    return Qs_out, Qa_out, Qe_out, P11_out, P22_out, P33_out, P44_out, P21_out, P43_out
+    result = PhaseMatrix(Qs_out, Qa_out, Qe_out, elements, out)
+
+    if not jacobian:
+        return result, None
 
+    # Derivatives of P11 and Q with respect to [nr, ni, Xm]
+    # propagated through the (A.2) to (A.15) formulae
+    # ------------------------------------------------------
+    dXm = np.array([0, 0, 1])
+    ds1, ds2 = info['jac']['s1'], info['jac']['s2']
+    sin = np.sin(theta)
 
-def fractals(wvln, nr, ni, rm, Df, N, nang=NANG, force=False):
+    dS11 = np.real(np.conj(s2) * ds2 + np.conj(s1) * ds1)
+    dnorm = .5 * np.trapz(dS11 * sin, x=theta, axis=1)[:, None]
+
+    dP11_mie = (dS11 - P11_mie * dnorm) / norm
+
+    dCsca_mon = info['jac']['qsca'] * np.pi * Xm ** 2 + 2 * Csca_mon / Xm * dXm  # (A.2a)
+    dCext_mon = info['jac']['qext'] * np.pi * Xm ** 2 + 2 * Cext_mon / Xm * dXm  # (A.2b)
+    dCabs_mon = dCext_mon - dCsca_mon                                            # (A.2c)
+
+    dYmon = dP11_mie * Csca_mon + P11_mie * dCsca_mon[:, None]  # (A.2d)
+
+    w = (m ** 2 - 1) / (m ** 2 + 2)
+    dw = 6 * m / (m ** 2 + 2) ** 2
+    dM0 = np.real(np.conj(w) * dw * np.array([1, 1j, 0])) / M0  # (A.3e)
+
+    dFc = sf.coherent_derivative(Xm, theta) * dXm[:, None]  # (A.6)
+    dtau_coef = -2 * tau_coef / Xm * dXm                    # (A.7a)
+
+    dtaue = dtau_coef * Cext_mon + tau_coef * dCext_mon  # (A.7b)
+    dtaus = dtau_coef * Csca_mon + tau_coef * dCsca_mon  # (A.7c)
+    dtaua = dtau_coef * Cabs_mon + tau_coef * dCabs_mon  # (A.7d)
+
+    dCabs = (dCabs_mon - Cabs_mon * dtaua) * N * np.exp(-taua_out)  # (A.8 + A.9)
+    abs_m = C_abs_m_1 * M0 ** E_abs_m_1 \
+        + C_abs_m_2 * M0 ** E_abs_m_2 * np.sin(C_abs_x_1 * Xm)
+    dabs_m = (C_abs_m_1 * E_abs_m_1 * M0 ** (E_abs_m_1 - 1)
+              + C_abs_m_2 * E_abs_m_2 * M0 ** (E_abs_m_2 - 1)
+              * np.sin(C_abs_x_1 * Xm)) * dM0 \
+        + C_abs_m_2 * M0 ** E_abs_m_2 * C_abs_x_1 * np.cos(C_abs_x_1 * Xm) * dXm
+    dcorr_abs = (dabs_m - C_abs_x_2 * abs_m * dXm) * np.exp(-C_abs_x_2 * Xm)  # (A.10a)
+
+    dP22 = (dFc * Ymon + Fc * dYmon) * np.exp(-taue_out) - P22 * dtaue[:, None]  # (A.11a)
+
+    depol_c = C_p11_m_1 * M0 ** 2 / np.power(N - 1, 2 / 3) * (1 + Polar_Ray)     # (A.12a)
+    ddepol_c = 2 * C_p11_m_1 * M0 / np.power(N - 1, 2 / 3) \
+        * (1 + Polar_Ray) * dM0[:, None]
+    ddepol_ll = C_p11_m_2 * (dM0 * np.power(taus_out, E_p11_t_1) + M0 * E_p11_t_1
+                             * np.power(taus_out, E_p11_t_1 - 1) * dtaus)  # (A.12b)
+
+    if Xm <= 1.6:
+        ddepol_c = np.where(depol_c < depol_ll, ddepol_ll[:, None], ddepol_c)
+        depol_c = np.clip(depol_c, a_min=depol_ll, a_max=None)
+
+    ddepol = ddepol_c * P22[nang - 1] * (1 - depol_c[nang - 1]) \
+        + depol_c * dP22[:, nang - 1, None] * (1 - depol_c[nang - 1]) \
+        - depol_c * P22[nang - 1] * ddepol_c[:, nang - 1, None]  # (A.12c)
+    dP11 = dP22 + ddepol                                        # (A.12d)
+
+    dCsca = .5 * np.trapz(dP11 * sin, x=theta, axis=1)  # (A.14a)
+    dP11_out = (dP11 - P11 / Csca * dCsca[:, None]) / Csca
+
+    dcorr_sca = C_sca_m_3 * np.exp(-Xm * C_sca_x_2) * (
+        dM0 * np.sin(C_sca_x_1 * Xm)
+        + (M0 - C_sca_m_4) * (C_sca_x_1 * np.cos(C_sca_x_1 * Xm)
+                              - C_sca_x_2 * np.sin(C_sca_x_1 * Xm)) * dXm
+    )  # (A.14c)
+
+    area = np.pi * Xm ** 2 * np.power(N, 2 / 3)
+    dQs_out = (dCsca * corr_sca + Csca * dcorr_sca) / area \
+        - 2 * Qs_out / Xm * dXm  # (A.15a)
+    dQa_out = (dCabs * corr_abs + Cabs * dcorr_abs) / area \
+        - 2 * Qa_out / Xm * dXm  # (A.15b)
+
+    jac = {
+        'Qs': dQs_out,
+        'Qa': dQa_out,
+        'Qe': dQs_out + dQa_out,  # (A.15c)
+        'P11': dP11_out,
+    }
+
+    return result, jac
+
+
+def fractals(wvln, nr, ni, rm, Df, N, nang=NANG, force=False, jacobian=False,
+             precision='double'):
     """Compute fractals cross-sections and phase function based on Tomasko 2008.
 
+    Array inputs are broadcasted together and the monomers Mie scattering
+    is computed at once for all the indexes with the same size parameter.
+
     Parameters
     ----------
-    wvln: float
+    wvln: float or numpy.ndarray
         Wavelength (m).
-    nr: float
+    nr: float or numpy.ndarray
         Particle real optical index.
-    ni: float
+    ni: float or numpy.ndarray
         Particle real imaginary index.
-    rm: float
+    rm: float or numpy.ndarray
         Monomer radius (m).
     Df: float
         Fractal dimension.
-    N: int
+    N: int or numpy.ndarray
         Number of monomers.
     nang: int, optional
         Number of angles for the phase function (range from 0 to π/2).
     force: bool, optional
         Bypass validity checks.
+    jacobian: bool, optional
+        Also return the analytic derivatives of the cross-sections and
+        the phase function with respect to `nr`, `ni` and `rm`.
+    precision: str, optional
+        Precision of the phase function (`double` or `single`).
 
     Returns
     -------
@@ -279,16 +699,89 @@ def fractals(wvln, nr, ni, rm, Df, N, nang=NANG, force=False):
     theta: numpy.ndarray
         Phase function angles (radians).
     P: numpy.ndarray
-        Phase function.
+        Phase function (last axis).
+    jac: dict
+        Only if `jacobian=True`, derivatives of `qsct`, `qext`, `qabs`
+        and `P` (first axis: `[d/dnr, d/dni, d/drm]`).
+
+    Raises
+    ------
+    ValueError
+        If the jacobian is requested with array inputs or in single precision.
+
+    """  # pylint: disable=too-many-locals
+    batch = precision != 'double' or np.broadcast(wvln, nr, ni, rm, N).ndim
+
+    if jacobian and batch:
+        raise ValueError('The jacobian is only available with scalar inputs '
+                         'in double precision')
+
+    if batch:
+        return _fractals_batch(wvln, nr, ni, rm, Df, N, nang, force, precision)
 
-    """
     Xm = 2 * np.pi * rm / wvln
 
-    Qs, Qa, Qe, P, *_ = fractals_tomasko_2008(Df, N, Xm, nr, ni, nang, force)
-    qsct = Qs * np.pi * rm ** 2 * np.power(N, 2 / 3)
-    qext = Qe * np.pi * rm ** 2 * np.power(N, 2 / 3)
-    qabs = Qa * np.pi * rm ** 2 * np.power(N, 2 / 3)
+    # Only P11 is required
+    result, jac = _tomasko_2008(Df, N, Xm, nr, ni, nang, force, jacobian,
+                                None, precision, ('P11',), None)
+    Qs, Qa, Qe, P = result.Qs, result.Qa, result.Qe, result['P11']
+
+    area = np.pi * rm ** 2 * np.power(N, 2 / 3)
+    qsct = Qs * area
+    qext = Qe * area
+    qabs = Qa * area
     theta = np.linspace(0, np.pi, len(P))
     gg = None  # <- Not calculated
 
-    return qsct, qext, qabs, gg, theta, P
+    if not jacobian:
+        return qsct, qext, qabs, gg, theta, P
+
+    # Convert the derivatives with respect to Xm into derivatives with respect to rm
+    dx_drm = np.array([1, 1, Xm / rm])
+    drm = np.array([0, 0, 1])
+
+    jac = {
+        'qsct': jac['Qs'] * dx_drm * area + 2 * qsct / rm * drm,
+        'qext': jac['Qe'] * dx_drm * area + 2 * qext / rm * drm,
+        'qabs': jac['Qa'] * dx_drm * area + 2 * qabs / rm * drm,
+        'P': jac['P11'] * dx_drm[:, None],
+    }
+
+    return qsct, qext, qabs, gg, theta, P, jac
+
+
+def _fractals_batch(wvln, nr, ni, rm, Df, N, nang, force, precision):
+    """Batched fractals cross-sections and phase functions (see `fractals`).
+
+    The monomers Mie scattering is vectorized over the refraction
+    indexes for each size parameter.
+
+    """  # pylint: disable=too-many-locals
+    scalar = np.broadcast(wvln, nr, ni, rm, N).ndim == 0
+    wvln, nr, ni, rm, N = np.broadcast_arrays(*np.atleast_1d(wvln, nr, ni, rm, N))
+    shape = wvln.shape
+
+    fdtype, _ = _precision(precision)
+    Xm = 2 * np.pi * rm / wvln
+    Qs, Qa, Qe = np.empty(shape), np.empty(shape), np.empty(shape)
+    P = np.empty(shape + (2 * nang - 1,), dtype=fdtype)
+
+    for x in np.unique(Xm):
+        mask = Xm == x
+        monomers = mie_bohren_huffman(x, nr[mask] + 1j * ni[mask], nang,
+                                      full_output=True, precision=precision)
+
+        for k, i in enumerate(map(tuple, np.argwhere(mask))):
+            monomer = tuple(value[k] for value in monomers[:-1]) + (monomers[-1],)
+            result = fractals_phase_matrix(
+                Df, N[i], x, nr[i], ni[i], nang, force, elements=('P11',),
+                out=P[i][None], monomer=monomer)
+            Qs[i], Qa[i], Qe[i] = result.Qs, result.Qa, result.Qe
+
+    area = np.pi * rm ** 2 * np.power(N, 2 / 3)
+    theta = np.linspace(0, np.pi, 2 * nang - 1)
+
+    if scalar:
+        return Qs[0] * area[0], Qe[0] * area[0], Qa[0] * area[0], None, theta, P[0]
+
+    return Qs * area, Qe * area, Qa * area, None, theta, P
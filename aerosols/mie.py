@@ -1,13 +1,24 @@
 """Mie module."""
 
+from functools import lru_cache
+
 import numpy as np
 
 
 NANG = 91
 NMXX = 150e3
-
-
-def mie_bohren_huffman(x, refrel, nang=NANG):
+RICCATI_BESSEL_CACHE = 256
+ADA_QUADRATURE = 64  # Incidence angles of the hemispherical reflectance
+ADA_EDGE = 2         # Edge effects error coefficient (`x^-2/3`)
+ADA_OPACITY = .15    # Transmitted rays error coefficient (`(x ni)^-2`)
+PRECISIONS = {
+    'double': (np.float64, np.complex128),
+    'single': (np.float32, np.complex64),
+}
+
+
+def mie_bohren_huffman(x, refrel, nang=NANG, tol=None, full_output=False,  # noqa: C901
+                       jacobian=False, precision='double'):
     """
     Compute mie scattering based on Bohren and Huffman theory
 
@@ -16,10 +27,28 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
     x: float
         Size parameter = k*radius = 2π/λ * radius
         (λ is the wavelength in the medium around the scatterers).
-    refrel: float
+    refrel: complex or numpy.ndarray
         Refraction index (n in complex form for example:  1.5 + 0.02i.
+        For an array of refraction indexes, the outputs are computed
+        at once and are stacked on the leading axes (the Riccati-Bessel
+        functions of `x` are shared).
     nang: int, optional
         Number of angles for S1 and S2 function in range from 0 to π/2.
+    tol: float, optional
+        Relative tolerance on the `Qsca`, `Qext`, `S1` and `S2` increments.
+        The series is stopped once the last term is below `tol`
+        (but never before `x + 1` terms). If `None` (default), the
+        Wiscombe criterion `x + 4 x^1/3 + 2` is used.
+    full_output: bool, optional
+        Return an extra `info` dictionary.
+    jacobian: bool, optional
+        Compute the analytic derivatives of `S1`, `S2`, `Qext` and `Qsca`
+        with respect to the real and imaginary parts of `refrel` and to `x`
+        (implies `full_output=True`).
+    precision: str, optional
+        Precision of the angular sums (`double` or `single`). The
+        recurrences of the Mie coefficients are always computed
+        in double precision.
 
     Returns
     -------
@@ -33,6 +62,12 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
         Backscatter efficiency.
     gsca:
         Asymmetry parameter.
+    info: dict
+        Only if `full_output=True`, with `nterms` the number of terms summed
+        and `jac` the derivatives (if `jacobian=True`), stored in a dict
+        with `s1`, `s2`, `qext` and `qsca` keys (first axis:
+        `[d/dnr, d/dni, d/dx]`). With an array of refraction indexes,
+        the number of terms is shared by all of them.
 
     Raises
     ------
@@ -46,7 +81,7 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
 
     Source: http://scatterlib.googlecode.com/files/bhmie_herbert_kaiser_july2012.py
 
-    """  # pylint: disable=too-many-locals
+    """  # pylint: disable=too-many-locals,too-many-branches
     if nang > 1_000:
         raise ValueError(f"Require NANG = {nang} <= 1000")
 
@@ -54,72 +89,59 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
         raise ValueError(
             f"Require NANG = {nang} > 1 in order to calculate scattering intensities")
 
-    ang = .5 * np.pi / (nang - 1)
-    mu = np.cos(np.arange(0, nang, 1) * ang)
-
-    # Series expansion terminated after NSTOP terms
-    # Logarithmic derivatives calculated from NMX on down
-
-    xstop = x + 4 * np.power(x, 1 / 3) + 2
-    # xstop = x + 4 * np.power(x, 1/3) + 10  # Old form
-
-    ymod = abs(x * refrel)
+    if tol is not None and tol <= 0:
+        raise ValueError(f"Require TOL = {tol} > 0")
 
-    nmx = np.fix(max(xstop, ymod) + 15)
-
-    # BTD experiment 91/1/15: add one more term to series and compare results
-    #   NMX = AMAX1(XSTOP, YMOD) + 16
-    # test: compute 7001 wavelen > hs between .0001 and 1000 micron
-    # for a = 1.0 micron SiC grain.  When NMX increased by 1, only a single
-    # computed number changed (out of 4*7001) and it only changed by 1/8387
-    # Conclusion: we are indeed retaining enough terms in series!
+    fdtype, cdtype = _precision(precision)
 
-    if nmx > NMXX:
-        raise ValueError(f"nmx = {nmx} > NMXX = {NMXX} for |m|x = {ymod}")
+    ang = .5 * np.pi / (nang - 1)
+    mu = np.cos(np.arange(0, nang, 1) * ang).astype(fdtype)
 
-    s1_1 = np.zeros(nang, dtype=np.complex128)
-    s1_2 = np.zeros(nang, dtype=np.complex128)
-    s2_1 = np.zeros(nang, dtype=np.complex128)
-    s2_2 = np.zeros(nang, dtype=np.complex128)
-    pi = np.zeros(nang, dtype=np.complex128)
-    tau = np.zeros(nang, dtype=np.complex128)
-    pi0 = np.zeros(nang, dtype=np.complex128)
-    pi1 = np.ones(nang, dtype=np.complex128)
+    refrel = np.asarray(refrel, dtype=np.complex128)
+    xstop, nmx = _series_limits(x, refrel, tol)
 
-    # Logarithmic derivative D(J) calculated by downward recurrence
-    # beginning with initial value (0,0) at J = NMX
+    # The angular sums are vectorized over the refraction indexes
+    shape = refrel.shape
+    s1_1 = np.zeros(shape + (nang,), dtype=cdtype)
+    s1_2 = np.zeros(shape + (nang,), dtype=cdtype)
+    s2_1 = np.zeros(shape + (nang,), dtype=cdtype)
+    s2_2 = np.zeros(shape + (nang,), dtype=cdtype)
+    pi = np.zeros(nang, dtype=cdtype)
+    tau = np.zeros(nang, dtype=cdtype)
+    pi0 = np.zeros(nang, dtype=cdtype)
+    pi1 = np.ones(nang, dtype=cdtype)
 
-    nn = int(nmx) - 1
-    d = np.zeros(nn + 1, dtype=np.complex128)
-    for n in range(0, nn):
-        en = (nmx - n) / (x * refrel)
-        d[nn - n - 1] = en - 1 / (d[nn - n] + en)
+    d = _log_derivative(x, refrel, nmx)
 
     # Riccati-Bessel functions with real argument X
-    # calculated by upward recurrence
+    # calculated by upward recurrence (cached for each X)
+
+    nstop = int(xstop)
+    psi_n, chi_n = riccati_bessel(x, nstop)
+    xi_n = psi_n - chi_n * 1j
 
     an, bn = None, None
-    psi0 = np.cos(x)
-    psi1 = np.sin(x)
-    chi0 = -np.sin(x)
-    chi1 = np.cos(x)
-    xi1 = psi1 - chi1 * 1j
     qsca = 0
+    qext = 0
     gsca = 0
     p = -1
 
-    nstop = int(xstop)
+    if jacobian:
+        full_output = True
+        ds1_1_jac = np.zeros((3,) + shape + (nang,), dtype=cdtype)
+        ds1_2_jac = np.zeros((3,) + shape + (nang,), dtype=cdtype)
+        ds2_1_jac = np.zeros((3,) + shape + (nang,), dtype=cdtype)
+        ds2_2_jac = np.zeros((3,) + shape + (nang,), dtype=cdtype)
+        dqsca_jac = np.zeros((3,) + shape)
+
     for n in range(0, nstop):
         en = n + 1
         fn = (2 * en + 1) / (en * (en + 1))
 
-    # for given N, PSI  = psi_n        CHI  = chi_n
-    #           PSI1 = psi_{n-1}    CHI1 = chi_{n-1}
-    #           PSI0 = psi_{n-2}    CHI0 = chi_{n-2}
-    # Calculate psi_n and chi_n
-        psi = (2 * en - 1) * psi1 / x - psi0
-        chi = (2 * en - 1) * chi1 / x - chi0
-        xi = psi - chi * 1j
+    # for given N, PSI  = psi_n        XI  = xi_n
+    #           PSI1 = psi_{n-1}    XI1 = xi_{n-1}
+        psi, psi1 = psi_n[en], psi_n[en - 1]
+        xi, xi1 = xi_n[en], xi_n[en - 1]
 
     # Store previous values of AN and BN for use
     # in computation of g=<np.cos(theta)>
@@ -128,10 +150,10 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
             bn1 = bn
 
     # Compute AN and BN:
-        an = (d[n] / refrel + en / x) * psi - psi1
-        an = an / ((d[n] / refrel + en / x) * xi - xi1)
-        bn = (refrel * d[n] + en / x) * psi - psi1
-        bn = bn / ((refrel * d[n] + en / x) * xi - xi1)
+        an = (d[..., n] / refrel + en / x) * psi - psi1
+        an = an / ((d[..., n] / refrel + en / x) * xi - xi1)
+        bn = (refrel * d[..., n] + en / x) * psi - psi1
+        bn = bn / ((refrel * d[..., n] + en / x) * xi - xi1)
 
     # Augment sums for Qsca and g=<np.cos(theta)>
         qsca += (2 * en + 1) * (abs(an) ** 2 + abs(bn) ** 2)
@@ -145,10 +167,13 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
 
     # Now calculate scattering intensity pattern
     # First do angles from 0 to 90
+        a, b = an[..., None].astype(cdtype), bn[..., None].astype(cdtype)
         pi = np.copy(pi1)
         tau = en * mu * pi - (en + 1) * pi0
-        s1_1 += fn * (an * pi + bn * tau)
-        s2_1 += fn * (an * tau + bn * pi)
+        ds1_1 = fn * (a * pi + b * tau)
+        ds2_1 = fn * (a * tau + b * pi)
+        s1_1 += ds1_1
+        s2_1 += ds2_1
 
     # Now do angles greater than 90 using PI and TAU from
     # angles less than 90.
@@ -156,14 +181,23 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
     #   remember that we have to reverse the order of the elements
     #   of the second part of s1 and s2 after the calculation
         p = -p
-        s1_2 += fn * p * (an * pi - bn * tau)
-        s2_2 += fn * p * (bn * pi - an * tau)
+        ds1_2 = fn * p * (a * pi - b * tau)
+        ds2_2 = fn * p * (b * pi - a * tau)
+        s1_2 += ds1_2
+        s2_2 += ds2_2
 
-        psi0 = psi1
-        psi1 = psi
-        chi0 = chi1
-        chi1 = chi
-        xi1 = psi1 - chi1 * 1j
+    # Propagate the derivatives of AN and BN
+        if jacobian:
+            dan, dbn = _mie_coefficients_jacobian(
+                en, x, refrel, d[..., n], psi, psi1, xi, xi1, an, bn)
+
+            dqsca_jac += 2 * (2 * en + 1) * np.real(np.conj(an) * dan + np.conj(bn) * dbn)
+
+            dan, dbn = dan[..., None], dbn[..., None]
+            ds1_1_jac += fn * (dan * pi + dbn * tau)
+            ds2_1_jac += fn * (dan * tau + dbn * pi)
+            ds1_2_jac += fn * p * (dan * pi - dbn * tau)
+            ds2_2_jac += fn * p * (dbn * pi - dan * tau)
 
     # Compute pi_n for next value of n
     # For each angle J, compute pi_n+1
@@ -171,40 +205,663 @@ def mie_bohren_huffman(x, refrel, nang=NANG):
         pi1 = ((2 * en + 1) * mu * pi - (en + 1) * pi0) / en
         pi0 = np.copy(pi)
 
+    # Stop the series when the last terms are below the tolerance
+        if tol is not None:
+            qext += (2 * en + 1) * np.real(an + bn)
+            if en >= x + 1 and _converged(
+                tol,
+                ((2 * en + 1) * (abs(an) ** 2 + abs(bn) ** 2), qsca),
+                ((2 * en + 1) * np.real(an + bn), qext),
+                (np.hstack((ds1_1, ds2_1)), np.hstack((s1_1, s2_1))),
+                (np.hstack((ds1_2, ds2_2)), np.hstack((s1_2, s2_2))),
+            ):
+                break
+
     # Have summed sufficient terms.
     # Now compute QSCA, QEXT, QBACK and GSCA
 
     # We have to reverse the order of the elements of the second part of s1 and s2
-    s1 = np.concatenate((s1_1, s1_2[-2::-1]))
-    s2 = np.concatenate((s2_1, s2_2[-2::-1]))
+    s1 = np.concatenate((s1_1, s1_2[..., -2::-1]), axis=-1)
+    s2 = np.concatenate((s2_1, s2_2[..., -2::-1]), axis=-1)
     gsca = 2 * gsca / qsca
     qsca = 2 / x ** 2 * qsca
-    qext = 4 / x ** 2 * np.real(s1[0])
+    qext = 4 / x ** 2 * np.real(s1[..., 0])
 
     # More common definition of the backscattering efficiency,
     # so that the backscattering cross section really
     # has dimension of length squared
-    qback = 4 * (abs(s1[2 * (nang - 1)]) / x) ** 2
+    qback = 4 * (abs(s1[..., 2 * (nang - 1)]) / x) ** 2
     # qback = ((abs( s1[2 * nang - 2])/x )**2 )/np.pi  # Old form
 
+    if full_output:
+        info = {'nterms': n + 1}
+
+        if jacobian:
+            ds1 = np.concatenate((ds1_1_jac, ds1_2_jac[..., -2::-1]), axis=-1)
+            ds2 = np.concatenate((ds2_1_jac, ds2_2_jac[..., -2::-1]), axis=-1)
+            dx = np.reshape([0, 0, 1], (3,) + (1,) * len(shape))
+            info['jac'] = {
+                's1': ds1,
+                's2': ds2,
+                'qext': 4 / x ** 2 * np.real(ds1[..., 0]) - 2 * qext / x * dx,
+                'qsca': 2 / x ** 2 * dqsca_jac - 2 * qsca / x * dx,
+            }
+
+        return s1, s2, qext, qsca, qback, gsca, info
+
     return s1, s2, qext, qsca, qback, gsca
 
 
-def mie(wvln, nr, ni, r, nang=NANG):
+def _precision(precision):
+    """Real and complex dtypes of a precision.
+
+    Parameters
+    ----------
+    precision: str
+        `double` or `single`.
+
+    Returns
+    -------
+    numpy.dtype, numpy.dtype
+        Real and complex dtypes.
+
+    Raises
+    ------
+    ValueError
+        If the precision is unknown.
+
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision `{precision}` (available: "
+                         f"{', '.join(PRECISIONS)})")
+    return PRECISIONS[precision]
+
+
+def _series_limits(x, refrel, tol=None):
+    """Number of terms in the Mie series and start of the `D_n` recurrence.
+
+    Parameters
+    ----------
+    x: float
+        Size parameter.
+    refrel: numpy.ndarray
+        Refraction index(es).
+    tol: float, optional
+        Relative tolerance (see `mie_bohren_huffman`).
+
+    Returns
+    -------
+    float, float
+        Series limit `xstop` and logarithmic derivatives start `nmx`.
+
+    Raises
+    ------
+    ValueError
+        If `nmx` is above `NMXX`.
+
+    """
+    # Series expansion terminated after NSTOP terms
+    # Logarithmic derivatives calculated from NMX on down
+
+    xstop = x + 4 * np.power(x, 1 / 3) + 2
+    # xstop = x + 4 * np.power(x, 1/3) + 10  # Old form
+
+    # With a tolerance, the series is allowed to go up to the old form
+    # (the convergence test usually stops it well before)
+    if tol is not None:
+        xstop += 8
+
+    ymod = np.max(abs(x * refrel))
+
+    nmx = np.fix(max(xstop, ymod) + 15)
+
+    # BTD experiment 91/1/15: add one more term to series and compare results
+    #   NMX = AMAX1(XSTOP, YMOD) + 16
+    # test: compute 7001 wavelen > hs between .0001 and 1000 micron
+    # for a = 1.0 micron SiC grain.  When NMX increased by 1, only a single
+    # computed number changed (out of 4*7001) and it only changed by 1/8387
+    # Conclusion: we are indeed retaining enough terms in series!
+
+    if nmx > NMXX:
+        raise ValueError(f"nmx = {nmx} > NMXX = {NMXX} for |m|x = {ymod}")
+
+    return xstop, nmx
+
+
+def _log_derivative(x, refrel, nmx):
+    """Logarithmic derivatives `D_n(mx)` (vectorized over the refraction indexes).
+
+    Calculated by downward recurrence beginning with
+    initial value (0,0) at `n = nmx`.
+
+    Parameters
+    ----------
+    x: float
+        Size parameter.
+    refrel: numpy.ndarray
+        Refraction index(es).
+    nmx: float
+        Recurrence start.
+
+    Returns
+    -------
+    numpy.ndarray
+        `D_{n+1}(mx)` for `n = 0 ... nmx - 1` (last axis).
+
+    """
+    nn = int(nmx) - 1
+    d = np.zeros(refrel.shape + (nn + 1,), dtype=np.complex128)
+    for n in range(0, nn):
+        en = (nmx - n) / (x * refrel)
+        d[..., nn - n - 1] = en - 1 / (d[..., nn - n] + en)
+
+    return d
+
+
+@lru_cache(maxsize=RICCATI_BESSEL_CACHE)
+def riccati_bessel(x, nstop):
+    """Cached Riccati-Bessel functions of a real argument.
+
+    The functions are calculated by upward recurrence from
+    `psi_{-1} = cos(x)`, `psi_0 = sin(x)`, `chi_{-1} = -sin(x)`
+    and `chi_0 = cos(x)`. They only depend on the size parameter
+    and are shared between the refraction indexes.
+
+    Parameters
+    ----------
+    x: float
+        Size parameter.
+    nstop: int
+        Highest order.
+
+    Returns
+    -------
+    psi, chi: numpy.ndarray
+        Read-only `psi_n(x)` and `chi_n(x)` for `n = 0 ... nstop`.
+
+    """
+    psi = np.empty(nstop + 1)
+    chi = np.empty(nstop + 1)
+
+    psi0, psi[0] = np.cos(x), np.sin(x)
+    chi0, chi[0] = -np.sin(x), np.cos(x)
+
+    for n in range(1, nstop + 1):
+        psi[n] = (2 * n - 1) * psi[n - 1] / x - psi0
+        chi[n] = (2 * n - 1) * chi[n - 1] / x - chi0
+        psi0, chi0 = psi[n - 1], chi[n - 1]
+
+    psi.setflags(write=False)
+    chi.setflags(write=False)
+
+    return psi, chi
+
+
+def _mie_coefficients_jacobian(n, x, refrel, d, psi, psi1, xi, xi1, an, bn):
+    """Derivatives of the Mie coefficients with respect to `nr`, `ni` and `x`.
+
+    The derivative of the logarithmic derivative `D_n(mx)` is obtained
+    from the Riccati-Bessel equation: `D_n' = n(n+1)/(mx)^2 - 1 - D_n^2`
+    and the derivatives of `psi_n` and `xi_n` from their recurrences.
+
+    Parameters
+    ----------
+    n: int
+        Term order.
+    x: float
+        Size parameter.
+    refrel: complex
+        Refraction index.
+    d: complex
+        Logarithmic derivative `D_n(mx)`.
+    psi, psi1: float
+        Riccati-Bessel functions `psi_n(x)` and `psi_{n-1}(x)`.
+    xi, xi1: complex
+        Riccati-Bessel functions `xi_n(x)` and `xi_{n-1}(x)`.
+    an, bn: complex
+        Mie coefficients.
+
+    Returns
+    -------
+    numpy.ndarray, numpy.ndarray
+        Derivatives `[d/dnr, d/dni, d/dx]` of `an` and `bn`.
+
+    """  # pylint: disable=too-many-locals
+    dd = n * (n + 1) / (x * refrel) ** 2 - 1 - d ** 2
+
+    # Riccati-Bessel derivatives (with respect to x)
+    dpsi = psi1 - n * psi / x
+    dpsi1 = n * psi1 / x - psi
+    dxi = xi1 - n * xi / x
+    dxi1 = n * xi1 / x - xi
+
+    # AN = (CA * PSI - PSI1) / (CA * XI - XI1) with CA = D / M + N / X
+    ca = d / refrel + n / x
+    dca_dm = dd * x / refrel - d / refrel ** 2
+    dca_dx = dd - n / x ** 2
+    den = ca * xi - xi1
+    dan_dm = dca_dm * (psi - an * xi) / den
+    dan_dx = (dca_dx * psi + ca * dpsi - dpsi1
+              - an * (dca_dx * xi + ca * dxi - dxi1)) / den
+
+    # BN = (CB * PSI - PSI1) / (CB * XI - XI1) with CB = M * D + N / X
+    cb = refrel * d + n / x
+    dcb_dm = d + refrel * x * dd
+    dcb_dx = refrel ** 2 * dd - n / x ** 2
+    den = cb * xi - xi1
+    dbn_dm = dcb_dm * (psi - bn * xi) / den
+    dbn_dx = (dcb_dx * psi + cb * dpsi - dpsi1
+              - bn * (dcb_dx * xi + cb * dxi - dxi1)) / den
+
+    # The coefficients are holomorphic in refrel: d/dni = i d/dnr
+    dan = np.array([dan_dm, 1j * dan_dm, dan_dx])
+    dbn = np.array([dbn_dm, 1j * dbn_dm, dbn_dx])
+
+    return dan, dbn
+
+
+def _converged(tol, *increments):
+    """Check if all the series increments are below the relative tolerance.
+
+    Parameters
+    ----------
+    tol: float
+        Relative tolerance.
+    *increments: tuple
+        Pairs of `(last term, partial sum)`. For arrays, the
+        comparison is done on their maximum absolute values.
+
+    Returns
+    -------
+    bool
+        `True` if all the increments are converged.
+
+    """
+    return all(
+        np.max(np.abs(term)) <= tol * np.max(np.abs(total))
+        for term, total in increments
+    )
+
+
+def mie_coefficients(x, refrel, tol=None):
+    """Mie expansion coefficients `an` and `bn`.
+
+    The coefficients are computed at once for all the terms
+    (and all the refraction indexes). They can be stored and
+    projected later with `mie_efficiencies`, `mie_amplitudes`
+    and `mie_phase_matrix` on any angle grid.
+
+    Parameters
+    ----------
+    x: float
+        Size parameter (see `mie_bohren_huffman`).
+    refrel: complex or numpy.ndarray
+        Refraction index(es).
+    tol: float, optional
+        Relative tolerance on the `Qsca` and `Qext` increments
+        (see `mie_bohren_huffman`).
+
+    Returns
+    -------
+    an, bn: numpy.ndarray
+        Mie coefficients for `n = 1 ... nterms` (last axis).
+
+    Raises
+    ------
+    ValueError
+        If the input argument are outside the validity range.
+
+    """
+    if tol is not None and tol <= 0:
+        raise ValueError(f"Require TOL = {tol} > 0")
+
+    refrel = np.asarray(refrel, dtype=np.complex128)
+    xstop, nmx = _series_limits(x, refrel, tol)
+    nstop = int(xstop)
+
+    m = refrel[..., None]
+    d = _log_derivative(x, refrel, nmx)[..., :nstop]
+    psi, chi = riccati_bessel(x, nstop)
+    xi = psi - chi * 1j
+    en = np.arange(1, nstop + 1)
+
+    ca = d / m + en / x
+    an = (ca * psi[1:] - psi[:-1]) / (ca * xi[1:] - xi[:-1])
+    cb = m * d + en / x
+    bn = (cb * psi[1:] - psi[:-1]) / (cb * xi[1:] - xi[:-1])
+
+    # Stop the series when the last terms are below the tolerance
+    if tol is not None:
+        dqsca = (2 * en + 1) * (abs(an) ** 2 + abs(bn) ** 2)
+        dqext = (2 * en + 1) * np.real(an + bn)
+        converged = (
+            (abs(dqsca) <= tol * abs(np.cumsum(dqsca, axis=-1)))
+            & (abs(dqext) <= tol * abs(np.cumsum(dqext, axis=-1)))
+        ).reshape(-1, nstop).all(axis=0) & (en >= x + 1)
+
+        if np.any(converged):
+            nterms = np.argmax(converged) + 1
+            an, bn = an[..., :nterms], bn[..., :nterms]
+
+    return an, bn
+
+
+def mie_efficiencies(x, an, bn):
+    """Mie efficiencies and asymmetry parameter from the Mie coefficients.
+
+    Parameters
+    ----------
+    x: float
+        Size parameter.
+    an, bn: numpy.ndarray
+        Mie coefficients (see `mie_coefficients`).
+
+    Returns
+    -------
+    Qext:
+        Extinction efficiency.
+    Qsca:
+        Scattering efficiency.
+    Qback:
+        Backscatter efficiency.
+    gsca:
+        Asymmetry parameter.
+
+    """
+    en = np.arange(1, np.shape(an)[-1] + 1)
+
+    qext = np.sum((2 * en + 1) * np.real(an + bn), axis=-1)
+    qsca = np.sum((2 * en + 1) * (abs(an) ** 2 + abs(bn) ** 2), axis=-1)
+    qback = abs(np.sum((2 * en + 1) * (-1) ** en * (an - bn), axis=-1)) ** 2
+
+    gsca = np.sum(
+        (2 * en + 1) / (en * (en + 1)) * np.real(an * np.conj(bn)), axis=-1
+    ) + np.sum(
+        en[:-1] * (en[:-1] + 2) / (en[:-1] + 1) * np.real(
+            an[..., :-1] * np.conj(an[..., 1:]) + bn[..., :-1] * np.conj(bn[..., 1:])
+        ), axis=-1,
+    )
+
+    return 2 / x ** 2 * qext, 2 / x ** 2 * qsca, qback / x ** 2, 2 * gsca / qsca
+
+
+def mie_amplitudes(an, bn, theta):
+    """Mie amplitude scattering functions from the Mie coefficients.
+
+    Parameters
+    ----------
+    an, bn: numpy.ndarray
+        Mie coefficients (see `mie_coefficients`).
+    theta: float or numpy.ndarray
+        Scattering angles (radians).
+
+    Returns
+    -------
+    S1, S2: numpy.ndarray
+        Complex amplitude functions (last axis: scattering angles).
+
+    """
+    nterms = np.shape(an)[-1]
+    mu = np.cos(np.atleast_1d(theta))
+
+    # Angular functions pi_n and tau_n by upward recurrence
+    pi = np.zeros((nterms, len(mu)))
+    tau = np.zeros((nterms, len(mu)))
+    pi0, pi1 = np.zeros_like(mu), np.ones_like(mu)
+    for n in range(nterms):
+        en = n + 1
+        pi[n] = pi1
+        tau[n] = en * mu * pi1 - (en + 1) * pi0
+        pi0, pi1 = pi1, ((2 * en + 1) * mu * pi1 - (en + 1) * pi0) / en
+
+    en = np.arange(1, nterms + 1)
+    fn = (2 * en + 1) / (en * (en + 1))
+    an, bn = fn * an, fn * bn
+
+    return an @ pi + bn @ tau, an @ tau + bn @ pi
+
+
+def mie_phase_matrix(x, an, bn, theta):
+    """Mie phase matrix elements from the Mie coefficients.
+
+    For spheres, `P22 = P11` and `P44 = P33`.
+
+    Parameters
+    ----------
+    x: float
+        Size parameter.
+    an, bn: numpy.ndarray
+        Mie coefficients (see `mie_coefficients`).
+    theta: float or numpy.ndarray
+        Scattering angles (radians).
+
+    Returns
+    -------
+    P11, P21, P33, P43: numpy.ndarray
+        Phase matrix elements analytically normalized such as
+        `1/2 ∫ P11 sin(theta) dtheta = 1` (last axis: scattering angles).
+
+    """
+    s1, s2 = mie_amplitudes(an, bn, theta)
+    _, qsca, _, _ = mie_efficiencies(x, an, bn)
+    norm = (x ** 2 * qsca / 4)[..., None]
+
+    S11 = .5 * (abs(s2) ** 2 + abs(s1) ** 2)
+    S12 = .5 * (abs(s2) ** 2 - abs(s1) ** 2)
+    S33 = np.real(np.conj(s2) * s1)
+    S43 = np.imag(np.conj(s2) * s1)
+
+    return S11 / norm, S12 / norm, S33 / norm, S43 / norm
+
+
+def mie_rayleigh(x, refrel, nang=NANG):
+    """Small particles Mie scattering (Rayleigh-Penndorf expansion).
+
+    The `a1`, `b1` and `a2` Mie coefficients are expanded up to `x^6`
+    (Bohren and Huffman, eq. 5.5) in a form that conserves the
+    energy for non-absorbing particles. The other terms are neglected.
+    The relative error is of the order of `(|m| x)^4`.
+
+    Parameters
+    ----------
+    x: float or numpy.ndarray
+        Size parameter (see `mie_bohren_huffman`).
+    refrel: complex or numpy.ndarray
+        Refraction index.
+    nang: int, optional
+        Number of angles for S1 and S2 function in range from 0 to π/2.
+        If `None`, the phase functions are not calculated.
+
+    Returns
+    -------
+    S1, S2: numpy.ndarray
+        Complex phase functions (last axis: scattering angles),
+        `None` if `nang` is `None`.
+    Qext:
+        Extinction efficiency.
+    Qsca:
+        Scattering efficiency.
+    Qback:
+        Backscatter efficiency.
+    gsca:
+        Asymmetry parameter.
+
+    """
+    x, refrel = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                    np.asarray(refrel, dtype=complex))
+    m2 = refrel ** 2
+
+    # Radiative reaction form: a = -i t / (1 - i t)
+    a1 = 2 / 3 * x ** 3 * (m2 - 1) / (m2 + 2) * (1 + .6 * x ** 2 * (m2 - 2) / (m2 + 2))
+    b1 = x ** 5 / 45 * (m2 - 1)
+    a2 = x ** 5 / 15 * (m2 - 1) / (2 * m2 + 3)
+    a1, b1, a2 = (-1j * t / (1 - 1j * t) for t in (a1, b1, a2))
+
+    qsca = 3 * (abs(a1) ** 2 + abs(b1) ** 2) + 5 * abs(a2) ** 2
+    gsca = 3 * np.real(a1 * np.conj(a2) + a1 * np.conj(b1)) / qsca
+    qsca = 2 / x ** 2 * qsca
+    qext = 2 / x ** 2 * (3 * np.real(a1 + b1) + 5 * np.real(a2))
+    qback = 4 * (abs(1.5 * (a1 - b1) - 2.5 * a2) / x) ** 2  # |S1(π)|
+
+    if nang is None:
+        return None, None, qext, qsca, qback, gsca
+
+    mu = np.cos(np.linspace(0, np.pi, 2 * nang - 1))
+    a1, b1, a2 = a1[..., None], b1[..., None], a2[..., None]
+    s1 = 1.5 * (a1 + b1 * mu) + 2.5 * a2 * mu
+    s2 = 1.5 * (a1 * mu + b1) + 2.5 * a2 * (2 * mu ** 2 - 1)
+
+    return s1, s2, qext, qsca, qback, gsca
+
+
+def mie_anomalous_diffraction(x, refrel):
+    """Large particles extinction and absorption (anomalous diffraction).
+
+    Van de Hulst (1957) approximation for large particles (`x >> 1`),
+    with the absorption reduced by the hemispherical Fresnel reflectance
+    of the particle surface: the approximation is also valid for the
+    high index particles when they are opaque (`x ni >> 1`). The
+    relative error is lower than `2 x^-2/3 + 0.15 (x ni)^-2`
+    (see `mie_regime`).
+
+    Parameters
+    ----------
+    x: float or numpy.ndarray
+        Size parameter (see `mie_bohren_huffman`).
+    refrel: complex or numpy.ndarray
+        Refraction index (with `nr > 1`).
+
+    Returns
+    -------
+    Qext:
+        Extinction efficiency.
+    Qsca:
+        Scattering efficiency.
+
+    """
+    x, refrel = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                    np.asarray(refrel, dtype=complex))
+    nr, ni = np.real(refrel), np.imag(refrel)
+
+    # Phase shift and absorption through the particle center
+    rho = 2 * x * (nr - 1)
+    beta = np.arctan2(ni, nr - 1)
+    c = np.cos(beta) / rho
+    e = np.exp(-rho * np.tan(beta))
+
+    qext = (2 - 4 * e * c * np.sin(rho - beta)
+            - 4 * e * c ** 2 * np.cos(rho - 2 * beta)
+            + 4 * c ** 2 * np.cos(2 * beta))
+
+    # Absorption efficiency (series expansion for weakly absorbing particles)
+    w = 4 * x * ni
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qabs = np.where(
+            w > 1e-3,
+            1 + 2 * np.exp(-w) / w + 2 * (np.exp(-w) - 1) / w ** 2,
+            2 / 3 * w - w ** 2 / 4 + w ** 3 / 15,
+        )
+
+    qabs *= 1 - _reflectance(refrel)
+
+    return qext, qext - qabs
+
+
+def _reflectance(refrel):
+    """Hemispherical Fresnel reflectance of an interface (unpolarized light)."""
+    mu, weights = np.polynomial.legendre.leggauss(ADA_QUADRATURE)
+    mu, weights = (mu + 1) / 2, weights / 2  # Incidence angles cosines on [0, 1]
+    m = np.asarray(refrel)[..., None]
+    mu_t = np.sqrt(1 - (1 - mu ** 2) / m ** 2)
+    rs = abs((mu - m * mu_t) / (mu + m * mu_t)) ** 2
+    rp = abs((m * mu - mu_t) / (m * mu + mu_t)) ** 2
+
+    return np.sum((rs + rp) * mu * weights, axis=-1)
+
+
+def mie_regime(x, refrel, tol, phase=True):
+    """Fastest scattering regime within a relative tolerance.
+
+    The anomalous diffraction error is estimated as `2 x^-2/3 + 0.15 (x ni)^-2`:
+    for the tholins indexes (`m ~ 1.65 + 0.01i`), it is selected above
+    `x ~ 400` for a 5% tolerance and above `x ~ 3000` for 1%.
+
+    Parameters
+    ----------
+    x: float or numpy.ndarray
+        Size parameter.
+    refrel: complex or numpy.ndarray
+        Refraction index.
+    tol: float
+        Relative tolerance on the optical properties.
+    phase: bool, optional
+        Phase function required (the anomalous diffraction
+        regime only provides the cross sections).
+
+    Returns
+    -------
+    str or numpy.ndarray
+        `rayleigh`, `ada` (anomalous diffraction) or `exact`
+        (full Mie series).
+
+    Raises
+    ------
+    ValueError
+        If the tolerance is not strictly positive.
+
+    """
+    if tol <= 0:
+        raise ValueError(f"Require TOL = {tol} > 0")
+
+    x, refrel = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                    np.asarray(refrel, dtype=complex))
+
+    regime = np.full(x.shape, 'exact', dtype='<U8')
+
+    if not phase:
+        with np.errstate(divide='ignore'):
+            err = ADA_EDGE * np.power(x, -2 / 3) \
+                + ADA_OPACITY / np.power(x * np.imag(refrel), 2)
+        regime[(err <= tol) & (np.real(refrel) > 1)] = 'ada'
+
+    regime[np.power(np.abs(refrel) * x, 4) <= tol] = 'rayleigh'
+
+    return regime[()] if regime.ndim == 0 else regime
+
+
+def mie(wvln, nr, ni, r, nang=NANG, tol=None, jacobian=False, approx_tol=None,
+        precision='double'):
     """Compute Mie cross-sections and phase function based on Bohren and Huffman theory.
 
+    Array inputs are broadcasted together and the full Mie series is computed
+    only once for all the refraction indexes with the same size parameter.
+
     Parameters
     ----------
-    wvln: float
+    wvln: float or numpy.ndarray
         Wavelength (m).
-    nr: float
+    nr: float or numpy.ndarray
         Particle real optical index.
-    ni: float
+    ni: float or numpy.ndarray
         Particle real imaginary index.
-    r: float
+    r: float or numpy.ndarray
         Particle radius (m).
     nang: int, optional
-        Number of angles for the phase function (range from 0 to π/2)
+        Number of angles for the phase function (range from 0 to π/2).
+        If `None`, the phase function is not calculated.
+    tol: float, optional
+        Relative tolerance to truncate the Mie series
+        (see `mie_bohren_huffman`).
+    jacobian: bool, optional
+        Also return the analytic derivatives of the cross-sections and
+        the phase function with respect to `nr`, `ni` and `r`.
+    approx_tol: float, optional
+        Relative tolerance allowed for the Rayleigh and the anomalous
+        diffraction approximations (see `mie_regime`). The
+        approximations are evaluated on the whole batch at once.
+    precision: str, optional
+        Precision of the angular sums and of the phase functions
+        (`double` or `single`, see `mie_bohren_huffman`).
 
     Returns
     -------
@@ -215,15 +872,38 @@ def mie(wvln, nr, ni, r, nang=NANG):
     qabs: float
         Absorption cross section (m^-2).
     gg: float
-        Asymmetry parameter.
+        Asymmetry parameter (`nan` in the anomalous diffraction regime).
     theta: numpy.ndarray
-        Phase function angles (radians).
+        Phase function angles (radians), `None` if `nang` is `None`.
     P: numpy.ndarray
-        Phase function.
+        Phase function (last axis), `None` if `nang` is `None`.
+    jac: dict
+        Only if `jacobian=True` (with scalar inputs), derivatives of
+        `qsct`, `qext`, `qabs` and `P` (first axis: `[d/dnr, d/dni, d/dr]`).
+    regime: str or numpy.ndarray
+        Only if `approx_tol` is provided, scattering regime used
+        (`rayleigh`, `ada` or `exact`).
+
+    Raises
+    ------
+    ValueError
+        If the jacobian is requested with `approx_tol`, without phase
+        function, with array inputs or in single precision.
+
+    """  # pylint: disable=too-many-locals
+    batch = approx_tol is not None or nang is None or precision != 'double' \
+        or np.broadcast(wvln, nr, ni, r).ndim
+
+    if jacobian and batch:
+        raise ValueError('The jacobian is only available for the full Mie series '
+                         'with scalar inputs')
+
+    if batch:
+        return _mie_batch(wvln, nr, ni, r, nang, tol, approx_tol, precision)
 
-    """
     Xm = 2 * np.pi * r / wvln
-    s1, s2, Qe, Qs, _, gg = mie_bohren_huffman(Xm, complex(nr, ni), nang)
+    s1, s2, Qe, Qs, _, gg, info = mie_bohren_huffman(
+        Xm, complex(nr, ni), nang, tol, full_output=True, jacobian=jacobian)
     qsct = Qs * np.pi * r ** 2
     qext = Qe * np.pi * r ** 2
     qabs = qext - qsct
@@ -233,4 +913,88 @@ def mie(wvln, nr, ni, r, nang=NANG):
     norm = .5 * np.trapz(S11 * np.sin(theta), x=theta)
     P = S11 / norm
 
-    return qsct, qext, qabs, gg, theta, P
+    if not jacobian:
+        return qsct, qext, qabs, gg, theta, P
+
+    # Convert the derivatives with respect to Xm into derivatives with respect to r
+    jac = info['jac']
+    dx_dr = np.array([1, 1, Xm / r])
+    dr = np.array([0, 0, 1])
+
+    dS11 = np.real(np.conj(s1) * jac['s1'] + np.conj(s2) * jac['s2']) * dx_dr[:, None]
+    dnorm = .5 * np.trapz(dS11 * np.sin(theta), x=theta, axis=1)
+
+    dqsct = jac['qsca'] * dx_dr * np.pi * r ** 2 + 2 * qsct / r * dr
+    dqext = jac['qext'] * dx_dr * np.pi * r ** 2 + 2 * qext / r * dr
+
+    jac = {
+        'qsct': dqsct,
+        'qext': dqext,
+        'qabs': dqext - dqsct,
+        'P': (dS11 - P * dnorm[:, None]) / norm,
+    }
+
+    return qsct, qext, qabs, gg, theta, P, jac
+
+
+def _mie_batch(wvln, nr, ni, r, nang, tol, approx_tol, precision='double'):
+    """Batched Mie cross-sections and phase functions (see `mie`).
+
+    The Rayleigh and anomalous diffraction regimes are vectorized,
+    the other elements are computed with the full Mie series
+    (vectorized over the refraction indexes for each size parameter).
+
+    """  # pylint: disable=too-many-locals
+    scalar = np.broadcast(wvln, nr, ni, r).ndim == 0
+    wvln, nr, ni, r = np.broadcast_arrays(*np.atleast_1d(wvln, nr, ni, r))
+    shape = wvln.shape
+
+    Xm = 2 * np.pi * r / wvln
+    refrel = nr + 1j * ni
+
+    regime = np.full(shape, 'exact', dtype='<U8') if approx_tol is None else \
+        np.atleast_1d(mie_regime(Xm, refrel, approx_tol, phase=nang is not None))
+
+    fdtype, _ = _precision(precision)
+    Qe, Qs, gg = np.empty(shape), np.empty(shape), np.full(shape, np.nan)
+    S11 = None if nang is None else np.empty(shape + (2 * nang - 1,), dtype=fdtype)
+
+    rayleigh = regime == 'rayleigh'
+    if np.any(rayleigh):
+        s1, s2, Qe[rayleigh], Qs[rayleigh], _, gg[rayleigh] = mie_rayleigh(
+            Xm[rayleigh], refrel[rayleigh], nang)
+        if S11 is not None:
+            S11[rayleigh] = .5 * (abs(s2) ** 2 + abs(s1) ** 2)
+
+    ada = regime == 'ada'
+    if np.any(ada):
+        Qe[ada], Qs[ada] = mie_anomalous_diffraction(Xm[ada], refrel[ada])
+
+    # The elements with the same size parameter are computed at once
+    exact = regime == 'exact'
+    for x in np.unique(Xm[exact]):
+        i = exact & (Xm == x)
+        if S11 is None:  # Without the angular sums
+            an, bn = mie_coefficients(x, refrel[i], tol)
+            Qe[i], Qs[i], _, gg[i] = mie_efficiencies(x, an, bn)
+        else:
+            s1, s2, Qe[i], Qs[i], _, gg[i] = mie_bohren_huffman(
+                x, refrel[i], nang, tol, precision=precision)
+            S11[i] = .5 * (abs(s2) ** 2 + abs(s1) ** 2)
+
+    area = np.pi * r ** 2
+    qsct, qext = Qs * area, Qe * area
+
+    if S11 is None:
+        theta, P = None, None
+    else:
+        theta = np.linspace(0, np.pi, 2 * nang - 1)
+        norm = .5 * np.trapz(S11 * np.sin(theta), x=theta)
+        P = (S11 / norm[..., None]).astype(fdtype, copy=False)
+
+    out = (qsct, qext, qext - qsct, gg, theta, P, regime)
+
+    if scalar:
+        out = tuple(v if v is None or v is theta else v[0] for v in out)
+
+    return out[:-1] if approx_tol is None else out
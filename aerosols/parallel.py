@@ -0,0 +1,203 @@
+"""Parallel tables module."""
+
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from .mie import NANG
+from .tholins import (
+    FIELDS, Database, fractals_tholins, mie_tholins, stack_fields
+)
+
+
+PARALLEL_CHUNK = 16  # Number of elements per task
+
+_WORKER = {}  # Worker process state (table, inputs and database)
+
+
+class SharedTable:
+    """Optical properties table shared between processes.
+
+    All the results are stored in a single `float64` array (one row per
+    element: `qsct`, `qext`, `qabs`, `gg` and the phase function)
+    allocated in shared memory or in a memory-mapped `.npy` file.
+
+    Parameters
+    ----------
+    n: int
+        Number of elements.
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    filename: str or pathlib.Path, optional
+        Memory-mapped `.npy` output file. If `None` (default), the table
+        is allocated in shared memory (see `close`).
+
+    """
+
+    def __init__(self, n, nang=NANG, filename=None):
+        self.nang = nang
+        shape = (n, len(FIELDS) + 2 * nang - 1)
+
+        if filename is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=max(int(np.prod(shape)) * 8, 1))
+            self.data = np.ndarray(shape, dtype=np.float64, buffer=self._shm.buf)
+            self.spec = (self._shm.name, None, shape)
+        else:
+            self._shm = None
+            self.data = np.lib.format.open_memmap(
+                filename, mode='w+', dtype=np.float64, shape=shape)
+            self.spec = (None, str(filename), shape)
+
+        self.data[:] = np.nan
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} | Elements: {len(self)} | NANG: {self.nang}>'
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        """Same outputs as `mie` and `fractals` (views on the table)."""
+        gg = self.gg[i]
+        return (self.qsct[i], self.qext[i], self.qabs[i],
+                None if np.all(np.isnan(gg)) else gg, self.theta, self.P[i])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, field):
+        """Table columns views (`qsct`, `qext`, `qabs`, `gg` and `P`)."""
+        if field in FIELDS:
+            return self.data[:, FIELDS.index(field)]
+
+        if field == 'P':
+            return self.data[:, len(FIELDS):]
+
+        raise AttributeError(field)
+
+    @property
+    def theta(self):
+        """Phase function angles (radians)."""
+        return np.linspace(0, np.pi, 2 * self.nang - 1)
+
+    def close(self):
+        """Release the shared memory or flush the memory-mapped file.
+
+        The shared memory block is unlinked: the table can not be used
+        anymore (copy the arrays before if needed).
+
+        """
+        if self._shm is None:
+            self.data.flush()
+            return
+
+        del self.data
+        self._shm.unlink()
+
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # Views still exported (released with them)
+
+
+def _attach(spec):
+    """Attach a shared table in a worker process."""
+    name, filename, shape = spec
+
+    if filename is not None:
+        return None, np.load(filename, mmap_mode='r+')
+
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def _init_worker(spec, inputs, db, options):
+    """Worker process initializer."""
+    _WORKER['shm'], _WORKER['data'] = _attach(spec)
+    _WORKER['inputs'] = inputs
+    _WORKER['db'] = Database(*db)
+    _WORKER['options'] = options
+
+
+def _work(indices):
+    """Compute the table elements and write them in the shared table."""
+    data, db, options = _WORKER['data'], _WORKER['db'], _WORKER['options']
+    wvln, r, N, Df = _WORKER['inputs']
+
+    for i in indices:
+        if N is None:
+            qsct, qext, qabs, gg, _, P = mie_tholins(wvln[i], r[i], db, **options)
+        else:
+            qsct, qext, qabs, gg, _, P = fractals_tholins(
+                wvln[i], r[i], Df, N[i], db, **options)
+
+        data[i] = stack_fields(qsct, qext, qabs, gg, P)
+
+    return len(indices)
+
+
+def parallel_tholins(wvln, r, N=None, Df=2, db=Database(), nang=NANG,
+                     force=False, processes=None, chunksize=PARALLEL_CHUNK,
+                     filename=None):
+    """Parallel tholins cross-sections and phase functions.
+
+    The workers write their results directly in a shared table
+    allocated by the parent process: only the elements indices are sent
+    to the workers and no array is sent back.
+
+    Parameters
+    ----------
+    wvln: float or numpy.ndarray
+        Wavelengths (m).
+    r: float or numpy.ndarray
+        Particles radii (m) or monomers radii (m) if `N` is provided.
+    N: int or numpy.ndarray, optional
+        Number of monomers for fractal aggregates (Tomasko et al. 2008).
+        If `None` (default), Mie spheres are computed.
+    Df: float, optional
+        Fractal dimension.
+    db: Database, optional
+        Optical index database (reopened by the workers).
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    force: bool, optional
+        Bypass fractals validity checks.
+    processes: int, optional
+        Number of worker processes (default: number of CPUs).
+    chunksize: int, optional
+        Number of elements per task.
+    filename: str or pathlib.Path, optional
+        Memory-mapped `.npy` output file (default: shared memory).
+
+    Returns
+    -------
+    SharedTable
+        Results table (flattened broadcasted inputs). `table[i]`
+        returns the same outputs as `mie` or `fractals`.
+
+    """
+    fractal = N is not None
+    wvln, r, N = (np.ravel(x) for x in np.broadcast_arrays(
+        *np.atleast_1d(wvln, r, N if fractal else 0)))
+
+    inputs = (wvln, r, N if fractal else None, Df)
+    options = {'nang': nang, 'force': force} if fractal else {'nang': nang}
+
+    shared = SharedTable(len(wvln), nang=nang, filename=filename)
+    ntasks = max(int(np.ceil(len(wvln) / chunksize)), 1)
+    tasks = np.array_split(np.arange(len(wvln)), ntasks)
+
+    try:
+        with Pool(processes, _init_worker,
+                  (shared.spec, inputs, (db.fname, db.table), options)) as pool:
+            for _ in pool.imap_unordered(_work, tasks):
+                pass
+    except BaseException:
+        shared.close()  # Release the shared memory block
+        raise
+
+    return shared
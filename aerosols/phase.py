@@ -0,0 +1,199 @@
+"""Phase function module."""
+
+import numpy as np
+
+from .fractals import ELEMENTS, fractals_phase_matrix
+from .mie import NANG, mie_coefficients, mie_phase_matrix
+
+
+class PhaseFunction:
+    """Phase matrix evaluator at arbitrary scattering angles.
+
+    The phase matrix elements are interpolated in `mu = cos(theta)`
+    with cubic Hermite polynomials: `log(P11)` and the other elements
+    are interpolated relatively to `P11`.
+
+    Parameters
+    ----------
+    theta: numpy.ndarray
+        Phase function angles (radians), eg. from `mie` or `fractals`.
+    P11: numpy.ndarray
+        Phase function.
+    **elements: numpy.ndarray, optional
+        Other phase matrix elements on the same angles
+        (`P21`, `P22`, `P33`, `P43` and/or `P44`).
+
+    Raises
+    ------
+    ValueError
+        If an element is unknown or not defined on the `theta` angles.
+
+    """
+    def __init__(self, theta, P11, **elements):
+        mu = np.cos(theta)
+        order = np.argsort(mu)
+        self.mu = mu[order]
+
+        self._nodes = {'P11': np.log(np.asarray(P11)[order])}
+
+        for element, Pij in elements.items():
+            if element not in ELEMENTS:
+                raise ValueError(f'Unknown phase matrix element `{element}`')
+
+            if np.shape(Pij) != np.shape(theta):
+                raise ValueError(f'`{element}` is not defined on the `theta` angles')
+
+            self._nodes[element] = np.asarray(Pij)[order] / np.asarray(P11)[order]
+
+        self._slopes = {
+            element: _hermite_slopes(self.mu, y)
+            for element, y in self._nodes.items()
+        }
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} | Elements: {", ".join(self.elements)}>'
+
+    def __call__(self, theta, element='P11'):
+        """Phase matrix element at the scattering angles.
+
+        Parameters
+        ----------
+        theta: float or numpy.ndarray
+            Scattering angles (radians).
+        element: str, optional
+            Phase matrix element (default: `P11`).
+
+        Returns
+        -------
+        float or numpy.ndarray
+            Phase matrix element at the `theta` angles.
+
+        Raises
+        ------
+        KeyError
+            If the element is not available.
+
+        """
+        if element not in self._nodes:
+            raise KeyError(f'Phase matrix element `{element}` is not available')
+
+        p11 = np.exp(self._interp(theta, 'P11'))
+
+        if element == 'P11':
+            return p11
+
+        return self._interp(theta, element) * p11
+
+    @property
+    def elements(self):
+        """Available phase matrix elements."""
+        return tuple(self._nodes)
+
+    def _interp(self, theta, element):
+        """Cubic Hermite interpolation of the element nodes in `cos(theta)`."""
+        mu = np.cos(theta)
+        y, m = self._nodes[element], self._slopes[element]
+
+        i = np.clip(np.searchsorted(self.mu, mu) - 1, 0, len(self.mu) - 2)
+        h = self.mu[i + 1] - self.mu[i]
+        t = (mu - self.mu[i]) / h
+
+        return (
+            (1 + 2 * t) * (1 - t) ** 2 * y[i]
+            + t * (1 - t) ** 2 * h * m[i]
+            + t ** 2 * (3 - 2 * t) * y[i + 1]
+            - t ** 2 * (1 - t) * h * m[i + 1]
+        )
+
+    @classmethod
+    def from_mie(cls, wvln, nr, ni, r, nang=NANG):
+        """Mie phase matrix evaluator.
+
+        Parameters
+        ----------
+        wvln: float
+            Wavelength (m).
+        nr: float
+            Particle real optical index.
+        ni: float
+            Particle real imaginary index.
+        r: float
+            Particle radius (m).
+        nang: int, optional
+            Number of angles for the phase function (range from 0 to π/2).
+
+        Returns
+        -------
+        PhaseFunction
+            Phase matrix evaluator (`P11`, `P21`, `P22`, `P33`, `P43` and `P44`).
+
+        """
+        x = 2 * np.pi * r / wvln
+        theta = np.linspace(0, np.pi, 2 * nang - 1)
+        P11, P21, P33, P43 = mie_phase_matrix(x, *mie_coefficients(x, complex(nr, ni)),
+                                              theta)
+
+        return cls(theta, P11, P21=P21, P22=P11, P33=P33, P43=P43, P44=P33)
+
+    @classmethod
+    def from_fractals(cls, wvln, nr, ni, rm, Df, N, nang=NANG, force=False):
+        """Fractal aggregates phase matrix evaluator (Tomasko et al. 2008).
+
+        Parameters
+        ----------
+        wvln: float
+            Wavelength (m).
+        nr: float
+            Particle real optical index.
+        ni: float
+            Particle real imaginary index.
+        rm: float
+            Monomer radius (m).
+        Df: float
+            Fractal dimension.
+        N: int
+            Number of monomers.
+        nang: int, optional
+            Number of angles for the phase function (range from 0 to π/2).
+        force: bool, optional
+            Bypass validity checks.
+
+        Returns
+        -------
+        PhaseFunction
+            Phase matrix evaluator (`P11`, `P21`, `P22`, `P33`, `P43` and `P44`).
+
+        """
+        Xm = 2 * np.pi * rm / wvln
+        result = fractals_phase_matrix(Df, N, Xm, nr, ni, nang, force)
+
+        return cls(result.theta, result['P11'], **{
+            element: result[element] for element in ELEMENTS[1:]
+        })
+
+
+def _hermite_slopes(x, y):
+    """Second order finite differences slopes on a non-uniform grid.
+
+    Parameters
+    ----------
+    x: numpy.ndarray
+        Sorted nodes (at least 3).
+    y: numpy.ndarray
+        Values on the nodes.
+
+    Returns
+    -------
+    numpy.ndarray
+        Estimated derivatives on the nodes.
+
+    """
+    h = np.diff(x)
+    d = np.diff(y) / h
+
+    m = np.empty_like(y)
+    m[1:-1] = (h[1:] * d[:-1] + h[:-1] * d[1:]) / (h[:-1] + h[1:])
+    m[0] = ((2 * h[0] + h[1]) * d[0] - h[0] * d[1]) / (h[0] + h[1])
+    m[-1] = ((2 * h[-1] + h[-2]) * d[-1] - h[-1] * d[-2]) / (h[-1] + h[-2])
+
+    return m
@@ -0,0 +1,427 @@
+"""Table-backed retrievals module."""
+
+import numpy as np
+
+from .fractals import fractals
+from .mie import NANG
+from .tholins import DEFAULT_DB, Database, index_tholins
+
+
+QUANTITIES = ('qsct', 'qext', 'qabs')  # Retrievable cross sections
+RETRIEVAL_CHUNK = 256                  # Number of spectra per misfit block
+RETRIEVAL_REFINE = 2                   # Number of refinement iterations
+
+
+def _misfit(observed, weights, spectra, fit_amplitude):
+    """Weighted least squares misfit (on the last axis).
+
+    Parameters
+    ----------
+    observed: numpy.ndarray
+        Observed spectra.
+    weights: numpy.ndarray
+        Inverse variance weights.
+    spectra: numpy.ndarray
+        Model spectra (broadcasted with the observed spectra).
+    fit_amplitude: bool
+        Fit a multiplicative amplitude on the model spectra.
+
+    Returns
+    -------
+    chi2: numpy.ndarray
+        Misfit.
+    amplitude: numpy.ndarray
+        Best amplitude (ones if not fitted).
+
+    """
+    cross = np.sum(weights * observed * spectra, axis=-1)
+    norm = np.sum(weights * spectra ** 2, axis=-1)
+    amplitude = cross / norm if fit_amplitude else np.ones_like(cross)
+    chi2 = np.sum(weights * observed ** 2, axis=-1) - 2 * amplitude * cross \
+        + amplitude ** 2 * norm
+
+    return np.maximum(chi2, 0), amplitude
+
+
+class RetrievalTable:
+    """Precomputed fractals spectra for the aerosols parameters retrieval.
+
+    The tholins aggregates spectra (`qsct`, `qext` or `qabs`) are
+    tabulated over the monomer radius `rm`, the number of monomers `N`
+    and a scaling factor of the imaginary optical index `ni`. The observed
+    spectra are fitted with a vectorized global search over the whole
+    table and refined with a few direct model calls.
+
+    Parameters
+    ----------
+    wvln: numpy.ndarray
+        Wavelengths (m).
+    rm: numpy.ndarray
+        Monomer radii nodes (m).
+    N: numpy.ndarray
+        Number of monomers nodes.
+    scale: numpy.ndarray
+        Imaginary index scaling nodes.
+    spectra: numpy.ndarray
+        Tabulated spectra (`rm`, `N`, `scale`, `wvln` axes).
+    quantity: str, optional
+        Tabulated cross section (`qsct`, `qext` or `qabs`).
+    Df: float, optional
+        Fractal dimension.
+    db: Database, optional
+        Optical index database.
+    nang: int, optional
+        Number of angles for the phase function (range from 0 to π/2).
+    force: bool, optional
+        Bypass fractals validity checks.
+
+    Raises
+    ------
+    ValueError
+        If the quantity is unknown (only cross sections are supported,
+        not radiances) or if the spectra shape does not match the nodes.
+
+    """
+    def __init__(self, wvln, rm, N, scale, spectra, quantity='qext', Df=2,
+                 db=Database(), nang=NANG, force=False):
+        if quantity not in QUANTITIES:
+            raise ValueError(f'Unknown quantity `{quantity}` (available: '
+                             f'{", ".join(QUANTITIES)}). Radiances (eg. I/F) '
+                             'require a radiative transfer model (not included).')
+
+        self.wvln, self.rm, self.N, self.scale = (
+            np.atleast_1d(np.asarray(values, dtype=float))
+            for values in (wvln, rm, N, scale))
+        self.spectra = np.asarray(spectra, dtype=float)
+
+        shape = (len(self.rm), len(self.N), len(self.scale), len(self.wvln))
+        if self.spectra.shape != shape:
+            raise ValueError('The spectra shape does not match the nodes')
+
+        self.quantity = quantity
+        self.Df = Df
+        self.db = db
+        self.nang = nang
+        self.force = force
+
+        # Optical indexes looked up once (reused by all the direct model calls)
+        self.nr, self.ni = index_tholins(self.wvln, self.db)
+
+    def __repr__(self):
+        return (f'<{self.__class__.__name__} {self.quantity} | rm: {len(self.rm)} '
+                f'| N: {len(self.N)} | Scale: {len(self.scale)} '
+                f'| Wavelengths: {len(self.wvln)}>')
+
+    @classmethod
+    def build(cls, wvln, rm, N, scale=1, quantity='qext', Df=2, db=Database(),
+              nang=NANG, force=False):
+        """Compute the spectra table (with the batched `fractals` path).
+
+        Parameters
+        ----------
+        wvln: numpy.ndarray
+            Wavelengths (m).
+        rm: numpy.ndarray
+            Monomer radii nodes (m).
+        N: numpy.ndarray
+            Number of monomers nodes.
+        scale: numpy.ndarray, optional
+            Imaginary index scaling nodes.
+        quantity: str, optional
+            Tabulated cross section (`qsct`, `qext` or `qabs`).
+        Df: float, optional
+            Fractal dimension.
+        db: Database, optional
+            Optical index database.
+        nang: int, optional
+            Number of angles for the phase function (range from 0 to π/2).
+        force: bool, optional
+            Bypass fractals validity checks.
+
+        Returns
+        -------
+        RetrievalTable
+            Spectra table.
+
+        """
+        retrieval = cls(wvln, rm, N, scale, np.zeros((np.size(rm), np.size(N),
+                                                      np.size(scale), np.size(wvln))),
+                        quantity, Df, db, nang, force)
+        retrieval.spectra = retrieval.model(
+            retrieval.rm[:, None, None], retrieval.N[None, :, None],
+            retrieval.scale[None, None, :])
+        return retrieval
+
+    @classmethod
+    def load(cls, fname):
+        """Load a spectra table.
+
+        The optical index database is reopened from its saved location
+        (the package default database is resolved on the current host).
+
+        Parameters
+        ----------
+        fname: str or pathlib.Path
+            Table `.npz` file.
+
+        Returns
+        -------
+        RetrievalTable
+            Spectra table.
+
+        """
+        with np.load(fname) as data:
+            db = Database(str(data['fname']) or DEFAULT_DB, str(data['table']))
+            return cls(data['wvln'], data['rm'], data['N'], data['scale'],
+                       data['spectra'], str(data['quantity']), float(data['Df']),
+                       db, int(data['nang']), bool(data['force']))
+
+    def save(self, fname):
+        """Save the spectra table.
+
+        Parameters
+        ----------
+        fname: str or pathlib.Path
+            Table `.npz` file.
+
+        """
+        # Empty database location for the package default database
+        location = self.db.fname.resolve()
+        location = '' if location == DEFAULT_DB.resolve() else str(location)
+
+        np.savez(fname, wvln=self.wvln, rm=self.rm, N=self.N, scale=self.scale,
+                 spectra=self.spectra, quantity=self.quantity, Df=self.Df,
+                 fname=location, table=self.db.table, nang=self.nang, force=self.force)
+
+    def model(self, rm, N, scale):
+        """Direct model spectra.
+
+        Parameters
+        ----------
+        rm: float or numpy.ndarray
+            Monomer radii (m).
+        N: float or numpy.ndarray
+            Number of monomers.
+        scale: float or numpy.ndarray
+            Imaginary index scaling.
+
+        Returns
+        -------
+        numpy.ndarray
+            Spectra (last axis) for the broadcasted parameters.
+
+        """
+        rm, N, scale = (np.asarray(values, dtype=float)[..., None]
+                        for values in (rm, N, scale))
+
+        outputs = fractals(self.wvln, self.nr, self.ni * scale, rm, self.Df, N,
+                           nang=self.nang, force=self.force)
+
+        return outputs[QUANTITIES.index(self.quantity)]
+
+    def search(self, observed, sigma=None, fit_amplitude=False,
+               chunksize=RETRIEVAL_CHUNK):
+        """Global search of the best table nodes.
+
+        The misfits with all the table nodes are computed at once with
+        matrix products (by blocks of spectra).
+
+        Parameters
+        ----------
+        observed: numpy.ndarray
+            Observed spectra (last axis: table wavelengths).
+        sigma: float or numpy.ndarray, optional
+            Observations uncertainties (default: relative misfit, `sigma = observed`).
+        fit_amplitude: bool, optional
+            Fit a multiplicative amplitude on the model spectra
+            (eg. an unknown column density).
+        chunksize: int, optional
+            Number of spectra per block.
+
+        Returns
+        -------
+        index: numpy.ndarray
+            Best nodes indices (last axis: `rm`, `N` and `scale`).
+        chi2: numpy.ndarray
+            Best nodes misfits.
+        amplitude: numpy.ndarray
+            Best nodes amplitudes (ones if not fitted).
+
+        Raises
+        ------
+        ValueError
+            If the observed spectra are not sampled on the table wavelengths.
+
+        """
+        observed, weights = self._observations(observed, sigma)
+        index, chi2, amplitude = self._search(observed, weights, fit_amplitude, chunksize)
+
+        n = np.argmin(chi2, axis=-1)[..., None]
+        index = np.concatenate([
+            np.take_along_axis(index[..., 0], n, -1), n,
+            np.take_along_axis(index[..., 1], n, -1)], axis=-1)
+
+        return (index, np.take_along_axis(chi2, n, -1)[..., 0],
+                np.take_along_axis(amplitude, n, -1)[..., 0])
+
+    def _search(self, observed, weights, fit_amplitude, chunksize=RETRIEVAL_CHUNK):
+        """Best `(rm, scale)` nodes and misfits for each `N` node.
+
+        Returns
+        -------
+        index: numpy.ndarray
+            Best nodes indices (last axes: `N` and `[rm, scale]`).
+        chi2: numpy.ndarray
+            Best nodes misfits (last axis: `N`).
+        amplitude: numpy.ndarray
+            Best nodes amplitudes (last axis: `N`).
+
+        """  # pylint: disable=too-many-locals
+        shape = observed.shape[:-1]
+        observed = observed.reshape(-1, len(self.wvln))
+        weights = weights.reshape(-1, len(self.wvln))
+
+        nrm, nN, ns = self.spectra.shape[:-1]
+        M = np.moveaxis(self.spectra, 1, 0).reshape(-1, len(self.wvln))
+
+        index = np.empty((len(observed), nN, 2), dtype=int)
+        chi2, amplitude = np.empty((len(observed), nN)), np.empty((len(observed), nN))
+
+        for start in range(0, len(observed), chunksize):
+            block = slice(start, start + chunksize)
+            y, w = observed[block], weights[block]
+
+            cross = (w * y) @ M.T
+            norm = w @ (M ** 2).T
+            a = cross / norm if fit_amplitude else np.ones_like(cross)
+            misfit = np.sum(w * y ** 2, axis=-1)[:, None] - 2 * a * cross + a ** 2 * norm
+
+            # Best (rm, scale) nodes for each N node
+            misfit, a = misfit.reshape(-1, nN, nrm * ns), a.reshape(-1, nN, nrm * ns)
+            i = np.argmin(misfit, axis=-1)[..., None]
+
+            index[block] = np.stack(np.unravel_index(i[..., 0], (nrm, ns)), axis=-1)
+            chi2[block] = np.maximum(np.take_along_axis(misfit, i, -1)[..., 0], 0)
+            amplitude[block] = np.take_along_axis(a, i, -1)[..., 0]
+
+        return (index.reshape(shape + (nN, 2)), chi2.reshape(shape + (nN,)),
+                amplitude.reshape(shape + (nN,)))
+
+    def retrieve(self, observed, sigma=None, fit_amplitude=False,
+                 refine=RETRIEVAL_REFINE):
+        """Retrieve the aerosols parameters of observed spectra.
+
+        The best table nodes (for the best number of monomers and its
+        neighbours nodes) are refined in `log(rm)` and `log(scale)`
+        (within the table range) with parabolic steps evaluated with the
+        direct model (all the spectra at once, 2 model calls per
+        iteration). The number of monomers is retrieved on the table
+        nodes (the aggregates structure factors are tabulated for each
+        number of monomers).
+
+        Parameters
+        ----------
+        observed: numpy.ndarray
+            Observed spectra (last axis: table wavelengths).
+        sigma: float or numpy.ndarray, optional
+            Observations uncertainties (default: relative misfit, `sigma = observed`).
+        fit_amplitude: bool, optional
+            Fit a multiplicative amplitude on the model spectra.
+        refine: int, optional
+            Number of refinement iterations (`0` for the table nodes only).
+
+        Returns
+        -------
+        rm: numpy.ndarray
+            Monomer radii (m).
+        N: numpy.ndarray
+            Number of monomers.
+        scale: numpy.ndarray
+            Imaginary index scaling.
+        amplitude: numpy.ndarray
+            Spectra amplitudes (ones if not fitted).
+        chi2: numpy.ndarray
+            Misfits.
+
+        Raises
+        ------
+        ValueError
+            If the observed spectra are not sampled on the table wavelengths.
+
+        """  # pylint: disable=too-many-locals
+        observed, weights = self._observations(observed, sigma)
+        index, chi2, amplitude = self._search(observed, weights, fit_amplitude)
+
+        # Best N node and its neighbours (if refined)
+        n = np.argmin(chi2, axis=-1)[..., None]
+        if refine:
+            n = np.clip(n + np.array([-1, 0, 1]), 0, len(self.N) - 1)
+
+        index = np.take_along_axis(index, n[..., None], -2)
+        chi2 = np.take_along_axis(chi2, n, -1)
+        amplitude = np.take_along_axis(amplitude, n, -1)
+
+        x = np.stack([np.log(self.rm)[index[..., 0]], np.log(self.scale)[index[..., 1]]],
+                     axis=-1)
+        N = self.N[n]
+        observed, weights = observed[..., None, :], weights[..., None, :]
+
+        nodes = (np.log(self.rm), np.log(self.scale))
+        lower = np.array([values.min() for values in nodes])
+        upper = np.array([values.max() for values in nodes])
+        h = np.array([.5 * np.median(np.diff(values)) if len(values) > 1 else 0
+                      for values in nodes])
+
+        for _ in range(refine):
+            # Neighbours (-/+ h on each parameter)
+            steps = np.array([[-h[0], 0], [h[0], 0], [0, -h[1]], [0, h[1]]])
+            points = np.clip(x[..., None, :] + steps, lower, upper)
+            c2, a = self._evaluate(points, N, observed, weights, fit_amplitude)
+
+            # Parabolic vertex on each parameter
+            fm, fp = c2[..., ::2], c2[..., 1::2]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                curvature = fm + fp - 2 * chi2[..., None]
+                offset = np.where(curvature > 0,
+                                  .5 * h * (fm - fp) / curvature, np.sign(fm - fp) * h)
+            vertex = np.clip(x + np.nan_to_num(np.clip(offset, -h, h)), lower, upper)
+            c2v, av = self._evaluate(vertex[..., None, :], N, observed, weights,
+                                     fit_amplitude)
+
+            # Best of the current, the neighbours and the vertex points
+            candidates = np.concatenate(
+                [x[..., None, :], points, vertex[..., None, :]], axis=-2)
+            c2 = np.concatenate([chi2[..., None], c2, c2v], axis=-1)
+            a = np.concatenate([amplitude[..., None], a, av], axis=-1)
+
+            best = np.argmin(c2, axis=-1)[..., None]
+            x = np.take_along_axis(candidates, best[..., None], -2)[..., 0, :]
+            chi2 = np.take_along_axis(c2, best, -1)[..., 0]
+            amplitude = np.take_along_axis(a, best, -1)[..., 0]
+            h = h / 2
+
+        # Best candidate
+        best = np.argmin(chi2, axis=-1)[..., None]
+        x = np.take_along_axis(x, best[..., None], -2)[..., 0, :]
+
+        return tuple(np.asarray(values)[()] for values in (
+            np.exp(x[..., 0]), np.take_along_axis(N, best, -1)[..., 0],
+            np.exp(x[..., 1]), np.take_along_axis(amplitude, best, -1)[..., 0],
+            np.take_along_axis(chi2, best, -1)[..., 0]))
+
+    def _observations(self, observed, sigma):
+        """Observed spectra and inverse variance weights."""
+        observed = np.asarray(observed, dtype=float)
+
+        if observed.shape[-1] != len(self.wvln):
+            raise ValueError('The observed spectra must be sampled '
+                             'on the table wavelengths')
+
+        sigma = np.abs(observed) if sigma is None else np.asarray(sigma, dtype=float)
+        return observed, np.broadcast_to(1 / sigma ** 2, observed.shape)
+
+    def _evaluate(self, points, N, observed, weights, fit_amplitude):
+        """Direct model misfits at `(log(rm), log(scale))` points."""
+        spectra = self.model(np.exp(points[..., 0]), N[..., None], np.exp(points[..., 1]))
+        return _misfit(observed[..., None, :], weights[..., None, :], spectra,
+                       fit_amplitude)
@@ -0,0 +1,338 @@
+"""Local optical properties HTTP server module."""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+from .fractals import fractals
+from .mie import mie
+from .tholins import DEFAULT_DB, DEFAULT_TABLE, Database, index_tholins
+
+
+SERVER_HOST = '127.0.0.1'  # Local interface only
+SERVER_PORT = 8471         # Default port
+SERVER_CACHE = 4096        # Maximum number of cached results
+
+# Endpoints inputs and options
+ENDPOINTS = {
+    'index_tholins': (('wvln',), ()),
+    'mie_tholins': (('wvln', 'r'), ('nang', 'tol', 'approx_tol', 'precision')),
+    'fractals_tholins': (('wvln', 'rm', 'N'), ('Df', 'nang', 'force', 'precision')),
+}
+
+OUTPUTS = ('qsct', 'qext', 'qabs', 'gg', 'theta', 'P', 'regime')
+
+logger = logging.getLogger(__name__)
+
+
+class OpticsService:
+    """Cached tholins optical properties service.
+
+    The requests are JSON-like objects (or lists of objects for batch
+    requests) with the inputs and the options of an endpoint (and an
+    optional `table` name). The results are cached and the cache misses
+    of a batch are computed at once with array inputs.
+
+    Parameters
+    ----------
+    fname: str or pathlib.Path, optional
+        Optical index database location.
+    table: str, optional
+        Default tholins indexes table name.
+    cache_size: int, optional
+        Maximum number of cached results.
+
+    Note
+    ----
+    The database connections are opened on their first use (ie. in the
+    serving thread) and kept open for all the next requests.
+
+    """
+    def __init__(self, fname=DEFAULT_DB, table=DEFAULT_TABLE, cache_size=SERVER_CACHE):
+        self.fname = fname
+        self.table = table
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.databases = {}
+        self.start = time.time()
+        self.stats = {
+            endpoint: dict.fromkeys(
+                ('requests', 'points', 'hits', 'errors', 'time', 'max_time'), 0)
+            for endpoint in ENDPOINTS
+        }
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} | Cache: {len(self.cache)}/{self.cache_size}>'
+
+    def __call__(self, endpoint, request):
+        """Process a single or a batch request.
+
+        Parameters
+        ----------
+        endpoint: str
+            Endpoint name (`index_tholins`, `mie_tholins` or `fractals_tholins`).
+        request: dict or list
+            Request inputs and options (or list of requests).
+
+        Returns
+        -------
+        dict or list
+            Results (or list of results).
+
+        Raises
+        ------
+        KeyError
+            If the endpoint is unknown.
+        ValueError
+            If the request is invalid.
+
+        """
+        stats = self.stats[endpoint]
+        tic = time.perf_counter()
+        batch = isinstance(request, list)
+
+        try:
+            results = self.evaluate(endpoint, request if batch else [request])
+        except (ValueError, TypeError) as err:
+            stats['errors'] += 1
+            raise ValueError(err)
+        except Exception:
+            stats['errors'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - tic
+            stats['requests'] += 1
+            stats['time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
+
+        return results if batch else results[0]
+
+    def database(self, table=None):
+        """Cached optical index database connection."""
+        table = self.table if table is None else table
+
+        if table not in self.databases:
+            self.databases[table] = Database(self.fname, table)
+
+        return self.databases[table]
+
+    def evaluate(self, endpoint, requests):
+        """Cached results of a list of requests.
+
+        Parameters
+        ----------
+        endpoint: str
+            Endpoint name.
+        requests: list
+            List of requests.
+
+        Returns
+        -------
+        list
+            List of results.
+
+        Raises
+        ------
+        ValueError
+            If a request has unknown or missing parameters.
+
+        """
+        inputs, options = ENDPOINTS[endpoint]
+        results, misses = [None] * len(requests), {}
+
+        for i, request in enumerate(requests):
+            unknown = set(request) - set(inputs) - set(options) - {'table'}
+            if unknown:
+                raise ValueError(f'Unknown parameter(s): {", ".join(sorted(unknown))}')
+
+            missing = set(inputs) - set(request)
+            if missing:
+                raise ValueError(f'Missing parameter(s): {", ".join(sorted(missing))}')
+
+            group = (request.get('table', self.table), tuple(
+                (option, request[option]) for option in options if option in request))
+            key = (endpoint, group, tuple(float(request[name]) for name in inputs))
+
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats[endpoint]['hits'] += 1
+                results[i] = self.cache[key]
+            else:
+                misses.setdefault(group, {}).setdefault(key, []).append(i)
+
+        for (table, group_options), keys in misses.items():
+            values = np.array([key[-1] for key in keys])
+            outputs = self.compute(endpoint, table, values, dict(group_options))
+
+            for (key, indices), output in zip(keys.items(), outputs):
+                self.cache[key] = output
+                for i in indices:
+                    results[i] = output
+
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        self.stats[endpoint]['points'] += len(requests)
+
+        return results
+
+    def compute(self, endpoint, table, values, options):
+        """Compute the optical properties with array inputs.
+
+        Parameters
+        ----------
+        endpoint: str
+            Endpoint name.
+        table: str
+            Tholins indexes table name.
+        values: numpy.ndarray
+            Endpoint inputs (one row per request).
+        options: dict
+            Endpoint options.
+
+        Returns
+        -------
+        list
+            List of JSON serializable results.
+
+        """
+        wvln = values[:, 0]
+        nr, ni = index_tholins(wvln, self.database(table))
+
+        if endpoint == 'index_tholins':
+            return [{'nr': float(n), 'ni': float(k)} for n, k in zip(nr, ni)]
+
+        if endpoint == 'mie_tholins':
+            outputs = mie(wvln, nr, ni, values[:, 1], **options)
+        else:
+            Df = options.pop('Df', 2)
+            outputs = fractals(wvln, nr, ni, values[:, 1], Df, values[:, 2], **options)
+
+        theta = None if outputs[4] is None else outputs[4].tolist()
+
+        return [{
+            name: theta if name == 'theta' else _serialize(value, i)
+            for name, value in zip(OUTPUTS, outputs)
+        } for i in range(len(values))]
+
+    def statistics(self):
+        """Throughput and latency counters.
+
+        Returns
+        -------
+        dict
+            Counters for each endpoint (`requests`, `points`, cache `hits`,
+            `errors`, total and `max_time` processing time in seconds and
+            mean `latency`), the `uptime` (s), the points `throughput`
+            (per second of processing) and the number of `cached` results.
+
+        """
+        stats = {}
+        for endpoint, counters in self.stats.items():
+            stats[endpoint] = dict(counters)
+            stats[endpoint]['latency'] = counters['time'] / max(counters['requests'], 1)
+            stats[endpoint]['throughput'] = counters['points'] / counters['time'] \
+                if counters['time'] else 0
+
+        stats['uptime'] = time.time() - self.start
+        stats['cached'] = len(self.cache)
+
+        return stats
+
+
+def _serialize(value, i):
+    """JSON serializable value of a request in a batch output."""
+    if value is None:
+        return None
+
+    value = value[i]
+
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    if isinstance(value, np.str_):
+        return str(value)
+
+    return None if np.isnan(value) else float(value)
+
+
+class OpticsHandler(BaseHTTPRequestHandler):
+    """Optical properties JSON requests handler.
+
+    - `POST /<endpoint>` with a JSON object (or a list of objects).
+      Invalid requests get a `400` and unexpected errors a `500` JSON
+      error response.
+    - `GET /stats` for the throughput and latency counters.
+
+    """
+    def do_GET(self):  # noqa: N802
+        """Counters requests."""
+        if self.path.rstrip('/') != '/stats':
+            self.reply(404, {'error': f'Unknown path: {self.path}'})
+            return
+
+        self.reply(200, self.server.service.statistics())
+
+    def do_POST(self):  # noqa: N802
+        """Optical properties requests."""
+        endpoint = self.path.strip('/')
+
+        if endpoint not in ENDPOINTS:
+            self.reply(404, {'error': f'Unknown endpoint: {endpoint}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            response = self.server.service(endpoint, request)
+        except ValueError as err:  # Including JSON decoding errors
+            self.reply(400, {'error': str(err)})
+            return
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.exception('Error while processing a `%s` request', endpoint)
+            self.reply(500, {'error': f'{err.__class__.__name__}: {err}'})
+            return
+
+        self.reply(200, response)
+
+    def reply(self, status, content):
+        """Send a JSON response."""
+        body = json.dumps(content).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Log the requests at the `DEBUG` level."""
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class OpticsServer(HTTPServer):
+    """Local optical properties HTTP server.
+
+    The requests are processed sequentially in the serving thread to
+    share the same warm caches (database connections, aggregates
+    geometry, Mie series and results).
+
+    Parameters
+    ----------
+    address: tuple, optional
+        Server `(host, port)` (default: local interface only).
+    service: OpticsService, optional
+        Optical properties service (default: new service).
+
+    """
+    def __init__(self, address=(SERVER_HOST, SERVER_PORT), service=None):
+        super().__init__(address, OpticsHandler)
+        self.service = OpticsService() if service is None else service
+
+    def __repr__(self):
+        host, port = self.server_address[:2]
+        return f'<{self.__class__.__name__} | http://{host}:{port}>'
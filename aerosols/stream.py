@@ -0,0 +1,78 @@
+"""Streaming grids module."""
+
+import numpy as np
+
+from .tholins import Database, fractals_tholins, mie_tholins
+
+
+STREAM_CHUNK = 1_024  # Number of grid points evaluated at once
+
+
+def stream_tholins(wvln, r, N=None, Df=2, db=Database(), chunksize=STREAM_CHUNK,
+                   **kwargs):
+    """Lazy tholins cross-sections and phase functions over a grid.
+
+    The inputs are broadcasted together (without copy) and the grid is
+    evaluated by chunks with the batched `mie` or `fractals` paths. The
+    chunks are computed only when the consumer requests them: the memory
+    footprint only depends on the chunk size and the results can be
+    written to disk or reduced on the fly.
+
+    Parameters
+    ----------
+    wvln: float or numpy.ndarray
+        Wavelengths (m).
+    r: float or numpy.ndarray
+        Particles radii (m) or monomers radii (m) if `N` is provided.
+    N: int or numpy.ndarray, optional
+        Number of monomers for fractal aggregates (Tomasko et al. 2008).
+        If `None` (default), Mie spheres are computed.
+    Df: float, optional
+        Fractal dimension.
+    db: Database, optional
+        Optical index database.
+    chunksize: int, optional
+        Number of grid points per chunk.
+    **kwargs:
+        Other `mie_tholins` or `fractals_tholins` options (eg. `nang`).
+
+    Yields
+    ------
+    index: tuple
+        Grid indices of the chunk points (one array per grid axis).
+    results: tuple
+        Chunk `qsct, qext, qabs, gg, theta, P` outputs (first axis),
+        see `mie_tholins` and `fractals_tholins`.
+
+    Raises
+    ------
+    ValueError
+        If the chunk size is not strictly positive or if the inputs can
+        not be broadcasted together.
+
+    """
+    if chunksize < 1:
+        raise ValueError('The chunk size must be strictly positive')
+
+    # Broadcast errors are raised at call time (not on the first chunk)
+    fractal = N is not None
+    grid = np.broadcast_arrays(*np.atleast_1d(wvln, r, N if fractal else 0))
+
+    return _stream(grid, fractal, Df, db, chunksize, kwargs)
+
+
+def _stream(grid, fractal, Df, db, chunksize, options):
+    """Grid chunks generator (see `stream_tholins`)."""
+    shape = grid[0].shape
+
+    for start in range(0, grid[0].size, chunksize):
+        index = np.unravel_index(
+            np.arange(start, min(start + chunksize, grid[0].size)), shape)
+        w, x, n = (values[index] for values in grid)
+
+        if fractal:
+            results = fractals_tholins(w, x, Df, n, db, **options)
+        else:
+            results = mie_tholins(w, x, db, **options)
+
+        yield index, results
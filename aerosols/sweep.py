@@ -0,0 +1,353 @@
+"""Shared filesystem sweeps module."""
+
+import hashlib
+import json
+import os
+import shutil
+import socket
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .mie import NANG
+from .parallel import SharedTable
+from .tholins import (
+    DEFAULT_DB, DEFAULT_TABLE, Database,
+    fractals_tholins, mie_tholins, stack_fields
+)
+
+
+SWEEP_CHUNK = 256     # Number of grid points per chunk
+SWEEP_TIMEOUT = 3600  # Claims expiration (s)
+
+
+class Sweep:
+    """Grid sweep split into chunks in a shared directory.
+
+    Any number of workers (on the nodes sharing the directory) can run
+    the sweep: the chunks are claimed with atomic renames, their results
+    are saved with a completion marker and the claims older than the
+    timeout (abandoned by a dead worker) are claimed again. A stopped
+    sweep restarts where it stopped.
+
+    Directory layout:
+
+    - `sweep.json`: sweep configuration.
+    - `grid.npz`: grid inputs (broadcasted by the workers).
+    - `todo/<chunk>`: chunks not claimed yet.
+    - `claimed/<chunk>@<worker>@<time>`: chunks claims.
+    - `results/<chunk>.npy`: chunks results (`SharedTable` rows).
+    - `done/<chunk>`: completion markers.
+
+    Parameters
+    ----------
+    directory: str or pathlib.Path
+        Sweep directory (see `Sweep.create`).
+
+    Raises
+    ------
+    FileNotFoundError
+        If the sweep configuration is not found.
+
+    Note
+    ----
+    The claims expiration relies on the nodes clocks synchronization.
+
+    """
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.config = json.loads((self.directory / 'sweep.json').read_text())
+
+    def __repr__(self):
+        status = ' | '.join(f'{key.title()}: {n}' for key, n in self.status.items())
+        return f'<{self.__class__.__name__} {self.directory.name} | {status}>'
+
+    def __len__(self):
+        return self.config['chunks']
+
+    @classmethod
+    def create(cls, directory, wvln, r, N=None, Df=2, fname=DEFAULT_DB,
+               table=DEFAULT_TABLE, nang=NANG, force=False, chunksize=SWEEP_CHUNK):
+        """Create a sweep directory (or reopen an existing one).
+
+        The sweep is prepared in a private staging directory and published
+        with an atomic rename: the workers never see a partial sweep and
+        concurrent creations of the same sweep (eg. from several nodes)
+        all reopen the first one published.
+
+        Parameters
+        ----------
+        directory: str or pathlib.Path
+            Sweep directory.
+        wvln: float or numpy.ndarray
+            Wavelengths (m).
+        r: float or numpy.ndarray
+            Particles radii (m) or monomers radii (m) if `N` is provided.
+        N: int or numpy.ndarray, optional
+            Number of monomers for fractal aggregates (Tomasko et al. 2008).
+            If `None` (default), Mie spheres are computed.
+        Df: float, optional
+            Fractal dimension.
+        fname: str or pathlib.Path, optional
+            Optical index database location (shared with the workers).
+            The packaged database is located on each node and a custom
+            database is stored relatively to the sweep directory.
+        table: str, optional
+            Tholins indexes table name.
+        nang: int, optional
+            Number of angles for the phase function (range from 0 to π/2).
+        force: bool, optional
+            Bypass fractals validity checks.
+        chunksize: int, optional
+            Number of grid points per chunk.
+
+        Returns
+        -------
+        Sweep
+            Grid sweep.
+
+        Raises
+        ------
+        ValueError
+            If the directory contains a different sweep (or is not empty).
+
+        """  # pylint: disable=too-many-locals
+        fractal = N is not None
+        grid = np.atleast_1d(wvln, r, N if fractal else 0)
+        shape = np.broadcast(*grid).shape
+        size = int(np.prod(shape))
+
+        digest = hashlib.sha1()
+        for values in grid:
+            digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+            digest.update(str(np.shape(values)).encode())
+
+        config = {
+            'shape': list(shape),
+            'chunksize': chunksize,
+            'chunks': -(-size // chunksize),
+            'fractal': fractal,
+            'Df': float(Df),
+            'table': table,
+            'nang': int(nang),
+            'force': bool(force),
+            'fname': None,
+            'digest': digest.hexdigest(),
+        }
+
+        directory = Path(directory)
+        fname = Database(fname, table).fname.resolve()
+
+        if fname != DEFAULT_DB.resolve():
+            config['fname'] = os.path.relpath(fname, directory.resolve())
+
+        if not (directory / 'sweep.json').exists():
+            staging = directory.parent / \
+                f'.{directory.name}.{socket.gethostname()}-{os.getpid()}'
+
+            for folder in ('todo', 'claimed', 'results', 'done'):
+                (staging / folder).mkdir(parents=True, exist_ok=True)
+
+            np.savez(staging / 'grid.npz', wvln=grid[0], r=grid[1], N=grid[2])
+
+            for chunk in range(config['chunks']):
+                (staging / 'todo' / f'{chunk:06d}').touch()
+
+            (staging / 'sweep.json').write_text(json.dumps(config))
+
+            try:
+                os.rename(staging, directory)  # Fails if published by another node
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        if not (directory / 'sweep.json').exists():
+            raise ValueError(f'`{directory}` is not empty')
+
+        if json.loads((directory / 'sweep.json').read_text()) != config:
+            raise ValueError(f'A different sweep already exists in `{directory}`')
+
+        return cls(directory)
+
+    def database(self):
+        """Optical index database of the sweep (located on the current node)."""
+        fname = self.config.get('fname')
+        return Database(DEFAULT_DB if fname is None else self.directory / fname,
+                        self.config['table'])
+
+    @property
+    def status(self):
+        """Number of `todo`, `claimed` and `done` chunks."""
+        done = set(os.listdir(self.directory / 'done'))
+        claimed = {name.split('@')[0] for name in os.listdir(self.directory / 'claimed')}
+
+        return {
+            'todo': len(os.listdir(self.directory / 'todo')),
+            'claimed': len(claimed - done),
+            'done': len(done),
+        }
+
+    def claim(self, worker, timeout=SWEEP_TIMEOUT):
+        """Claim a chunk (a new one or an expired claim).
+
+        Parameters
+        ----------
+        worker: str
+            Worker name.
+        timeout: float, optional
+            Claims expiration (s).
+
+        Returns
+        -------
+        int or None
+            Claimed chunk (`None` if all the chunks are done or claimed).
+        str or None
+            Claim file name.
+
+        """
+        todo, claimed = self.directory / 'todo', self.directory / 'claimed'
+
+        for name in sorted(os.listdir(todo)):
+            claim = f'{name}@{worker}@{time.time():.6f}'
+            try:
+                os.rename(todo / name, claimed / claim)
+                return int(name), claim
+            except FileNotFoundError:
+                continue  # Claimed by another worker
+
+        for name in sorted(os.listdir(claimed)):
+            chunk, _, stamp = name.split('@')
+
+            if (self.directory / 'done' / chunk).exists():
+                _remove(claimed / name)
+                continue
+
+            if time.time() - float(stamp) > timeout:
+                claim = f'{chunk}@{worker}@{time.time():.6f}'
+                try:
+                    os.rename(claimed / name, claimed / claim)
+                    return int(chunk), claim
+                except FileNotFoundError:
+                    continue  # Claimed again by another worker
+
+        return None, None
+
+    def compute(self, chunk, db=None):
+        """Compute the results of a chunk.
+
+        Parameters
+        ----------
+        chunk: int
+            Chunk index.
+        db: Database, optional
+            Optical index database (default: sweep database).
+
+        Returns
+        -------
+        numpy.ndarray
+            Chunk results (`SharedTable` rows).
+
+        """
+        config = self.config
+        db = self.database() if db is None else db
+
+        with np.load(self.directory / 'grid.npz') as data:
+            grid = np.broadcast_arrays(data['wvln'], data['r'], data['N'])
+
+        size = grid[0].size
+        start = chunk * config['chunksize']
+        index = np.unravel_index(
+            np.arange(start, min(start + config['chunksize'], size)), grid[0].shape)
+        wvln, r, N = (values[index] for values in grid)
+
+        if config['fractal']:
+            qsct, qext, qabs, gg, _, P = fractals_tholins(
+                wvln, r, config['Df'], N, db, nang=config['nang'], force=config['force'])
+        else:
+            qsct, qext, qabs, gg, _, P = mie_tholins(wvln, r, db, nang=config['nang'])
+
+        return stack_fields(qsct, qext, qabs, gg, P)
+
+    def run(self, worker=None, timeout=SWEEP_TIMEOUT, max_chunks=None):
+        """Claim and compute chunks until all of them are done or claimed.
+
+        Parameters
+        ----------
+        worker: str, optional
+            Worker name (default: `<hostname>-<pid>`).
+        timeout: float, optional
+            Claims expiration (s), longer than a chunk computation.
+        max_chunks: int, optional
+            Maximum number of chunks to compute.
+
+        Returns
+        -------
+        int
+            Number of chunks computed.
+
+        """
+        worker = f'{socket.gethostname()}-{os.getpid()}' if worker is None else worker
+        worker = worker.replace('@', '-')
+        db = self.database()
+
+        count = 0
+        while max_chunks is None or count < max_chunks:
+            chunk, claim = self.claim(worker, timeout)
+
+            if chunk is None:
+                break
+
+            name = f'{chunk:06d}'
+            tmp = self.directory / 'results' / f'.{name}.{worker}.npy'
+            np.save(tmp, self.compute(chunk, db))
+            os.replace(tmp, self.directory / 'results' / f'{name}.npy')
+
+            (self.directory / 'done' / name).touch()
+            _remove(self.directory / 'claimed' / claim)
+            count += 1
+
+        return count
+
+    def merge(self, filename=None):
+        """Assemble the chunks results in a table.
+
+        Parameters
+        ----------
+        filename: str or pathlib.Path, optional
+            Memory-mapped `.npy` output file (default: shared memory).
+
+        Returns
+        -------
+        SharedTable
+            Results table (flattened grid, see `parallel_tholins`).
+
+        Raises
+        ------
+        ValueError
+            If some chunks are not done.
+
+        """
+        config = self.config
+        missing = [chunk for chunk in range(len(self))
+                   if not (self.directory / 'done' / f'{chunk:06d}').exists()]
+
+        if missing:
+            raise ValueError(f'{len(missing)} chunk(s) not done (first: {missing[0]})')
+
+        size = int(np.prod(config['shape']))
+        table = SharedTable(size, nang=config['nang'], filename=filename)
+
+        for chunk in range(len(self)):
+            start = chunk * config['chunksize']
+            rows = np.load(self.directory / 'results' / f'{chunk:06d}.npy')
+            table.data[start:start + len(rows)] = rows
+
+        return table
+
+
+def _remove(fname):
+    """Remove a file (if it still exists)."""
+    try:
+        os.remove(fname)
+    except FileNotFoundError:
+        pass
@@ -1,6 +1,10 @@
 """Tholins database module."""
 
+import logging
+import os
+import re
 import sqlite3 as sqlite
+import warnings
 from pathlib import Path
 
 import numpy as np
@@ -12,6 +16,16 @@ from .mie import mie
 DEFAULT_DB = Path(__file__).parent / 'data' / 'optical_index.db'
 DEFAULT_TABLE = 'Tholins_Doose'
 
+TABLE_NAME = re.compile(r'^[A-Za-z_]\w*$')  # Valid table names
+UNITS = {'m': 1e6, 'um': 1, 'nm': 1e-3}     # Wavelength units conversion to µm
+FIELDS = ('qsct', 'qext', 'qabs', 'gg')     # Table rows scalar columns (before P)
+
+logger = logging.getLogger(__name__)
+
+
+class ExtrapolationWarning(UserWarning):
+    """Optical index extrapolated outside the database range."""
+
 
 class Database:
     """Optical indexes constant database.
@@ -30,10 +44,17 @@ class Database:
     ValueError
         If the tholins indexes table is not found.
 
+    Note
+    ----
+    The tables are loaded at once on their first use and cached (see
+    `indexes`). The number of extrapolated wavelengths is counted in
+    `extrapolated` for each `(table, direction)`.
+
     """
     def __init__(self, fname=DEFAULT_DB, table=DEFAULT_TABLE):
         self.fname = fname
         self.table = table
+        self.extrapolated = {}
 
     def __str__(self):
         return self.fname.name
@@ -56,6 +77,7 @@ class Database:
 
         self.con = sqlite.connect(self.fname)
         self.db = self.con.cursor()
+        self.__indexes = {}
 
     @property
     def table(self):
@@ -66,13 +88,60 @@ class Database:
     def table(self, table):
         """Tholins indexes table name setter."""
         self.db.execute(
-            f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
+            "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
 
         if not self.db.fetchone():
             raise ValueError(f"Table `{table}` not found in the database")
 
         self.__table = table
 
+    @property
+    def wvln(self):
+        """Tabulated wavelengths (m)."""
+        return self.indexes[0] * 1e-6
+
+    @property
+    def sidecar(self):
+        """Binary sidecar file of the table (`<database>.<table>.npy`)."""
+        return self.fname.with_name(f'{self.fname.stem}.{self.table}.npy')
+
+    @property
+    def indexes(self):
+        """Tabulated wavelengths (µm), real and imaginary optical indexes.
+
+        The table is loaded in one read and cached. Its binary sidecar
+        is memory-mapped if it still matches the table (same number of
+        rows and columns sums, computed by SQLite without loading the rows).
+
+        """
+        if self.table not in self.__indexes:
+            data = self._sidecar()
+
+            if data is None:
+                self.execute(f'SELECT wvln, nr, ni FROM "{self.table}" ORDER BY wvln ASC')
+                data = np.transpose(self.fetchall())
+
+            self.__indexes[self.table] = tuple(data)
+
+        return self.__indexes[self.table]
+
+    def _sidecar(self):
+        """Memory-mapped sidecar of the table (`None` if missing, unreadable or stale)."""
+        try:
+            data = np.load(self.sidecar, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        self.execute(
+            f'SELECT COUNT(*), TOTAL(wvln), TOTAL(nr), TOTAL(ni) FROM "{self.table}"')
+        count, *totals = self.fetchone()
+
+        if data.shape != (3, count) or not np.allclose(
+                data.sum(axis=1), totals, rtol=1e-12, atol=0):
+            return None
+
+        return data
+
     def fetchone(self):
         """Fetch from the database."""
         out = self.db.fetchone()
@@ -82,9 +151,133 @@ class Database:
 
         return out
 
-    def execute(self, cmd):
+    def fetchall(self):
+        """Fetch all the rows from the database."""
+        return self.db.fetchall()
+
+    def execute(self, cmd, params=()):
         """Execute SQL string in the database"""
-        return self.db.execute(cmd)
+        return self.db.execute(cmd, params)
+
+
+def import_indexes(source, table, fname, unit='um', replace=False):
+    """Bulk import optical indexes in a database table.
+
+    The table is created with an unique index on the wavelengths and
+    a binary sidecar (see `Database.indexes`) is saved next to the
+    database.
+
+    Parameters
+    ----------
+    source: str, pathlib.Path or numpy.ndarray
+        CSV file (`wvln, nr, ni` columns with an optional header line),
+        NumPy `.npy` file or array with 3 columns.
+    table: str
+        Table name.
+    fname: str or pathlib.Path
+        Database location (created if it does not exist).
+    unit: str, optional
+        Wavelength unit (`m`, `um` or `nm`).
+    replace: bool, optional
+        Replace the table if it already exists.
+
+    Returns
+    -------
+    Database
+        Optical index database on the imported table.
+
+    Raises
+    ------
+    ValueError
+        If the table name or the unit are invalid, if the wavelengths
+        are not sorted and unique, if the indexes are not positive or
+        if the table already exists (without `replace`).
+
+    """
+    if not TABLE_NAME.match(table):
+        raise ValueError(f'Invalid table name: `{table}`')
+
+    if unit not in UNITS:
+        raise ValueError(f'Unknown wavelength unit `{unit}` '
+                         f'(available: {", ".join(UNITS)})')
+
+    data = _read_indexes(source)
+    data[:, 0] *= UNITS[unit]
+
+    if len(data) < 2 or not np.all(np.isfinite(data)):
+        raise ValueError('At least 2 rows of finite values are required')
+
+    if np.any(np.diff(data[:, 0]) <= 0):
+        raise ValueError('Wavelengths must be sorted and unique')
+
+    if np.any(data <= 0):
+        raise ValueError('Wavelengths and optical indexes must be positive')
+
+    con = sqlite.connect(fname)
+    try:
+        with con:
+            exists = con.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                (table,)).fetchone()
+
+            if exists and not replace:
+                raise ValueError(f'Table `{table}` already exists in the database')
+
+            con.execute(f'DROP TABLE IF EXISTS "{table}"')
+            con.execute(f'CREATE TABLE "{table}" (`wvln` REAL, `nr` REAL, `ni` REAL)')
+            con.executemany(f'INSERT INTO "{table}" VALUES (?, ?, ?)', data.tolist())
+            con.execute(f'CREATE UNIQUE INDEX "{table}_wvln" ON "{table}" (`wvln`)')
+    finally:
+        con.close()
+
+    # Sidecar written in a temporary file and moved (never seen partially written)
+    db = Database(fname, table)
+    tmp = db.sidecar.with_name(f'.{db.sidecar.stem}.{os.getpid()}.npy')
+    try:
+        np.save(tmp, np.ascontiguousarray(data.T))
+        os.replace(tmp, db.sidecar)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    return db
+
+
+def _read_indexes(source):
+    """Read optical indexes from a CSV or NumPy file (or an array).
+
+    Parameters
+    ----------
+    source: str, pathlib.Path or numpy.ndarray
+        Optical indexes source.
+
+    Returns
+    -------
+    numpy.ndarray
+        Optical indexes (`wvln, nr, ni` columns).
+
+    Raises
+    ------
+    ValueError
+        If the data do not have 3 columns.
+
+    """
+    if isinstance(source, (str, Path)):
+        if Path(source).suffix == '.npy':
+            data = np.load(source)
+        else:
+            try:
+                data = np.loadtxt(source, delimiter=',', ndmin=2)
+            except ValueError:  # Header line
+                data = np.loadtxt(source, delimiter=',', ndmin=2, skiprows=1)
+    else:
+        data = source
+
+    data = np.array(data, dtype=float)
+
+    if data.ndim != 2 or data.shape[1] != 3:
+        raise ValueError('Optical indexes must have 3 columns: `wvln, nr, ni`')
+
+    return data
 
 
 def index_tholins(wvln, db=Database()):
@@ -92,18 +285,26 @@ def index_tholins(wvln, db=Database()):
 
     Parameters
     ----------
-    wvln: float
-        Wavelength (m).
+    wvln: float or numpy.ndarray
+        Wavelength(s) (m).
     db: Database, optional
         Optical index database.
 
     Returns
     -------
-    nr: float
+    nr: float or numpy.ndarray
         Real part of the optical index.
-    ni: float
+    ni: float or numpy.ndarray
         Imaginary part of the optical index.
 
+    Warns
+    -----
+    ExtrapolationWarning
+        If some wavelengths are outside the database range. The warning is
+        emitted only once per table and direction for each database (the
+        next ones are logged at the `DEBUG` level and counted in
+        `db.extrapolated`).
+
     Note
     ----
     The values are extrapolated as constant for wavelengths above and
@@ -115,63 +316,82 @@ def index_tholins(wvln, db=Database()):
     For `Tholins_CVD` table between 935 nm and 1.5 µm, the bump of the
     imaginary part is removed and fixed at 7.19e-3.
 
-    """
-
+    """  # pylint: disable=too-many-locals
     # Convert wavelength meters in micrometers
-    wvln *= 1e6
+    scalar = np.ndim(wvln) == 0
+    wvln = np.atleast_1d(wvln) * 1e6
 
-    # Values SUP
-    db.execute(
-        f"SELECT wvln, nr, ni FROM {db.table} WHERE wvln >= {wvln:.4f}"
-        " ORDER BY wvln ASC LIMIT 1"
-    )
+    wvlns, nrs, nis = db.indexes
 
-    try:
-        wvln_sup, nr_sup, ni_sup = db.fetchone()
-    except ValueError:
-        db.execute(f"SELECT MAX(wvln), nr, ni FROM {db.table}")
-        wvln_max, nr, ni = db.fetchone()
-        print(
-            f">>WARNING: wvln = {wvln:.3e} m > wvln_max_db = {wvln_max * 1.e-6:.3e} m"
-            " => extrapolation cst"
-        )
-        return nr, ni
-
-    # Values INF
-    db.execute(
-        f"SELECT wvln, nr, ni FROM {db.table} WHERE wvln <= {wvln:.4f}"
-        " ORDER BY wvln DESC LIMIT 1"
-    )
+    # Closest values SUP and INF (with a 1e-4 µm precision)
+    wvln_round = np.round(wvln, 4)
+    sup = np.searchsorted(wvlns, wvln_round, side='left')
+    inf = np.searchsorted(wvlns, wvln_round, side='right') - 1
 
-    try:
-        wvln_inf, nr_inf, ni_inf = db.fetchone()
-    except ValueError:
-        db.execute(f"SELECT MIN(wvln), nr, ni FROM {db.table}")
-        wvln_min, nr, ni = db.fetchone()
-        print(
-            f">>WARNING: wvln = {wvln:.3e} m < wvln_min_db = {wvln_min*1.e-6:.3e} m"
-            " => extrapolation cst"
-        )
-        return nr, ni
+    above, below = sup == len(wvlns), inf < 0
+    sup, inf = np.minimum(sup, len(wvlns) - 1), np.maximum(inf, 0)
+
+    wvln_sup, nr_sup, ni_sup = wvlns[sup], nrs[sup], nis[sup]
+    wvln_inf, nr_inf, ni_inf = wvlns[inf], nrs[inf], nis[inf]
 
     # Remove the bump @ 1 um (only for Tholin_CVD)
-    if db.table == 'Tholins_CVD' and .935 <= wvln <= 1.5:
-        ni_sup = 7.19e-3
+    if db.table == 'Tholins_CVD':
+        ni_sup = np.where((.935 <= wvln) & (wvln <= 1.5), 7.19e-3, ni_sup)
+
+    # Interpolation factor (in LOG wvln), except for the known values
+    known = wvln_sup == wvln_inf
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = (np.log(wvln) - np.log(wvln_inf)) / (np.log(wvln_sup) - np.log(wvln_inf))
 
-    # Known value (no interpolation)
-    if wvln_sup == wvln_inf:
-        return nr_sup, ni_sup
+        # Real part is linear interpolated
+        nr = np.where(known, nr_sup, nr_inf + factor * (nr_sup - nr_inf))
+        # Imaginary part is LOG interpolated
+        ni = np.where(known, ni_sup,
+                      np.exp(np.log(ni_inf) + factor * (np.log(ni_sup) - np.log(ni_inf))))
 
-    # Interpolation factor (in LOG wvln)
-    factor = (np.log(wvln) - np.log(wvln_inf)) / (np.log(wvln_sup) - np.log(wvln_inf))
-    # Real part is linear interpolated
-    nr = nr_inf + factor * (nr_sup - nr_inf)
-    # Imaginary part is LOG interpolated
-    ni = np.exp(np.log(ni_inf) + factor * (np.log(ni_sup) - np.log(ni_inf)))
+    # Constant extrapolation outside the database range
+    for direction, outside, i in (('above', above, -1), ('below', below & ~above, 0)):
+        if np.any(outside):
+            nr[outside], ni[outside] = nrs[i], nis[i]
+            _report_extrapolation(db, direction, wvln[outside] * 1e-6, wvlns[i] * 1e-6)
+
+    if scalar:
+        return nr[0], ni[0]
 
     return nr, ni
 
 
+def _report_extrapolation(db, direction, wvln, limit):
+    """Report extrapolated wavelengths once per table and direction.
+
+    Parameters
+    ----------
+    db: Database
+        Optical index database.
+    direction: str
+        `above` or `below` the database range.
+    wvln: numpy.ndarray
+        Extrapolated wavelengths (m).
+    limit: float
+        Database range limit (m).
+
+    """
+    key = (db.table, direction)
+    count = db.extrapolated.get(key, 0)
+    db.extrapolated[key] = count + len(wvln)
+
+    msg = (
+        f"{len(wvln)} wavelength(s) between {np.min(wvln):.3e} and {np.max(wvln):.3e} m "
+        f"{direction} the `{db.table}` range ({'max' if direction == 'above' else 'min'}"
+        f" = {limit:.3e} m) => extrapolation cst"
+    )
+
+    if count == 0:
+        warnings.warn(msg, ExtrapolationWarning, stacklevel=3)
+    else:
+        logger.debug(msg)
+
+
 def mie_tholins(wvln, r, db=Database(), **kwargs):
     """Mie cross-sections and phase function for tholin particle.
 
@@ -187,6 +407,8 @@ def mie_tholins(wvln, r, db=Database(), **kwargs):
         Optical index database.
     nang: int, optional
         Number of angles for the phase function.
+    precision: str, optional
+        Precision of the phase function (`double` or `single`).
 
     Returns
     -------
@@ -229,6 +451,8 @@ def fractals_tholins(wvln, rm, Df, N, db=Database(), **kwargs):
         Number of angles for the phase function (range from 0 to π/2).
     force: bool, optional
         Bypass validity checks.
+    precision: str, optional
+        Precision of the phase function (`double` or `single`).
 
     Returns
     -------
@@ -248,3 +472,34 @@ def fractals_tholins(wvln, rm, Df, N, db=Database(), **kwargs):
     """
     nr, ni = index_tholins(wvln, db)
     return fractals(wvln, nr, ni, rm, Df, N, **kwargs)
+
+
+def stack_fields(qsct, qext, qabs, gg, P):
+    """Stack the optical properties in table rows.
+
+    The rows layout is shared by the parallel, sweep and adaptive
+    tables: the `FIELDS` followed by the phase function.
+
+    Parameters
+    ----------
+    qsct, qext, qabs: float or numpy.ndarray
+        Cross sections (m^-2).
+    gg: float, numpy.ndarray or None
+        Asymmetry parameter (stored as `nan` if it is not calculated).
+    P: numpy.ndarray
+        Phase functions (last axis).
+
+    Returns
+    -------
+    numpy.ndarray
+        Table rows (last axis).
+
+    """
+    P = np.asarray(P)
+    rows = np.empty(P.shape[:-1] + (len(FIELDS) + P.shape[-1],))
+    rows[..., len(FIELDS):] = P
+
+    for i, value in enumerate((qsct, qext, qabs, np.nan if gg is None else gg)):
+        rows[..., i] = value
+
+    return rows
@@ -42,7 +42,10 @@ setup(
     long_description_content_type='text/markdown',
     entry_points={
         'console_scripts': [
-            'fractal_tholins=aerosols.cli:cli_fractal_tholins'
+            'fractal_tholins=aerosols.cli:cli_fractal_tholins',
+            'aerosols_server=aerosols.cli:cli_aerosols_server',
+            'import_indexes=aerosols.cli:cli_import_indexes',
+            'aerosols_sweep=aerosols.cli:cli_sweep',
         ]
     },
 )
@@ -0,0 +1,150 @@
+"""Test adaptive module."""
+# pylint: disable=missing-function-docstring
+
+import numpy as np
+
+from pytest import approx, raises
+
+from aerosols.adaptive import AdaptiveTable, adaptive_tholins
+from aerosols.tholins import Database, fractals_tholins, mie_tholins
+
+
+def peak(x, y):
+    return np.stack([1 + np.exp(-((x - .3) ** 2 + (y - .6) ** 2) / 2e-3), x + y], axis=-1)
+
+
+def test_adaptive_table(tmp_path):
+    table = AdaptiveTable.build(peak, [(0, 1), (0, 1)], log=False, rtol=1e-3)
+
+    assert table.ndim == 2
+    assert table.uniform == 257 ** 2
+    assert repr(table) == (
+        f'<AdaptiveTable | Nodes: {len(table)} | Leaves: {table.leaves} | '
+        'Uniform: 66049>')
+
+    # Refined around the peak only
+    assert len(table) < table.uniform / 10
+
+    x, y = np.random.default_rng(42).random((2, 1_000))
+    values = table(x, y)
+
+    assert values.shape == (1_000, 2)
+    assert values == approx(peak(x, y), abs=1e-2)
+    assert values[:, 1] == approx(x + y)
+
+    # Exact at the nodes
+    assert table(0, 1) == approx(peak(0, 1))
+    assert table(np.array([[0], [1]]), [0, .5, 1]).shape == (2, 3, 2)
+
+    table.save(tmp_path / 'table.npz')
+    loaded = AdaptiveTable.load(tmp_path / 'table.npz')
+
+    assert len(loaded) == len(table)
+    assert loaded(x, y) == approx(values)
+
+
+def test_adaptive_table_anisotropic():
+    def step(x, y):
+        return np.stack([np.tanh(50 * (x - .4)) + 2 + y], axis=-1)
+
+    table = AdaptiveTable.build(step, [(0, 1), (0, 1)], log=False, rtol=1e-3)
+
+    # Bisected along the first axis only
+    assert set(table.splits) == {1}
+    assert table(.4, .7)[0] == approx(2.7, abs=1e-3)
+
+
+def test_adaptive_table_log_values():
+    table = AdaptiveTable.build(lambda x, y: np.stack([x ** 3 / y ** 2], -1),
+                                [(1, 10), (1, 10)], rtol=1e-8, log_values=True)
+
+    # Power laws are exact in log scale (only the coarse cells are evaluated)
+    assert len(table) == 225
+    assert table.leaves == 16
+    assert table(2.5, 3.3)[0] == approx(2.5 ** 3 / 3.3 ** 2)
+
+    # Clipped outside the bounds
+    assert table(20, 1)[0] == approx(1_000)
+
+
+def test_adaptive_table_breaks():
+    def kink(x, y):
+        return np.stack([np.abs(x - .37) + y], axis=-1)
+
+    table = AdaptiveTable.build(kink, [(0, 1), (0, 1)], log=False, breaks=[[.37], None])
+
+    # Kink on the coarse cells edges (no refinement)
+    assert table.edges[0] == approx([0, .25, .37, .5, .75, 1])
+    assert table.leaves == 20
+    assert table(.37, .5)[0] == approx(.5)
+    assert table(.3, .2)[0] == approx(.27)
+
+    # Uniform edges merged with the closer breaks
+    table = AdaptiveTable.build(kink, [(0, 1), (0, 1)], log=False, breaks=[[.3, 2], None])
+
+    assert table.edges[0] == approx([0, .3, .5, .75, 1])
+
+
+def test_adaptive_table_errors():
+    with raises(ValueError):
+        _ = AdaptiveTable.build(peak, [(1, 0), (0, 1)], log=False)
+
+    with raises(ValueError):
+        _ = AdaptiveTable.build(peak, [(0, 1), (0, 1)])  # Log scale from 0
+
+    with raises(ValueError):
+        _ = AdaptiveTable.build(peak, [(0, 1), (0, 1)], shape=0, log=False)
+
+    with raises(ValueError):
+        _ = AdaptiveTable.build(peak, [(0, 1), (0, 1)], max_level=0, log=False)
+
+    table = AdaptiveTable.build(peak, [(0, 1), (0, 1)], max_level=1, log=False)
+
+    assert len(table) == 81
+
+    with raises(ValueError):
+        _ = table(.5)
+
+
+def test_adaptive_mie_tholins():
+    table = adaptive_tholins((300e-9, 1e-6), (10e-9, 300e-9), nang=3, rtol=3e-3)
+
+    # Database wavelengths on the coarse edges
+    wvln = Database().wvln
+    assert np.isin(wvln[(wvln > 300e-9) & (wvln < 1e-6)], table.edges[0]).all()
+
+    # Order of magnitude fewer evaluations than the uniform 257 x 257 grid
+    # (the bilinear grid with the same phase functions accuracy)
+    assert len(table) < (257 ** 2) / 10
+
+    wvln, r = np.geomspace(300e-9, 1e-6, 23)[:, None], np.geomspace(10e-9, 300e-9, 17)
+    qsct, qext, qabs, gg, _, P = mie_tholins(wvln, r, nang=3)
+    values = table(wvln, r)
+
+    assert values.shape == (23, 17, 9)
+    assert values[..., 0] == approx(qsct, rel=5e-3, abs=0)
+    assert values[..., 1] == approx(qext, rel=5e-3, abs=0)
+    assert values[..., 2] == approx(qabs, rel=5e-3, abs=0)
+    assert values[..., 3] == approx(gg, abs=5e-3)
+    assert values[..., 4:] == approx(P, rel=2e-2, abs=2e-2)
+
+    # Exact at the nodes
+    _, qext, *_ = mie_tholins(400e-9, 20e-9, nang=3)
+    assert table(400e-9, 20e-9)[1] == approx(qext)
+
+
+def test_adaptive_fractals_tholins():
+    table = adaptive_tholins((400e-9, 700e-9), (20e-9, 40e-9), N=(100, 400), nang=3,
+                             shape=2, max_level=1, rtol=1e-2)
+
+    assert table.ndim == 3
+
+    qsct, qext, qabs, gg, _, _ = fractals_tholins(400e-9, 20e-9, 2, 400, nang=3)
+    values = table(400e-9, 20e-9, 400)
+
+    assert values[:3] == approx([qsct, qext, qabs])
+    assert gg is None
+    assert np.isnan(values[3])
+
+    assert table(500e-9, 30e-9, 200)[1] == approx(
+        fractals_tholins(500e-9, 30e-9, 2, 200, nang=3)[1], rel=5e-2)
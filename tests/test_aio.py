@@ -0,0 +1,73 @@
+"""Test asyncio module."""
+# pylint: disable=missing-function-docstring
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import approx, raises
+
+from aerosols.aio import AsyncTholins
+from aerosols.tholins import fractals_tholins, mie_tholins
+
+
+def test_aio_mie():
+    aio = AsyncTholins()
+    assert repr(aio) == '<AsyncTholins | Window: 2 ms | In-flight: 0>'
+
+    async def requests():
+        return await asyncio.gather(
+            aio.mie_tholins(300e-9, 50e-9),
+            aio.mie_tholins(500e-9, 50e-9),
+            aio.mie_tholins(300e-9, 50e-9),
+            aio.mie_tholins(300e-9, 50e-9 + 1e-20),  # Same rounded inputs
+            aio.mie_tholins(300e-9, 50e-9, nang=None),
+        )
+
+    results = asyncio.run(requests())
+
+    assert aio.stats == {'requests': 5, 'coalesced': 2, 'batches': 2, 'fallbacks': 0}
+    assert results[0] is results[2] is results[3]
+
+    for (wvln, kwargs), res in zip([(300e-9, {}), (500e-9, {}), (300e-9, {'nang': None})],
+                                   [results[0], results[1], results[4]]):
+        expected = mie_tholins(wvln, 50e-9, **kwargs)
+
+        for value, exp in zip(res, expected):
+            assert value == exp if exp is None else value == approx(exp, rel=1e-6)
+
+    assert not results[0][-1].flags.writeable
+
+
+def test_aio_fractals():
+    aio = AsyncTholins(executor=ThreadPoolExecutor(2), window=1e-2)
+
+    async def requests():
+        return await asyncio.gather(
+            aio.fractals_tholins(338e-9, 60e-9, 2, 266, nang=10),
+            aio.fractals_tholins(500e-9, 60e-9, 2, 100, nang=10),
+            aio.fractals_tholins(500e-9, 60e-9, 2, 1e9, nang=10),  # Invalid
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(requests())
+    aio.executor.shutdown()
+
+    assert aio.stats['batches'] == 1
+    assert aio.stats['fallbacks'] == 1
+    assert isinstance(results[2], ValueError)
+
+    for (wvln, N), res in zip([(338e-9, 266), (500e-9, 100)], results):
+        qsct, qext, qabs, gg, theta, P = fractals_tholins(wvln, 60e-9, 2, N, nang=10)
+        assert res[:3] == approx((qsct, qext, qabs))
+        assert res[3] is gg is None
+        assert res[4] == approx(theta)
+        assert res[5] == approx(P)
+
+
+def test_aio_errors():
+    aio = AsyncTholins()
+
+    with raises(ValueError):
+        asyncio.run(aio.mie_tholins(300e-9, 50e-9, jacobian=True))
+
+    assert not aio._inflight  # pylint: disable=protected-access
@@ -0,0 +1,75 @@
+"""Test spectral bands module."""
+# pylint: disable=missing-function-docstring
+
+import numpy as np
+
+from pytest import approx, raises
+
+from aerosols.bands import (
+    band_average, band_fractals_tholins, band_mie_tholins
+)
+from aerosols.tholins import Database, mie_tholins
+
+
+def gaussian(center, fwhm):
+    wvln = np.linspace(center - 1.5 * fwhm, center + 1.5 * fwhm, 61)
+    return wvln, np.exp(-4 * np.log(2) * ((wvln - center) / fwhm) ** 2)
+
+
+def test_band_mie_tholins():
+    band = gaussian(350e-9, 20e-9)
+    qsct, qext, qabs, gg, theta, P, nevals = band_mie_tholins([band], 100e-9, rtol=1e-3)
+
+    # Brute-force dense sampling
+    wvln = np.linspace(band[0][0], band[0][-1], 501)
+    response = np.interp(wvln, *band)
+    qsct_d, qext_d, _, gg_d, _, P_d = map(np.array, zip(*[
+        mie_tholins(w, 100e-9) for w in wvln
+    ]))
+    weight = np.trapz(response, x=wvln)
+
+    assert nevals < 100
+    assert qsct[0] == approx(np.trapz(response * qsct_d, x=wvln) / weight, 1e-3)
+    assert qext[0] == approx(np.trapz(response * qext_d, x=wvln) / weight, 1e-3)
+    assert qabs[0] == approx(qext[0] - qsct[0])
+    assert gg[0] == approx(np.trapz(response * qsct_d * gg_d, x=wvln)
+                           / np.trapz(response * qsct_d, x=wvln), 1e-3)
+    assert len(theta) == 181
+    P_sct = np.trapz(response[:, None] * qsct_d[:, None] * P_d, x=wvln, axis=0)
+    assert P[0] == approx(P_sct / np.trapz(response * qsct_d, x=wvln), 1e-3)
+
+
+def test_band_average_tolerance():
+    def rayleigh(w):
+        qsct = (w / 300e-9) ** -4
+        return qsct, 2 * qsct, qsct, None, np.array([0, np.pi]), np.array([1, 1])
+
+    wvln = np.array([300e-9, 1e-6])
+    qsct, qext, *_ = band_average(rayleigh, [(wvln, [1, 1])], rtol=1e-4, step=1)
+
+    # Exact integral of the power law
+    assert qsct[0] == approx((1 - (300e-9 / 1e-6) ** 3) * 100e-9 / 700e-9, 1e-4)
+    assert qext[0] == approx(2 * qsct[0])
+
+
+def test_band_fractals_tholins_overlap():
+    bands = [gaussian(500e-9, 30e-9), gaussian(500e-9, 30e-9), gaussian(520e-9, 30e-9)]
+    db = Database(table='Tholins_CVD')
+
+    qsct, _, _, gg, _, P, nevals = band_fractals_tholins(bands[:1], 50e-9, 2, 266, db=db)
+    assert gg is None
+    assert P.shape == (1, 181)
+
+    qsct_2, _, _, _, _, _, nevals_2 = band_fractals_tholins(bands, 50e-9, 2, 266, db=db)
+    assert qsct_2[:2] == approx(qsct[0])
+    assert nevals < nevals_2 < 3 * nevals
+
+
+def test_band_err():
+    func = mie_tholins
+
+    with raises(ValueError):
+        band_average(func, [([2e-6, 1e-6], [1, 1])])
+
+    with raises(ValueError):
+        band_average(func, [([1e-6, 2e-6], [0, 0])])
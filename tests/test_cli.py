@@ -1,7 +1,11 @@
 """Test CLI module."""
 # pylint: disable=missing-function-docstring
 
-from aerosols.cli import cli_fractal_tholins
+from aerosols.cli import (
+    cli_aerosols_server, cli_fractal_tholins, cli_import_indexes, cli_sweep
+)
+from aerosols.server import OpticsServer
+from aerosols.sweep import Sweep
 
 
 def test_cli_fractal_tholins(capsys):
@@ -47,3 +51,59 @@ def test_cli_fractal_tholins_value_err(capsys):
 
     assert out == stdout
     assert err == ''
+
+
+def test_cli_aerosols_server(capsys, monkeypatch):
+    def interrupt(_):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(OpticsServer, 'serve_forever', interrupt)
+
+    argv = '--host 127.0.0.1 --port 0 --table Tholins_CVD'.split()
+    cli_aerosols_server(argv)
+    out, err = capsys.readouterr()
+
+    assert out.startswith('Serving on http://127.0.0.1:')
+    assert err == ''
+
+
+def test_cli_import_indexes(capsys, tmp_path):
+    csv = tmp_path / 'lab.csv'
+    csv.write_text('200,1.5,0.1\n400,1.6,0.01\n')
+
+    argv = f'{csv} Lab {tmp_path / "lab.db"} -u nm'.split()
+    cli_import_indexes(argv)
+    cli_import_indexes(argv)
+    out, err = capsys.readouterr()
+
+    stdout = (
+        'Table `Lab` imported in lab.db (2 wavelengths)\n'
+        'Table `Lab` already exists in the database\n'
+    )
+
+    assert out == stdout
+    assert err == ''
+
+
+def test_cli_sweep(capsys, tmp_path):
+    Sweep.create(tmp_path, [300e-9, 500e-9], 50e-9, nang=3, chunksize=1)
+    output = tmp_path / 'table.npy'
+
+    cli_sweep(['merge', str(tmp_path), '-o', str(output)])
+    cli_sweep(['run', str(tmp_path), '-n', '1'])
+    cli_sweep(['run', str(tmp_path)])
+    cli_sweep(['merge', str(tmp_path), '-o', str(output)])
+    out, err = capsys.readouterr()
+
+    stdout = (
+        '2 chunk(s) not done (first: 0)\n'
+        '1 chunk(s) computed\n'
+        'todo: 1, claimed: 0, done: 1\n'
+        '1 chunk(s) computed\n'
+        'todo: 0, claimed: 0, done: 2\n'
+        f'Table saved in {output}\n'
+        'todo: 0, claimed: 0, done: 2\n'
+    )
+
+    assert out == stdout
+    assert err == ''
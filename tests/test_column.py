@@ -0,0 +1,46 @@
+"""Test column module."""
+# pylint: disable=missing-function-docstring
+
+import numpy as np
+
+from pytest import approx
+
+from aerosols.column import column_tholins
+from aerosols.tholins import fractals_tholins
+
+
+wvln = np.array([338e-9, 500e-9, 900e-9])
+density = np.array([1e6, 2e6, 5e6, 1e7])  # m^-3
+dz = 10e3                                 # m
+rm = np.array([50e-9, 50e-9, 60e-9, 50e-9])
+N = np.array([266, 266, 266, 500])
+
+
+def test_column_tholins():
+    tau_ext, tau_sca, tau_ext_cum, tau_sca_cum, theta, P = column_tholins(
+        wvln, density, dz, rm, N)
+
+    assert tau_ext.shape == (4, 3)
+    assert tau_sca.shape == (4, 3)
+    assert P.shape == (4, 3, 181)
+    assert len(theta) == 181
+
+    for i, (n, r, n_mon) in enumerate(zip(density, rm, N)):
+        for j, w in enumerate(wvln):
+            qsct, qext, _, _, _, p = fractals_tholins(w, r, 2, n_mon)
+
+            assert tau_ext[i, j] == approx(n * dz * qext)
+            assert tau_sca[i, j] == approx(n * dz * qsct)
+            assert P[i, j] == approx(p)
+
+    assert tau_ext_cum[-1] == approx(np.sum(tau_ext, axis=0))
+    assert tau_sca_cum[0] == approx(tau_sca[0])
+    assert np.all(np.diff(tau_ext_cum, axis=0) > 0)
+
+
+def test_column_tholins_duplicated_layers():
+    tau_ext, _, _, _, _, P = column_tholins(500e-9, [1e6, 2e6], 1e3, 50e-9, 266)
+
+    assert tau_ext.shape == (2, 1)
+    assert tau_ext[1, 0] == approx(2 * tau_ext[0, 0])
+    assert P[0, 0] == approx(P[1, 0])
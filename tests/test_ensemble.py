@@ -0,0 +1,125 @@
+"""Test ensemble module."""
+# pylint: disable=missing-function-docstring
+
+import numpy as np
+
+from pytest import approx, raises
+
+from aerosols.ensemble import StreamingStats, ensemble_tholins
+from aerosols.mie import mie
+from aerosols.tholins import (
+    Database, fractals_tholins, import_indexes, index_tholins, mie_tholins
+)
+
+
+def test_streaming_stats():
+    samples = np.random.default_rng(0).lognormal(0, 1, (5000, 3))
+    stats = StreamingStats(log=True)
+
+    with raises(ValueError):
+        stats.quantile(.5)
+
+    for chunk in np.array_split(samples, 17):
+        stats.update(chunk)
+
+    assert repr(stats) == '<StreamingStats | Count: 5000 | Bins: 512>'
+    assert stats.mean == approx(samples.mean(axis=0))
+    assert stats.var == approx(samples.var(axis=0, ddof=1))
+    assert stats.std == approx(samples.std(axis=0, ddof=1))
+    assert stats.quantile(.5) == approx(np.median(samples, axis=0), rel=1e-2)
+    assert stats.quantile([0, 1]) == approx(np.quantile(samples, [0, 1], axis=0))
+
+    with raises(ValueError):
+        stats.quantile(1.5)
+
+
+def test_streaming_stats_drift():
+    samples = np.random.default_rng(2).normal(0, 1, 10_000) + np.linspace(0, 50, 10_000)
+    stats = StreamingStats(bins=256)
+
+    # Narrow first chunk, then drifting values
+    for chunk in np.array_split(samples, 100):
+        stats.update(chunk)
+
+    lo, hi = stats.edges
+    assert lo <= samples.min() and samples.max() <= hi
+
+    width = (hi - lo) / stats.bins
+    assert stats.quantile([.01, .5, .99]) == approx(
+        np.quantile(samples, [.01, .5, .99]), abs=2 * width)
+    assert stats.hist.sum() == 10_000
+
+
+def test_streaming_stats_errors():
+    with raises(ValueError):
+        _ = StreamingStats(bins=255)
+
+    stats = StreamingStats(log=True)
+    with raises(ValueError):
+        stats.update([1, 0])
+
+
+def test_ensemble_mie():
+    r = np.random.default_rng(1).normal(100e-9, 10e-9, 300)
+    qsct, qext, qabs, gg, theta, P = ensemble_tholins(500e-9, r, chunksize=64)
+
+    nr, ni = index_tholins(500e-9)
+    qsct_m, qext_m, qabs_m, gg_m, theta_m, P_m = mie(500e-9, nr, ni, r)
+
+    assert qsct.count == 300
+    assert qsct.mean == approx(qsct_m.mean())
+    assert qext.var == approx(qext_m.var(ddof=1))
+    assert qabs.quantile(.5) == approx(np.median(qabs_m), rel=1e-2)
+    assert gg.mean == approx(gg_m.mean())
+    assert theta == approx(theta_m)
+    assert P.mean == approx(P_m.mean(axis=0))
+
+
+def test_ensemble_fixed():
+    qsct, _, _, gg, _, P = ensemble_tholins(500e-9, 60e-9, N=266, members=10)
+    qsct_f, _, _, _, _, P_f = fractals_tholins(500e-9, 60e-9, 2, 266)
+
+    assert gg is None
+    assert qsct.mean == approx(qsct_f)
+    assert qsct.var == approx(0, abs=1e-40)
+    assert P.quantile(.9) == approx(P_f)
+
+
+def test_ensemble_tables():
+    cvd_db, doose_db = Database(table='Tholins_CVD'), Database(table='Tholins_Doose')
+    cvd = ensemble_tholins(500e-9, 50e-9, db=(cvd_db, doose_db),
+                           mixing=0, members=2)
+    doose = ensemble_tholins(500e-9, 50e-9, db=(cvd_db, doose_db),
+                             mixing=np.ones(2))
+
+    assert cvd[0].mean == approx(
+        mie_tholins(500e-9, 50e-9, db=cvd_db)[0])
+    assert doose[0].mean == approx(mie_tholins(500e-9, 50e-9)[0])
+
+    mixed = ensemble_tholins(500e-9, 50e-9, db=(cvd_db, doose_db),
+                             members=100, seed=0)
+    assert cvd[0].mean < mixed[0].mean < doose[0].mean or \
+        doose[0].mean < mixed[0].mean < cvd[0].mean
+
+
+def test_ensemble_database(tmp_path):
+    db = import_indexes(np.array([[.3, 1.5, .1], [.7, 1.6, .01]]), 'Lab',
+                        tmp_path / 'indexes.db')
+    qsct, *_ = ensemble_tholins(500e-9, 50e-9, db=db, members=2)
+
+    assert qsct.mean == approx(mie_tholins(500e-9, 50e-9, db)[0])
+
+
+def test_ensemble_non_absorbing():
+    _, _, qabs, *_ = ensemble_tholins(500e-9, [50e-9, 60e-9], ni=0)
+
+    assert qabs.mean == approx(0, abs=1e-30)
+    assert np.isfinite(qabs.quantile(.5))
+
+
+def test_ensemble_errors():
+    with raises(ValueError):
+        ensemble_tholins(500e-9, 50e-9, db=(Database(),) * 3)
+
+    with raises(ValueError):
+        ensemble_tholins(500e-9, 50e-9, nr=[1.5, 1.6], ni=[.1, .2, .3])
@@ -5,7 +5,10 @@ import numpy as np
 
 from pytest import approx, raises
 
-from aerosols.fractals import fractals, fractals_tomasko_2008
+from aerosols.fractals import (
+    ELEMENTS, PhaseMatrix, StructureFactor, fractals,
+    fractals_phase_matrix, fractals_tomasko_2008, structure_factor
+)
 
 
 wvln = 338e-9
@@ -81,3 +84,109 @@ def test_ni_min_err():
 def test_ni_max_err():
     with raises(ValueError):
         fractals_tomasko_2008(Df, N, Xm, nr, .8)
+
+
+def test_fracts_batch():
+    rms, Ns = np.array([40e-9, 60e-9]), np.array([[100], [266]])
+    qsct, _, _, gg, theta, P = fractals(wvln, nr, ni, rms, Df, Ns)
+
+    assert qsct.shape == (2, 2)
+    assert P.shape == (2, 2, 181)
+    assert gg is None
+    assert len(theta) == 181
+    assert qsct[1, 1] == approx(2.9318512910130787e-12, 1e-6)
+    assert P[1, 1] == approx(fractals(wvln, nr, ni, rm, Df, N)[5], 1e-12)
+
+    with raises(ValueError):
+        fractals(wvln, nr, ni, rms, Df, Ns, jacobian=True)
+
+
+def test_fracts_single_precision():
+    rms, Ns = np.array([20e-9, 40e-9, 60e-9]), np.array([[10], [266], [1000]])
+    qsct, qext, qabs, _, _, P = fractals(wvln, nr, ni, rms, Df, Ns)
+    qsct_32, qext_32, qabs_32, _, _, P_32 = fractals(
+        wvln, nr, ni, rms, Df, Ns, precision='single')
+
+    assert P_32.dtype == np.float32
+    assert np.max(np.abs(qsct_32 / qsct - 1)) < 1e-5
+    assert np.max(np.abs(qext_32 / qext - 1)) < 1e-5
+    assert np.max(np.abs(qabs_32 / qabs - 1)) < 1e-5
+    assert np.max(np.abs(P_32 / P - 1)) < 1e-5
+
+    qsct_32, *_, P_32 = fractals(wvln, nr, ni, rm, Df, N, precision='single')
+    assert qsct_32 == approx(2.9318512910130787e-12, 1e-5)
+    assert P_32.dtype == np.float32
+
+
+def test_fracts_jacobian():
+    args = (wvln, nr, ni, rm)
+    *res, jac = fractals(*args, Df, N, jacobian=True)
+    assert res[0] == approx(2.9318512910130787e-12, 1e-6)
+
+    for i, h in enumerate([1e-6, 1e-6, 1e-15]):
+        sup, inf = list(args), list(args)
+        sup[i + 1] += h
+        inf[i + 1] -= h
+        qsct_sup, qext_sup, _, _, _, P_sup = fractals(*sup, Df, N)
+        qsct_inf, qext_inf, _, _, _, P_inf = fractals(*inf, Df, N)
+
+        assert jac['qsct'][i] == approx((qsct_sup - qsct_inf) / (2 * h), 1e-5)
+        assert jac['qext'][i] == approx((qext_sup - qext_inf) / (2 * h), 1e-5)
+        assert jac['qabs'][i] == approx(jac['qext'][i] - jac['qsct'][i])
+        assert jac['P'][i] == approx((P_sup - P_inf) / (2 * h), rel=1e-4, abs=1e-4)
+
+
+def test_structure_factor():
+    sf = StructureFactor(N, Df)
+    assert sf.N == N
+    assert sf.Df == Df
+    assert structure_factor(N, Df) is structure_factor(N, Df)
+
+    theta = np.linspace(0, np.pi, 181)
+    Fi = np.sinc(2 * sf.R0 * Xm * np.sin(theta[:, None] / 2) / np.pi)
+    Fc = np.dot(Fi, sf.F0) * (N ** 2 - N) + N
+
+    assert sf(0) == approx(np.sum(sf.F0))
+    assert sf.coherent(Xm, theta) == approx(Fc, 1e-7)
+    assert sf.tau_coef(Xm) == approx(
+        np.sum(sf.F0 / (sf.R0 * Xm) ** 2) * (N - 1) / (4 * np.pi))
+
+    # Extend the table on demand
+    q = 2 * 2.5 * np.sin(theta / 2)
+    S = np.dot(np.sinc(sf.R0 * q[:, None] / np.pi), sf.F0)
+    assert sf(q) == approx(S, abs=1e-7)
+
+
+def test_phase_matrix():
+    Qs, Qa, Qe, P11, P22, P33, P44, P21, P43 = fractals_tomasko_2008(Df, N, Xm, nr, ni)
+    result = fractals_phase_matrix(Df, N, Xm, nr, ni)
+
+    assert isinstance(result, PhaseMatrix)
+    assert repr(result) == '<PhaseMatrix | Elements: P11, P21, P22, P33, P43, P44>'
+    assert result.elements == ELEMENTS
+    assert result.data.shape == (6, 181)
+    assert result.theta[-1] == np.pi
+    assert (result.Qs, result.Qa, result.Qe) == (Qs, Qa, Qe)
+
+    for element, expected in zip(['P11', 'P22', 'P33', 'P44', 'P21', 'P43'],
+                                 [P11, P22, P33, P44, P21, P43]):
+        assert result[element] == approx(expected)
+
+    # Requested elements written in a preallocated buffer
+    table = np.zeros((3, 2, 181), dtype=np.float32)
+    result = fractals_phase_matrix(Df, N, Xm, nr, ni, elements=('P44', 'P11'),
+                                   out=table[1])
+
+    assert result.data is table[1] or np.shares_memory(result.data, table)
+    assert table[1, 0] == approx(P44, 1e-6)
+    assert table[1, 1] == approx(P11, 1e-6)
+    assert not np.any(table[[0, 2]])
+
+    with raises(KeyError):
+        _ = result['P21']
+
+    with raises(ValueError):
+        fractals_phase_matrix(Df, N, Xm, nr, ni, elements=('P12',))
+
+    with raises(ValueError):
+        fractals_phase_matrix(Df, N, Xm, nr, ni, elements=('P11',), out=table[1])
@@ -1,11 +1,17 @@
 """Test Mie module."""
 # pylint: disable=missing-function-docstring
 
+from importlib import import_module
+
 import numpy as np
 
 from pytest import approx, raises
 
-from aerosols.mie import mie, mie_bohren_huffman
+from aerosols.mie import (
+    mie, mie_amplitudes, mie_anomalous_diffraction,
+    mie_bohren_huffman, mie_coefficients, mie_efficiencies,
+    mie_phase_matrix, mie_rayleigh, mie_regime, riccati_bessel
+)
 
 
 def test_mie():
@@ -35,3 +41,249 @@ def test_nang_inf():
 def test_nmx_sup():
     with raises(ValueError):
         mie_bohren_huffman(150e3, complex(0.8, 0.3))
+
+
+def test_mie_tol():
+    *ref, info_ref = mie_bohren_huffman(5, complex(1.6, 0.2), full_output=True)
+    *res, info = mie_bohren_huffman(5, complex(1.6, 0.2), tol=1e-4, full_output=True)
+
+    assert info_ref['nterms'] == 13
+    assert info['nterms'] < info_ref['nterms']
+    assert res[2] == approx(ref[2], 1e-4)
+    assert res[3] == approx(ref[3], 1e-4)
+
+    *res, info = mie_bohren_huffman(5, complex(1.6, 0.2), tol=1e-14, full_output=True)
+
+    assert info['nterms'] > info_ref['nterms']
+    assert res[2] == approx(ref[2], 1e-10)
+
+
+def test_mie_tol_err():
+    with raises(ValueError):
+        mie_bohren_huffman(1, complex(0.8, 0.3), tol=0)
+
+
+def test_mie_jacobian():
+    args = (300e-9, 0.8, 0.3, 50e-9)
+    *res, jac = mie(*args, jacobian=True)
+    assert res[0] == approx(7.363164550772519e-16, 1e-6)
+
+    for i, h in enumerate([1e-6, 1e-6, 1e-15]):
+        sup, inf = list(args), list(args)
+        sup[i + 1] += h
+        inf[i + 1] -= h
+        qsct_sup, qext_sup, _, _, _, P_sup = mie(*sup)
+        qsct_inf, qext_inf, _, _, _, P_inf = mie(*inf)
+
+        assert jac['qsct'][i] == approx((qsct_sup - qsct_inf) / (2 * h), 1e-5)
+        assert jac['qext'][i] == approx((qext_sup - qext_inf) / (2 * h), 1e-5)
+        assert jac['qabs'][i] == approx(jac['qext'][i] - jac['qsct'][i])
+        assert jac['P'][i] == approx((P_sup - P_inf) / (2 * h), rel=1e-5, abs=1e-6)
+
+
+def test_mie_rayleigh():
+    x, refrel = np.array([1e-3, 1e-2, 5e-2]), complex(1.6, 0.2)
+    s1, s2, qext, qsca, qback, gsca = mie_rayleigh(x, refrel)
+
+    assert s1.shape == (3, 181)
+
+    for i, xi in enumerate(x):
+        ref = mie_bohren_huffman(xi, refrel)
+        err = (abs(refrel) * xi) ** 4
+        assert abs(s1[i]) ** 2 + abs(s2[i]) ** 2 == approx(
+            abs(ref[0]) ** 2 + abs(ref[1]) ** 2, rel=err)
+        assert qext[i] == approx(ref[2], rel=err)
+        assert qsca[i] == approx(ref[3], rel=err)
+        assert qback[i] == approx(ref[4], rel=err)
+        assert gsca[i] == approx(ref[5], rel=1e-3, abs=1e-6)
+
+
+def test_mie_ada():
+    x = np.array([50, 300, 1000])
+
+    for refrel in (complex(1.05, 0.001), complex(1.65, 0.01), complex(1.65, 0.5)):
+        qext, qsca = mie_anomalous_diffraction(x, refrel)
+
+        for i, xi in enumerate(x):
+            ref = mie_bohren_huffman(xi, refrel, 2)
+            err = 2 * xi ** (-2 / 3) + .15 / (xi * refrel.imag) ** 2
+            assert qext[i] == approx(ref[2], rel=err)
+            assert qsca[i] == approx(ref[3], rel=err)
+            assert qext[i] - qsca[i] == approx(ref[2] - ref[3], rel=err)
+
+    # Opaque tholins (reflection included)
+    qext, qsca = mie_anomalous_diffraction(3000, complex(1.65, 0.01))
+    ref = mie_bohren_huffman(3000, complex(1.65, 0.01), 2)
+    assert qsca == approx(ref[3], rel=1e-2)
+
+
+def test_mie_regime():
+    x = [1e-3, 1, 300, 5000]
+    refrel = complex(1.65, 0.01)  # Tholins
+
+    assert list(mie_regime(x, refrel, 1e-3)) == ['rayleigh', 'exact', 'exact', 'exact']
+    assert list(mie_regime(x, refrel, 1e-2, phase=False)) == [
+        'rayleigh', 'exact', 'exact', 'ada']
+    assert list(mie_regime(x, refrel, 1e-1, phase=False)) == [
+        'rayleigh', 'exact', 'ada', 'ada']
+    assert mie_regime(1, refrel, 1e-3) == 'exact'
+
+    # Transparent particles (rays transmitted through the particle)
+    assert mie_regime(5000, 1.65, 1e-1, phase=False) == 'exact'
+
+    with raises(ValueError):
+        mie_regime(x, refrel, 0)
+
+
+def test_mie_approx():
+    r = np.array([1e-9, 50e-9])
+    qsct, qext, qabs, gg, theta, P, regime = mie(300e-9, 0.8, 0.3, r, approx_tol=1e-3)
+
+    assert list(regime) == ['rayleigh', 'exact']
+    assert P.shape == (2, 181)
+    assert len(theta) == 181
+
+    for i, ri in enumerate(r):
+        ref = mie(300e-9, 0.8, 0.3, ri)
+        assert qsct[i] == approx(ref[0], 1e-3)
+        assert qext[i] == approx(ref[1], 1e-3)
+        assert qabs[i] == approx(ref[2], 1e-3)
+        assert P[i] == approx(ref[5], 1e-3)
+
+    # Scalar inputs
+    qsct, *_, regime = mie(300e-9, 0.8, 0.3, 50e-9, approx_tol=1e-3)
+    assert qsct == approx(7.363164550772519e-16, 1e-6)
+    assert regime == 'exact'
+
+    # Cross sections only
+    qsct, qext, qabs, gg, theta, P = mie(300e-9, 0.8, 0.3, 50e-9, nang=None)
+    assert qsct == approx(7.363164550772519e-16, 1e-6)
+    assert gg == approx(0.19041709245035676, 1e-6)
+    assert theta is None
+    assert P is None
+
+
+def test_mie_approx_cross_sections(monkeypatch):
+    # No angular sums
+    monkeypatch.setattr(import_module('aerosols.mie'), 'mie_bohren_huffman', None)
+
+    r = np.array([1e-9, 50e-9, 300e-6])
+    qsct, qext, qabs, gg, theta, P, regime = mie(
+        500e-9, 1.65, 0.01, r, nang=None, approx_tol=1e-2)
+
+    assert list(regime) == ['rayleigh', 'exact', 'ada']
+    assert theta is None
+    assert P is None
+    assert np.isnan(gg[2])
+
+    monkeypatch.undo()
+
+    for i, ri in enumerate(r):
+        ref = mie(500e-9, 1.65, 0.01, ri, nang=2)
+        assert qsct[i] == approx(ref[0], rel=1e-2)
+        assert qext[i] == approx(ref[1], rel=1e-2)
+        assert qabs[i] == approx(ref[2], rel=1e-2)
+
+
+def test_mie_approx_err():
+    with raises(ValueError):
+        mie(300e-9, 0.8, 0.3, 50e-9, jacobian=True, approx_tol=1e-3)
+
+
+def test_riccati_bessel():
+    psi, chi = riccati_bessel(5., 12)
+
+    assert len(psi) == len(chi) == 13
+    assert psi[0] == approx(np.sin(5))
+    assert chi[0] == approx(np.cos(5))
+    assert psi[1] == approx(np.sin(5) / 5 - np.cos(5))
+    assert not psi.flags.writeable
+
+    # Cached arrays
+    assert riccati_bessel(5., 12)[0] is psi
+
+
+def test_mie_refrel_vector():
+    refrel = np.array([complex(1.6, 0.2), complex(1.5, 0.01), complex(0.8, 0.3)])
+    *res, info = mie_bohren_huffman(5, refrel, full_output=True, jacobian=True)
+
+    assert res[0].shape == (3, 181)
+    assert info['jac']['s1'].shape == (3, 3, 181)
+    assert info['jac']['qext'].shape == (3, 3)
+
+    for i, m in enumerate(refrel):
+        *ref, ref_info = mie_bohren_huffman(5, m, full_output=True, jacobian=True)
+        for value, expected in zip(res, ref):
+            assert value[i] == approx(expected, 1e-10)
+        assert info['jac']['qsca'][:, i] == approx(ref_info['jac']['qsca'], 1e-10)
+
+    nr, ni = np.real(refrel), np.imag(refrel)
+    qsct, *_, P = mie(300e-9, nr, ni, 50e-9)
+
+    assert qsct[2] == approx(7.363164550772519e-16, 1e-6)
+    assert P.shape == (3, 181)
+    assert P[2] == approx(mie(300e-9, 0.8, 0.3, 50e-9)[5], 1e-10)
+
+    with raises(ValueError):
+        mie(300e-9, nr, ni, 50e-9, jacobian=True)
+
+
+def test_mie_coefficients():
+    refrel = np.array([complex(1.6, 0.2), complex(0.8, 0.3)])
+    an, bn = mie_coefficients(5, refrel)
+
+    assert an.shape == bn.shape == (2, 13)
+
+    s1, s2, *ref = mie_bohren_huffman(5, refrel)
+    for value, expected in zip(mie_efficiencies(5, an, bn), ref):
+        assert value == approx(expected, 1e-12)
+
+    theta = np.linspace(0, np.pi, 181)
+    amplitudes = mie_amplitudes(an, bn, theta)
+    assert amplitudes[0] == approx(s1, rel=1e-12, abs=1e-14)
+    assert amplitudes[1] == approx(s2, rel=1e-12, abs=1e-14)
+
+    # Arbitrary angles
+    s1, s2 = mie_amplitudes(an[0], bn[0], [0, np.pi])
+    assert s1 == approx(mie_bohren_huffman(5, refrel[0])[0][[0, -1]], 1e-12)
+
+    # Truncated series
+    an_tol, bn_tol = mie_coefficients(5, refrel, tol=1e-4)
+    assert an_tol.shape[-1] < an.shape[-1]
+    assert mie_efficiencies(5, an_tol, bn_tol)[0] == approx(ref[0], 1e-4)
+
+    with raises(ValueError):
+        mie_coefficients(5, refrel, tol=-1)
+
+
+def test_mie_phase_matrix():
+    x = 2 * np.pi * 50e-9 / 300e-9
+    an, bn = mie_coefficients(x, complex(0.8, 0.3))
+    theta = np.linspace(0, np.pi, 181)
+    P11, P21, P33, P43 = mie_phase_matrix(x, an, bn, theta)
+
+    assert .5 * np.trapz(P11 * np.sin(theta), x=theta) == approx(1, 1e-4)
+    assert P11 == approx(mie(300e-9, 0.8, 0.3, 50e-9)[5], 1e-4)
+    assert P21[0] == approx(0, abs=1e-12)
+    assert P33[0] == approx(P11[0])
+    assert P43[0] == approx(0, abs=1e-12)
+
+
+def test_mie_single_precision():
+    r = np.logspace(-8, -6, 20)
+    qsct, qext, qabs, gg, _, P = mie(500e-9, 1.6, 0.2, r)
+    qsct_32, qext_32, qabs_32, gg_32, _, P_32 = mie(
+        500e-9, 1.6, 0.2, r, precision='single')
+
+    assert P_32.dtype == np.float32
+    assert np.max(np.abs(qsct_32 / qsct - 1)) < 1e-5
+    assert np.max(np.abs(qext_32 / qext - 1)) < 1e-5
+    assert np.max(np.abs(qabs_32 / qabs - 1)) < 1e-5
+    assert np.max(np.abs(gg_32 / gg - 1)) < 1e-5
+    assert np.max(np.abs(P_32 / P - 1)) < 1e-5
+
+    s1, *_ = mie_bohren_huffman(5, complex(1.6, 0.2), precision='single')
+    assert s1.dtype == np.complex64
+
+    with raises(ValueError):
+        mie_bohren_huffman(5, complex(1.6, 0.2), precision='half')
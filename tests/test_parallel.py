@@ -0,0 +1,97 @@
+"""Test parallel module."""
+# pylint: disable=missing-function-docstring
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pytest import approx, raises
+
+from aerosols import parallel
+from aerosols.parallel import SharedTable, parallel_tholins
+from aerosols.tholins import (
+    Database, fractals_tholins, import_indexes, mie_tholins
+)
+
+
+def test_shared_table():
+    with SharedTable(3, nang=2) as table:
+        assert repr(table) == '<SharedTable | Elements: 3 | NANG: 2>'
+        assert len(table) == 3
+        assert table.P.shape == (3, 3)
+        assert np.all(np.isnan(table.qsct))
+
+        table.data[1] = 1, 2, 3, np.nan, 4, 5, 6
+        qsct, qext, qabs, gg, theta, P = table[1]
+
+        assert (qsct, qext, qabs) == (1, 2, 3)
+        assert gg is None
+        assert theta == approx([0, np.pi / 2, np.pi])
+        assert P == approx([4, 5, 6])
+
+
+def test_parallel_mie():
+    wvln = np.linspace(300e-9, 1e-6, 5)
+
+    with parallel_tholins(wvln, 50e-9, nang=10, processes=2, chunksize=2) as table:
+        assert len(table) == 5
+
+        for i, w in enumerate(wvln):
+            qsct, qext, qabs, gg, theta, P = mie_tholins(w, 50e-9, nang=10)
+            res = table[i]
+
+            assert res[0] == approx(qsct)
+            assert res[1] == approx(qext)
+            assert res[2] == approx(qabs)
+            assert res[3] == approx(gg)
+            assert res[4] == approx(theta)
+            assert res[5] == approx(P)
+
+
+def test_parallel_database(tmp_path):
+    db = import_indexes(np.array([[.3, 1.5, .1], [.7, 1.6, .01]]), 'Lab',
+                        tmp_path / 'indexes.db')
+
+    with parallel_tholins(500e-9, [50e-9, 80e-9], db=db, nang=5, processes=2) as table:
+        qext = mie_tholins(500e-9, np.array([50e-9, 80e-9]), db, nang=5)[1]
+
+        assert table.qext == approx(qext)
+        assert table.qext != approx(
+            mie_tholins(500e-9, np.array([50e-9, 80e-9]), Database(), nang=5)[1], abs=0)
+
+
+def test_parallel_fractals(tmp_path):
+    wvln, N = np.array([338e-9, 500e-9]), np.array([[100], [266]])
+    fname = tmp_path / 'table.npy'
+
+    table = parallel_tholins(wvln, 60e-9, N=N, processes=2, filename=fname)
+    table.close()
+
+    data = np.load(fname)
+    assert data.shape == (4, 4 + 181)
+
+    qsct, qext, qabs, gg, _, P = fractals_tholins(500e-9, 60e-9, 2, 266)
+    assert data[3, :3] == approx([qsct, qext, qabs])
+    assert gg is None
+    assert np.isnan(data[3, 3])
+    assert data[3, 4:] == approx(P)
+
+
+def test_parallel_error_release(monkeypatch):
+    tables = []
+
+    class Table(SharedTable):
+        """Shared table recording its instances."""
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            tables.append(self)
+
+    monkeypatch.setattr(parallel, 'SharedTable', Table)
+
+    with raises(ValueError):
+        _ = parallel_tholins(500e-9, 50e-9, N=np.array([266, 5000]),
+                             processes=2, chunksize=1)
+
+    # The shared memory block is released
+    with raises(FileNotFoundError):
+        _ = shared_memory.SharedMemory(name=tables[0].spec[0])
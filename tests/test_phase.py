@@ -0,0 +1,59 @@
+"""Test phase function module."""
+# pylint: disable=missing-function-docstring
+
+import numpy as np
+
+from pytest import approx, raises
+
+from aerosols.fractals import fractals, fractals_tomasko_2008
+from aerosols.mie import mie
+from aerosols.phase import PhaseFunction
+
+
+wvln = 500e-9
+nr = 1.6
+ni = 0.2
+
+
+def test_phase_function_nodes():
+    _, _, _, _, theta, P = fractals(wvln, nr, ni, 50e-9, 2, 266)
+    pf = PhaseFunction(theta, P)
+
+    assert pf.elements == ('P11',)
+    assert pf(theta) == approx(P, 1e-12)
+    assert pf(-theta) == approx(P, 1e-12)
+    assert np.shape(pf(np.zeros((10, 20)))) == (10, 20)
+
+    with raises(KeyError):
+        pf(theta, 'P21')
+
+
+def test_phase_function_mie():
+    pf = PhaseFunction.from_mie(wvln, nr, ni, 300e-9, nang=181)
+    _, _, _, _, theta, P = mie(wvln, nr, ni, 300e-9, nang=1000)
+
+    assert len(pf.elements) == 6
+    assert pf(theta) == approx(P, 1e-3)
+    assert pf(theta, 'P22') == approx(P, 1e-3)
+
+
+def test_phase_function_fractals():
+    pf = PhaseFunction.from_fractals(wvln, nr, ni, 50e-9, 2, 266, nang=181)
+
+    Xm = 2 * np.pi * 50e-9 / wvln
+    _, _, _, P11, _, _, _, P21, P43 = fractals_tomasko_2008(2, 266, Xm, nr, ni, nang=1000)
+    theta = np.linspace(0, np.pi, len(P11))
+
+    assert pf(theta) == approx(P11, 1e-3)
+    assert pf(theta, 'P21') == approx(P21, rel=1e-3, abs=1e-3)
+    assert pf(theta, 'P43') == approx(P43, rel=1e-3, abs=1e-3)
+
+
+def test_phase_function_err():
+    theta = np.linspace(0, np.pi, 5)
+
+    with raises(ValueError):
+        PhaseFunction(theta, np.ones(5), P12=np.ones(5))
+
+    with raises(ValueError):
+        PhaseFunction(theta, np.ones(5), P21=np.ones(3))
@@ -0,0 +1,94 @@
+"""Test retrieval module."""
+# pylint: disable=missing-function-docstring
+
+import numpy as np
+
+from pytest import approx, fixture, raises
+
+from aerosols import retrieval
+from aerosols.retrieval import RetrievalTable
+from aerosols.tholins import DEFAULT_DB, fractals_tholins, import_indexes
+
+
+WVLN = np.linspace(300e-9, 1e-6, 12)
+
+
+@fixture(scope='module')
+def table():
+    return RetrievalTable.build(WVLN, np.geomspace(20e-9, 60e-9, 7),
+                                [100, 200, 300, 400], np.geomspace(.5, 2, 5))
+
+
+def test_retrieval_table(table, tmp_path):
+    assert repr(table) == (
+        '<RetrievalTable qext | rm: 7 | N: 4 | Scale: 5 | Wavelengths: 12>')
+
+    _, qext, *_ = fractals_tholins(WVLN[3], table.rm[2], 2, 300)
+    assert table.spectra[2, 2, 2, 3] == approx(qext)
+
+    table.save(tmp_path / 'table.npz')
+    loaded = RetrievalTable.load(tmp_path / 'table.npz')
+
+    assert repr(loaded) == repr(table)
+    assert loaded.spectra == approx(table.spectra)
+    assert (loaded.quantity, loaded.Df, loaded.db.table) == ('qext', 2, 'Tholins_Doose')
+    assert loaded.db.fname == DEFAULT_DB
+
+
+def test_retrieval_database(tmp_path):
+    db = import_indexes(np.array([[.3, 1.5, .1], [1, 1.6, .01]]), 'Lab',
+                        tmp_path / 'indexes.db')
+    table = RetrievalTable.build(WVLN, [30e-9, 40e-9], [100, 200], db=db)
+
+    _, qext, *_ = fractals_tholins(WVLN[3], 40e-9, 2, 200, db)
+    assert table.spectra[1, 1, 0, 3] == approx(qext)
+
+    table.save(tmp_path / 'table.npz')
+    loaded = RetrievalTable.load(tmp_path / 'table.npz')
+
+    assert (loaded.db.fname, loaded.db.table) == (tmp_path / 'indexes.db', 'Lab')
+    assert loaded.nr == approx(table.nr)
+    assert loaded.ni == approx(table.ni)
+
+
+def test_retrieval_search(table):
+    observed = np.array([table.spectra[2, 1, 3], 2 * table.spectra[5, 3, 0]])
+
+    index, chi2, amplitude = table.search(observed, fit_amplitude=True, chunksize=1)
+    assert index.tolist() == [[2, 1, 3], [5, 3, 0]]
+    assert chi2 == approx([0, 0], abs=1e-12)
+    assert amplitude == approx([1, 2])
+
+    rm, N, scale, amplitude, chi2 = table.retrieve(observed[0], refine=0)
+    assert (rm, N, scale, amplitude, chi2) == approx(
+        (table.rm[2], 200, table.scale[3], 1, 0), abs=1e-12)
+
+
+def test_retrieval_refine(table, monkeypatch):
+    observed = 3 * table.model(51e-9, 300, 1.3)
+
+    # The database connection is kept by the table
+    monkeypatch.setattr(retrieval, 'Database', None)
+
+    _, chi2_table, _ = table.search(observed, fit_amplitude=True)
+    rm, N, scale, amplitude, chi2 = table.retrieve(observed, fit_amplitude=True, refine=4)
+
+    assert chi2 < 1e-3 * chi2_table
+    assert rm == approx(51e-9, rel=1e-2)
+    assert N == 300
+    assert scale == approx(1.3, rel=1e-2)
+    assert amplitude == approx(3, rel=1e-3)
+
+
+def test_retrieval_errors(table):
+    with raises(ValueError, match='Unknown quantity'):
+        RetrievalTable(WVLN, 1, 1, 1, np.zeros((1, 1, 1, 12)), quantity='gg')
+
+    with raises(ValueError, match='I/F'):
+        RetrievalTable(WVLN, 1, 1, 1, np.zeros((1, 1, 1, 12)), quantity='I/F')
+
+    with raises(ValueError, match='shape'):
+        RetrievalTable(WVLN, 1, 1, 1, np.zeros((1, 1, 1, 11)))
+
+    with raises(ValueError, match='wavelengths'):
+        table.search(np.ones(11))
@@ -0,0 +1,143 @@
+"""Test server module."""
+# pylint: disable=missing-function-docstring
+
+import json
+import subprocess
+import sys
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from pytest import approx, fixture, raises
+
+import aerosols
+from aerosols.server import OpticsServer, OpticsService
+from aerosols.tholins import fractals_tholins, index_tholins, mie_tholins
+
+
+def test_lazy_import():
+    modules = ('aerosols.aio', 'aerosols.parallel', 'aerosols.server', 'aerosols.sweep')
+    code = f'import sys, aerosols; print([m for m in {modules} if m in sys.modules])'
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                         check=True).stdout
+
+    assert out.strip() == '[]'
+    assert aerosols.OpticsServer is OpticsServer
+
+    with raises(AttributeError):
+        _ = aerosols.OpticsClient
+
+
+@fixture
+def url():
+    server = OpticsServer(('127.0.0.1', 0), OpticsService(cache_size=3))
+    thread = Thread(target=server.serve_forever)
+    thread.start()
+
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def post(url, endpoint, request):
+    req = Request(f'{url}/{endpoint}', data=json.dumps(request).encode(),
+                  headers={'Content-Type': 'application/json'})
+    with urlopen(req) as response:
+        return json.loads(response.read())
+
+
+def get(url, path):
+    with urlopen(f'{url}/{path}') as response:
+        return json.loads(response.read())
+
+
+def test_server_requests(url):
+    res = post(url, 'index_tholins', {'wvln': 338e-9})
+    assert (res['nr'], res['ni']) == approx(index_tholins(338e-9))
+
+    res = post(url, 'mie_tholins', {'wvln': 300e-9, 'r': 50e-9, 'nang': 10})
+    qsct, qext, qabs, gg, theta, P = mie_tholins(300e-9, 50e-9, nang=10)
+
+    assert res['qsct'] == approx(qsct)
+    assert res['qext'] == approx(qext)
+    assert res['qabs'] == approx(qabs)
+    assert res['gg'] == approx(gg)
+    assert res['theta'] == approx(theta)
+    assert res['P'] == approx(P)
+
+    res = post(url, 'mie_tholins', {'wvln': 300e-9, 'r': 50e-9, 'nang': None,
+                                    'approx_tol': 1e-3})
+    assert res['theta'] is None
+    assert res['P'] is None
+    assert res['regime'] == 'exact'
+
+
+def test_server_batch(url):
+    batch = [
+        {'wvln': 338e-9, 'rm': 60e-9, 'N': 266, 'table': 'Tholins_CVD'},
+        {'wvln': 500e-9, 'rm': 60e-9, 'N': 100, 'Df': 2},
+        {'wvln': 338e-9, 'rm': 60e-9, 'N': 266, 'table': 'Tholins_CVD'},
+    ]
+
+    results = post(url, 'fractals_tholins', batch)
+    assert len(results) == 3
+    assert results[0] == results[2]
+
+    qsct, qext, qabs, gg, _, P = fractals_tholins(500e-9, 60e-9, 2, 100)
+    assert results[1]['gg'] is gg is None
+    assert [results[1][key] for key in ('qsct', 'qext', 'qabs')] == approx(
+        [qsct, qext, qabs])
+    assert results[1]['P'] == approx(P)
+
+    post(url, 'fractals_tholins', batch[:2])
+
+    stats = get(url, 'stats')
+    assert stats['fractals_tholins']['requests'] == 2
+    assert stats['fractals_tholins']['points'] == 5
+    assert stats['fractals_tholins']['hits'] == 2
+    assert stats['fractals_tholins']['latency'] > 0
+    assert stats['cached'] == 2
+
+
+def test_server_errors(url):
+    with raises(HTTPError, match='404'):
+        post(url, 'wrong', {'wvln': 1e-6})
+
+    with raises(HTTPError, match='404'):
+        get(url, 'wrong')
+
+    with raises(HTTPError, match='400') as err:
+        post(url, 'mie_tholins', {'wvln': 1e-6})
+
+    assert json.loads(err.value.read()) == {'error': 'Missing parameter(s): r'}
+
+    with raises(HTTPError, match='400'):
+        post(url, 'mie_tholins', {'wvln': 1e-6, 'r': 1e-7, 'foo': 1})
+
+    assert get(url, 'stats')['mie_tholins']['errors'] == 2
+
+
+def test_server_internal_error(url, monkeypatch):
+    def compute(*_):
+        raise RuntimeError('Computation failed')
+
+    monkeypatch.setattr(OpticsService, 'compute', compute)
+
+    with raises(HTTPError, match='500') as err:
+        post(url, 'mie_tholins', {'wvln': 1e-6, 'r': 1e-7})
+
+    assert json.loads(err.value.read()) == {'error': 'RuntimeError: Computation failed'}
+    assert get(url, 'stats')['mie_tholins']['errors'] == 1
+
+
+def test_service_cache():
+    service = OpticsService(cache_size=2)
+    assert repr(service) == '<OpticsService | Cache: 0/2>'
+
+    for wvln in (1e-6, 2e-6, 3e-6, 1e-6):
+        service('index_tholins', {'wvln': wvln})
+
+    assert service.stats['index_tholins']['hits'] == 0
+    assert len(service.cache) == 2
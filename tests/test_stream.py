@@ -0,0 +1,55 @@
+"""Test stream module."""
+# pylint: disable=missing-function-docstring
+
+from types import GeneratorType
+
+import numpy as np
+
+from pytest import approx, raises
+
+from aerosols.stream import stream_tholins
+from aerosols.tholins import fractals_tholins, mie_tholins
+
+
+def test_stream_mie():
+    wvln, r = np.array([300e-9, 500e-9, 1e-6])[:, None], np.array([50e-9, 100e-9])
+    stream = stream_tholins(wvln, r, chunksize=4, nang=10)
+
+    assert isinstance(stream, GeneratorType)
+
+    chunks = list(stream)
+    assert [len(index[0]) for index, _ in chunks] == [4, 2]
+
+    for (i, j), (qsct, qext, qabs, gg, theta, P) in chunks:
+        for k, (a, b) in enumerate(zip(i, j)):
+            expected = mie_tholins(wvln[a, 0], r[b], nang=10)
+            assert (qsct[k], qext[k], qabs[k], gg[k]) == approx(expected[:4])
+            assert theta == approx(expected[4])
+            assert P[k] == approx(expected[5])
+
+
+def test_stream_fractals_lazy():
+    N = np.array([100, 266, 1e9])  # Last aggregate is invalid
+    stream = stream_tholins(500e-9, 60e-9, N=N, chunksize=2)
+
+    (i,), (qsct, _, _, gg, _, P) = next(stream)
+    assert i == approx([0, 1])
+    assert gg is None
+    assert P.shape == (2, 181)
+
+    qsct_f, _, _, _, _, P_f = fractals_tholins(500e-9, 60e-9, 2, 266)
+    assert qsct[1] == approx(qsct_f)
+    assert P[1] == approx(P_f)
+
+    # The invalid chunk is only computed when requested
+    with raises(ValueError):
+        next(stream)
+
+
+def test_stream_errors():
+    with raises(ValueError):
+        stream_tholins(500e-9, 60e-9, chunksize=0)
+
+    # Shape errors are raised at call time
+    with raises(ValueError):
+        stream_tholins(np.array([400e-9, 500e-9]), np.array([50e-9, 60e-9, 70e-9]))
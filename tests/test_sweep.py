@@ -0,0 +1,116 @@
+"""Test sweep module."""
+# pylint: disable=missing-function-docstring
+
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from pytest import approx, raises
+
+from aerosols.sweep import Sweep
+from aerosols.tholins import (
+    Database, fractals_tholins, import_indexes, mie_tholins
+)
+
+
+def run(directory):
+    return Sweep(directory).run()
+
+
+def test_sweep_processes(tmp_path):
+    wvln, r = np.array([300e-9, 500e-9, 1e-6])[:, None], np.array([50e-9, 80e-9, 100e-9])
+    sweep = Sweep.create(tmp_path, wvln, r, nang=5, chunksize=2)
+
+    assert len(sweep) == 5
+    assert sweep.config['fname'] is None  # Packaged database located on each node
+    assert repr(sweep) == f'<Sweep {tmp_path.name} | Todo: 5 | Claimed: 0 | Done: 0>'
+
+    with Pool(3) as pool:
+        assert sum(pool.map(run, [tmp_path] * 3)) == 5
+
+    assert sweep.status == {'todo': 0, 'claimed': 0, 'done': 5}
+
+    with sweep.merge(tmp_path / 'table.npy') as table:
+        for k, (i, j) in enumerate(np.ndindex(3, 3)):
+            qsct, qext, qabs, gg, theta, P = mie_tholins(wvln[i, 0], r[j], nang=5)
+            res = table[k]
+
+            assert res[:4] == approx((qsct, qext, qabs, gg))
+            assert res[4] == approx(theta)
+            assert res[5] == approx(P)
+
+
+def test_sweep_restart(tmp_path):
+    N = np.array([100, 266, 300])
+    sweep = Sweep.create(tmp_path, 500e-9, 60e-9, N=N, chunksize=1)
+
+    assert sweep.run(max_chunks=1) == 1
+
+    # Dead worker claim
+    os.rename(tmp_path / 'todo' / '000001', tmp_path / 'claimed' / '000001@dead@0.0')
+    assert sweep.status == {'todo': 1, 'claimed': 1, 'done': 1}
+
+    with raises(ValueError, match='2 chunk'):
+        sweep.merge()
+
+    # Restart (with the same grid)
+    sweep = Sweep.create(tmp_path, 500e-9, 60e-9, N=N, chunksize=1)
+    assert sweep.run(timeout=10) == 2
+    assert sweep.status == {'todo': 0, 'claimed': 0, 'done': 3}
+
+    table = sweep.merge()
+    qsct, _, _, gg, _, P = fractals_tholins(500e-9, 60e-9, 2, 266)
+    assert table.qsct[1] == approx(qsct)
+    assert table[1][3] is gg is None
+    assert table.P[1] == approx(P)
+    table.close()
+
+    with raises(ValueError, match='different sweep'):
+        Sweep.create(tmp_path, 500e-9, 60e-9, N=N + 1, chunksize=1)
+
+
+def create(directory):
+    return len(Sweep.create(directory, 500e-9, np.geomspace(50e-9, 100e-9, 40),
+                            nang=5, chunksize=4))
+
+
+def test_sweep_concurrent_create(tmp_path):
+    directory = tmp_path / 'sweep'
+
+    with Pool(4) as pool:
+        assert pool.map(create, [directory] * 8) == [10] * 8
+
+    assert sorted(os.listdir(tmp_path)) == ['sweep']
+    assert Sweep(directory).status == {'todo': 10, 'claimed': 0, 'done': 0}
+
+
+def test_sweep_database(tmp_path):
+    fname = tmp_path / 'indexes.db'
+    import_indexes(np.array([[.3, 1.5, .1], [.7, 1.6, .01]]), 'Lab', fname)
+
+    sweep = Sweep.create(tmp_path / 'sweep', 500e-9, [50e-9, 80e-9], fname=fname,
+                         table='Lab', nang=5)
+    assert sweep.config['fname'] == os.path.join('..', 'indexes.db')
+    assert sweep.database().fname.resolve() == fname.resolve()
+    assert sweep.run() == 1
+
+    # Shared directory mounted elsewhere (the database moves with the sweep)
+    os.rename(tmp_path, tmp_path.with_name(tmp_path.name + '-moved'))
+    tmp_path = tmp_path.with_name(tmp_path.name + '-moved')
+    sweep = Sweep.create(tmp_path / 'sweep', 500e-9, [50e-9, 80e-9],
+                         fname=tmp_path / 'indexes.db', table='Lab', nang=5)
+
+    table = sweep.merge()
+    r = np.array([50e-9, 80e-9])
+    assert table.qext == approx(mie_tholins(500e-9, r, sweep.database(), nang=5)[1])
+    assert table.qext != approx(mie_tholins(500e-9, r, Database(), nang=5)[1], abs=0)
+    table.close()
+
+    with raises(ValueError, match='not empty'):
+        Sweep.create(tmp_path, 500e-9, 50e-9)
+
+
+def test_sweep_not_found(tmp_path):
+    with raises(FileNotFoundError):
+        Sweep(tmp_path)
@@ -1,10 +1,13 @@
 """Test tholins database module."""
 # pylint: disable=missing-function-docstring
 
-from pytest import approx, raises
+import numpy as np
+
+from pytest import approx, raises, warns
 
 from aerosols.tholins import (
-    Database, fractals_tholins, index_tholins, mie_tholins
+    Database, ExtrapolationWarning, fractals_tholins,
+    import_indexes, index_tholins, mie_tholins, stack_fields
 )
 
 
@@ -38,17 +41,48 @@ def test_ni_1um():
 
 
 def test_wvln_inf():
-    nr, ni = index_tholins(1e-9)
+    with warns(ExtrapolationWarning, match='below the `Tholins_Doose` range'):
+        nr, ni = index_tholins(1e-9, db=Database())
     assert nr == 0.92
     assert ni == 0.098
 
 
 def test_wvln_sup():
-    nr, ni = index_tholins(801e-6)
+    with warns(ExtrapolationWarning, match='above the `Tholins_Doose` range'):
+        nr, ni = index_tholins(801e-6, db=Database())
     assert nr == 1.9168
     assert ni == 0.0001
 
 
+def test_wvln_array():
+    wvln = np.array([1e-9, 250e-9, 338e-9, 801e-6, 900e-6])
+    db = Database()
+
+    with warns(ExtrapolationWarning) as record:
+        nr, ni = index_tholins(wvln, db=db)
+
+    assert len(record) == 2
+    assert '2 wavelength(s) between 8.010e-04 and 9.000e-04 m' in str(record[0].message)
+
+    for i, w in enumerate(wvln[1:3], start=1):
+        assert (nr[i], ni[i]) == index_tholins(w, db=db)
+
+    assert nr[[0, 3, 4]] == approx([0.92, 1.9168, 1.9168])
+    assert ni[[0, 3, 4]] == approx([0.098, 0.0001, 0.0001])
+
+    # Warnings are emitted only once per table and direction
+    with warns(ExtrapolationWarning, match='CVD'):
+        index_tholins(wvln, db=db)
+        db.table = 'Tholins_CVD'
+        index_tholins(1e-3, db=db)
+
+    assert db.extrapolated == {
+        ('Tholins_Doose', 'below'): 2,
+        ('Tholins_Doose', 'above'): 4,
+        ('Tholins_CVD', 'above'): 1,
+    }
+
+
 def test_mie():
     qsct, _, qabs, gg, _, P = mie_tholins(300e-9, 50e-9)
     assert qsct == approx(3.256812556887943e-15, 1e-6)
@@ -92,3 +126,103 @@ def test_fractals():
     assert P[140] == approx(0.114, abs=1e-3)
     assert P[160] == approx(0.117, abs=1e-3)
     assert P[180] == approx(0.119, abs=1e-3)
+
+
+def test_precision():
+    *_, P = mie_tholins(300e-9, 50e-9, precision='single')
+    assert P.dtype == np.float32
+    assert P[0] == approx(2.5061596742176055, 1e-5)
+
+    *_, P = fractals_tholins(338e-9, 60e-9, 2.0, 266, precision='single')
+    assert P.dtype == np.float32
+
+
+def test_import_csv(tmp_path):
+    fname = tmp_path / 'indexes.db'
+    csv = tmp_path / 'lab.csv'
+    csv.write_text('wvln,nr,ni\n0.2,1.5,0.1\n0.4,1.6,0.01\n1.0,1.7,0.001\n')
+
+    db = import_indexes(csv, 'Lab', fname)
+    assert repr(db) == '<Database indexes.db | Table: Lab>'
+    assert db.sidecar == tmp_path / 'indexes.Lab.npy'
+    assert db.sidecar.exists()
+    assert [path.name for path in tmp_path.glob('.*')] == []
+    assert isinstance(db.indexes[0], np.memmap)
+
+    assert index_tholins(400e-9, db=db) == (1.6, 0.01)
+    assert db.wvln == approx([.2e-6, .4e-6, 1e-6])
+
+    db.execute("SELECT name FROM sqlite_master WHERE type='index'")
+    assert db.fetchone() == ('Lab_wvln',)
+
+    # Other tables imports keep the sidecar valid
+    _ = import_indexes(np.array([[.3, 1.4, .2], [.5, 1.5, .1]]), 'Other', fname)
+    db = Database(fname, 'Lab')
+    assert isinstance(db.indexes[0], np.memmap)
+
+    # Stale sidecar is ignored
+    db.execute('UPDATE Lab SET ni = .002 WHERE wvln = 1')
+    db.con.commit()
+    db = Database(fname, 'Lab')
+    assert index_tholins(1e-6, db=db) == (1.7, 0.002)
+    assert not isinstance(db.indexes[0], np.memmap)
+
+    # Missing sidecar
+    db.sidecar.unlink()
+    db = Database(fname, 'Lab')
+    assert index_tholins(1e-6, db=db) == (1.7, 0.002)
+    assert not isinstance(db.indexes[0], np.memmap)
+
+    # Truncated sidecar
+    db = import_indexes(csv, 'Lab', fname, replace=True)
+    data = db.sidecar.read_bytes()
+    db.sidecar.write_bytes(data[:len(data) // 2])
+    db = Database(fname, 'Lab')
+    assert index_tholins(1e-6, db=db) == (1.7, 0.001)
+    assert not isinstance(db.indexes[0], np.memmap)
+
+
+def test_import_npy(tmp_path):
+    fname = tmp_path / 'indexes.db'
+    npy = tmp_path / 'lab.npy'
+    np.save(npy, [[200, 1.5, .1], [400, 1.6, .01]])
+
+    import_indexes(npy, 'Lab', fname, unit='nm')
+
+    with raises(ValueError, match='already exists'):
+        import_indexes(npy, 'Lab', fname, unit='nm')
+
+    db = import_indexes([[.3, 1.4, .2], [.5, 1.5, .02]], 'Lab', fname, replace=True)
+    assert db.wvln == approx([.3e-6, .5e-6])
+    assert Database(fname, 'Lab').indexes[1] == approx([1.4, 1.5])
+
+
+def test_import_errors(tmp_path):
+    fname = tmp_path / 'indexes.db'
+
+    with raises(ValueError, match='Invalid table name'):
+        import_indexes([[.3, 1.4, .2], [.5, 1.5, .02]], 'Lab"; DROP', fname)
+
+    with raises(ValueError, match='Unknown wavelength unit'):
+        import_indexes([[.3, 1.4, .2], [.5, 1.5, .02]], 'Lab', fname, unit='cm')
+
+    with raises(ValueError, match='3 columns'):
+        import_indexes([[.3, 1.4], [.5, 1.5]], 'Lab', fname)
+
+    with raises(ValueError, match='sorted and unique'):
+        import_indexes([[.5, 1.4, .2], [.3, 1.5, .02]], 'Lab', fname)
+
+    with raises(ValueError, match='sorted and unique'):
+        import_indexes([[.3, 1.4, .2], [.3, 1.5, .02]], 'Lab', fname)
+
+    with raises(ValueError, match='positive'):
+        import_indexes([[.3, 1.4, 0], [.5, 1.5, .02]], 'Lab', fname)
+
+
+def test_stack_fields():
+    rows = stack_fields([1, 2], 3, 4, None, np.ones((2, 3)))
+
+    assert rows.shape == (2, 7)
+    assert rows[:, :3] == approx(np.array([[1, 3, 4], [2, 3, 4]]))
+    assert np.isnan(rows[:, 3]).all()
+    assert rows[:, 4:] == approx(1)